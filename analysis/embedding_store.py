@@ -0,0 +1,198 @@
+# analysis/embedding_store.py: Append-only embedding matrices shared between processes
+# Workers open the matrix read-only with np.memmap so they share physical pages
+
+import os
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import numpy as np
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+from analysis.quantization import DTYPES, quantize
+from feedback.index import ExactIndex, normalize
+
+class MappedEmbeddingStore:
+    """Consolidated on-disk embedding matrix opened with np.memmap.
+
+    Layout in store_dir for a store called <name>:
+      <name>.json               meta: generation, count, dim, dtype
+      <name>.<gen>.codes        raw row-major codes (float32/float16/int8)
+      <name>.<gen>.scales       float32 per-row scales
+      <name>.<gen>.ids          one id per line
+
+    Appends write rows past the current count and then replace the meta
+    file, so readers never see partially written rows. Rebuilds start a
+    new generation instead of truncating files other processes have mapped.
+    Writers in any process serialise on <name>.lock, so concurrent appends
+    cannot interleave rows or lose each other's count.
+    """
+
+    def __init__(self, store_dir: str, name: str):
+        """Initialize with directory and store name."""
+        self.logger = logging.getLogger("analyzer")
+        self.store_dir = store_dir
+        self.name = name
+        self.meta_path = os.path.join(store_dir, f"{name}.json")
+        self.lock_path = os.path.join(store_dir, f"{name}.lock")
+        self.generation = -1
+        self.count = -1
+        self._thread_lock = threading.Lock()
+
+    def _path(self, generation: int, kind: str) -> str:
+        """Return path of a data file for a generation."""
+        return os.path.join(self.store_dir, f"{self.name}.{generation}.{kind}")
+
+    def _read_meta(self) -> Optional[Dict]:
+        """Read store meta, or None if the store does not exist."""
+        try:
+            with open(self.meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, meta: Dict):
+        """Atomically replace store meta."""
+        tmp_path = f"{self.meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    @contextmanager
+    def _write_lock(self):
+        """Hold the store's write lock against other threads and processes."""
+        os.makedirs(self.store_dir, exist_ok=True)
+        with self._thread_lock, open(self.lock_path, 'a+b') as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        # LK_LOCK gives up after about 10 seconds; keep waiting for the holder
+                        continue
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def is_stale(self) -> bool:
+        """Check whether the store changed since it was last attached."""
+        meta = self._read_meta()
+        if meta is None:
+            return self.generation != -1
+        return (meta['generation'], meta['count']) != (self.generation, self.count)
+
+    def sync(self, index: ExactIndex) -> bool:
+        """Attach the current store contents to index; False if unusable."""
+        meta = self._read_meta()
+        if meta is None or meta['dtype'] != index.dtype:
+            return False
+        if (meta['generation'], meta['count']) == (self.generation, self.count):
+            return True
+        generation, count, dim = meta['generation'], meta['count'], meta['dim']
+        if count:
+            codes = np.memmap(self._path(generation, 'codes'), dtype=DTYPES[meta['dtype']], mode='r', shape=(count, dim))
+            scales = np.memmap(self._path(generation, 'scales'), dtype=np.float32, mode='r', shape=(count,))
+            with open(self._path(generation, 'ids')) as f:
+                ids = f.read().splitlines()[:count]
+        else:
+            codes = np.empty((0, dim), dtype=DTYPES[meta['dtype']])
+            scales = np.empty(0, dtype=np.float32)
+            ids = []
+        index.attach(ids, codes, scales)
+        self.generation, self.count = generation, count
+        self.logger.debug(f"Attached {self.name} generation {generation} with {count} rows")
+        return True
+
+    def rewrite(self, ids: List[str], codes: np.ndarray, scales: np.ndarray, dtype: str):
+        """Write a new generation containing exactly the given rows."""
+        with self._write_lock():
+            self._rewrite(ids, codes, scales, dtype)
+
+    def _rewrite(self, ids: List[str], codes: np.ndarray, scales: np.ndarray, dtype: str):
+        """Write a new generation; the caller holds the write lock."""
+        meta = self._read_meta()
+        generation = meta['generation'] + 1 if meta else 0
+        with open(self._path(generation, 'codes'), 'wb') as f:
+            f.write(np.ascontiguousarray(codes).tobytes())
+        with open(self._path(generation, 'scales'), 'wb') as f:
+            f.write(np.ascontiguousarray(scales, dtype=np.float32).tobytes())
+        with open(self._path(generation, 'ids'), 'w') as f:
+            f.write(''.join(f"{item_id}\n" for item_id in ids))
+        dim = codes.shape[1] if codes.ndim == 2 else 0
+        self._write_meta({'generation': generation, 'count': len(ids), 'dim': dim, 'dtype': dtype})
+        self._remove_old_generations(generation)
+        self.logger.debug(f"Wrote {self.name} generation {generation} with {len(ids)} rows")
+
+    def _append(self, meta: Dict, ids: List[str], codes: np.ndarray, scales: np.ndarray):
+        """Append rows to the current generation; the caller holds the write lock."""
+        generation = meta['generation']
+        with open(self._path(generation, 'codes'), 'ab') as f:
+            f.write(np.ascontiguousarray(codes).tobytes())
+        with open(self._path(generation, 'scales'), 'ab') as f:
+            f.write(np.ascontiguousarray(scales, dtype=np.float32).tobytes())
+        with open(self._path(generation, 'ids'), 'a') as f:
+            f.write(''.join(f"{item_id}\n" for item_id in ids))
+        self._write_meta({**meta, 'count': meta['count'] + len(ids)})
+
+    def add(self, index: ExactIndex, ids: List[str], vectors: np.ndarray):
+        """Persist new vectors and re-attach the grown matrix to index."""
+        codes, scales = quantize(normalize(vectors), index.dtype)
+        with self._write_lock():
+            if self.is_stale():
+                self.sync(index)
+            # Another process may have written some of these rows since the caller looked
+            keep = [i for i, item_id in enumerate(ids) if item_id not in index]
+            if not keep:
+                return
+            if len(keep) < len(ids):
+                ids, codes, scales = [ids[i] for i in keep], codes[keep], scales[keep]
+            meta = self._read_meta()
+            appendable = (
+                meta is not None
+                and meta['dtype'] == index.dtype
+                and meta['dim'] == codes.shape[1]
+                and (meta['generation'], meta['count']) == (self.generation, self.count)
+                and len(index) == meta['count']
+            )
+            if appendable:
+                self._append(meta, ids, codes, scales)
+            else:
+                existing_codes, existing_scales = index.export()
+                if not len(index):
+                    existing_codes = np.empty((0, codes.shape[1]), dtype=codes.dtype)
+                self._rewrite(
+                    index.ids + list(ids),
+                    np.concatenate([existing_codes, codes]),
+                    np.concatenate([existing_scales, scales]),
+                    index.dtype
+                )
+            self.sync(index)
+
+    def clear(self, dtype: str):
+        """Start a new, empty generation."""
+        self.rewrite([], np.empty((0, 0), dtype=DTYPES[dtype]), np.empty(0, dtype=np.float32), dtype)
+
+    def _remove_old_generations(self, current: int):
+        """Best-effort removal of superseded generations."""
+        prefix = f"{self.name}."
+        for fname in os.listdir(self.store_dir):
+            parts = fname[len(prefix):].split('.') if fname.startswith(prefix) else []
+            if len(parts) == 2 and parts[0].isdigit() and int(parts[0]) < current:
+                try:
+                    os.remove(os.path.join(self.store_dir, fname))
+                except OSError:
+                    # Still mapped by another process (Windows); retried on the next rewrite
+                    pass
@@ -0,0 +1,190 @@
+# analysis/encoder.py: Sentence encoders behind one interface
+# PyTorch SentenceTransformer by default, optional ONNX Runtime (fp32 or int8) from an exported model
+
+import os
+import re
+import json
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Union
+import numpy as np
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+try:
+    from tokenizers import Tokenizer
+except ImportError:
+    Tokenizer = None
+
+ONNX_FILES = {'fp32': "model.onnx", 'int8': "model_int8.onnx"}
+
+# Model id of embeddings stored before they were tagged with the encoder that produced them
+LEGACY_EMBEDDING_MODEL = "all-MiniLM-L6-v2:torch"
+
+def model_slug(model_id: str) -> str:
+    """Turn an encoder name into a directory name."""
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', model_id)
+
+class Encoder(ABC):
+    """Turns text into L2-normalised sentence embeddings."""
+
+    name = "encoder"
+    dimension = 0
+
+    def encode(self, texts: Union[str, List[str]], batch_size: Optional[int] = None) -> np.ndarray:
+        """Encode one text to a vector or a list of texts to a (n, dim) float32 matrix."""
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        if not batch:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        embeddings = np.asarray(self._encode_batch(batch, batch_size), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+    @abstractmethod
+    def _encode_batch(self, texts: List[str], batch_size: Optional[int]) -> np.ndarray:
+        """Encode a non-empty batch of texts."""
+
+class TorchEncoder(Encoder):
+    """SentenceTransformer on PyTorch."""
+
+    def __init__(self, model_name: str = 'all-MiniLM-L6-v2', batch_size: int = 32):
+        """Load the SentenceTransformer model."""
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+        self.name = f"{model_name}:torch"
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self.batch_size = batch_size
+
+    def _encode_batch(self, texts: List[str], batch_size: Optional[int]) -> np.ndarray:
+        return self.model.encode(texts, batch_size=batch_size or self.batch_size)
+
+class OnnxEncoder(Encoder):
+    """MiniLM exported to ONNX, with mean pooling and normalisation done in NumPy.
+
+    The model directory holds model.onnx, model_int8.onnx and tokenizer.json
+    as written by export_onnx().
+    """
+
+    def __init__(
+        self,
+        model_dir: str,
+        precision: str = 'fp32',
+        batch_size: int = 32,
+        max_length: int = 256,
+        threads: int = 0
+    ):
+        """Open an inference session on the fp32 or int8 model in model_dir."""
+        if onnxruntime is None or Tokenizer is None:
+            raise ImportError("onnxruntime and tokenizers are required for the onnx encoder")
+        if precision not in ONNX_FILES:
+            raise ValueError(f"Unknown onnx precision: {precision}")
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, ONNX_FILES[precision]), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+        self.name = f"{os.path.basename(os.path.normpath(model_dir))}:onnx-{precision}"
+        self.dimension = self.session.get_outputs()[0].shape[-1]
+        self.batch_size = batch_size
+
+    def _encode_batch(self, texts: List[str], batch_size: Optional[int]) -> np.ndarray:
+        batch_size = batch_size or self.batch_size
+        # Batch texts of similar length together to keep padding short
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            embeddings[rows] = self._run([texts[i] for i in rows])
+        return embeddings
+
+    def _run(self, texts: List[str]) -> np.ndarray:
+        """Tokenize, run the transformer and mean-pool over real tokens."""
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+            'attention_mask': mask,
+            'token_type_ids': np.array([e.type_ids for e in encodings], dtype=np.int64)
+        }
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+        weights = mask[:, :, None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return pooled / norms
+
+def export_onnx(model_name: str, model_dir: str, quantize: bool = True, opset: int = 14) -> str:
+    """Export a SentenceTransformer's transformer to ONNX, plus a dynamic int8 copy."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    os.makedirs(model_dir, exist_ok=True)
+    transformer = SentenceTransformer(model_name, device="cpu")[0]
+    model, tokenizer = transformer.auto_model.eval(), transformer.tokenizer
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    dynamic = {name: {0: "batch", 1: "sequence"} for name in names}
+    dynamic['last_hidden_state'] = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[name] for name in names), os.path.join(model_dir, ONNX_FILES['fp32']),
+            input_names=names, output_names=['last_hidden_state'],
+            dynamic_axes=dynamic, opset_version=opset, do_constant_folding=True
+        )
+    tokenizer.save_pretrained(model_dir)
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(
+            os.path.join(model_dir, ONNX_FILES['fp32']),
+            os.path.join(model_dir, ONNX_FILES['int8']),
+            weight_type=QuantType.QInt8
+        )
+    with open(os.path.join(model_dir, "encoder.json"), 'w') as f:
+        json.dump({'model': model_name, 'opset': opset, 'max_length': transformer.max_seq_length}, f, indent=2)
+    return model_dir
+
+def create_encoder(config: Dict) -> Encoder:
+    """Build the configured encoder, falling back to PyTorch if ONNX cannot be used."""
+    logger = logging.getLogger("analyzer")
+    model_name = config.get('model', 'all-MiniLM-L6-v2')
+    batch_size = config.get('batch_size', 32)
+    if config.get('backend', 'torch') == 'onnx':
+        model_dir = config.get('onnx_dir') or os.path.join("models", model_name)
+        try:
+            encoder = OnnxEncoder(
+                model_dir,
+                config.get('precision', 'fp32'),
+                batch_size,
+                config.get('max_length', 256),
+                config.get('threads', 0)
+            )
+            logger.info(f"Using encoder {encoder.name}")
+            return encoder
+        except Exception as e:
+            logger.warning(f"ONNX encoder unavailable ({e}), using PyTorch")
+    return TorchEncoder(model_name, batch_size)
+
+_encoders: Dict[str, Encoder] = {}
+
+def get_encoder(config: Optional[Dict] = None, defaults_path: str = "app-config/global_defaults.json") -> Encoder:
+    """Return the process-wide encoder for a config, by default the 'encoder' section of global defaults."""
+    if config is None:
+        config = {}
+        try:
+            if os.path.exists(defaults_path):
+                with open(defaults_path) as f:
+                    config = json.load(f).get('encoder', {})
+        except Exception as e:
+            logging.getLogger("analyzer").error(f"Error loading encoder config: {e}")
+    key = json.dumps(config, sort_keys=True)
+    if key not in _encoders:
+        _encoders[key] = create_encoder(config)
+    return _encoders[key]
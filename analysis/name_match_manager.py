@@ -3,36 +3,123 @@
 import os
 import json
 import logging
-import logging.config
-from typing import List, Dict
-from sentence_transformers import SentenceTransformer
+import threading
+from datetime import datetime
+from typing import List, Dict, Optional, Set, Tuple
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
+from analysis.embedding_store import MappedEmbeddingStore
+from analysis.encoder import LEGACY_EMBEDDING_MODEL, Encoder, get_encoder, model_slug
+from analysis.quantization import DTYPES
+from feedback.index import ExactIndex
+from schema.fingerprint import ArtefactManifest, schema_columns
 
 class NameMatchManager:
     """Manages name matching for database entities."""
     
-    def __init__(self, db_name: str):
-        """Initialize with database name."""
-        logging_config_path = f"app-config/logging_config.ini"
-        if os.path.exists(logging_config_path):
-            try:
-                logging.config.fileConfig(logging_config_path, disable_existing_loggers=False)
-            except Exception as e:
-                print(f"Error loading logging config: {e}")
-        
+    def __init__(self, db_name: str, encoder: Optional[Encoder] = None, config: Optional[Dict] = None):
+        """Initialize with database name, optional encoder (shared default otherwise) and config replacing global defaults."""
         self.logger = logging.getLogger("name_match_manager")
         self.db_name = db_name
         self.default_path = os.path.join("app-config", db_name, "default_name_matches.json")
         self.dynamic_path = os.path.join("app-config", db_name, "dynamic_name_matches.json")
+        self.review_path = os.path.join("app-config", db_name, "synonym_review_queue.json")
         self.global_config_path = "app-config/global_defaults.json"
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.encoder = encoder or get_encoder()
         self.default_matches = self._load_default()
         self.dynamic_matches = self._load_dynamic()
-        self.config = self._load_global_config()
+        self.synonym_index = self._build_synonym_index()
+        self.review_queue = self._load_review_queue()
+        self.config = config if config is not None else self._load_global_config()
         self.similarity_threshold = self.config.get('similarity_threshold', 0.7)
+        self.embedding_dtype = self.config.get('embedding_dtype', 'float32')
+        self.column_embeddings = ExactIndex(self.embedding_dtype)
+        # Speculative scoring threads and synonym updates both encode missing columns
+        self._embedding_lock = threading.RLock()
+        self.column_cache_path = os.path.join("schema_cache", db_name, "column_embeddings.npz")
+        self.column_store = None
+        if self.config.get('shared_embeddings', False):
+            self.column_store = MappedEmbeddingStore(
+                os.path.join("schema_cache", db_name, "columns", model_slug(self.encoder.name)), "column_embeddings"
+            )
+            self.column_store.sync(self.column_embeddings)
+        else:
+            self._load_column_cache()
         self.logger.debug(f"Initialized NameMatchManager for {db_name}")
 
+    def _load_column_cache(self):
+        """Reuse column embeddings encoded by a previous run."""
+        try:
+            if os.path.exists(self.column_cache_path):
+                with np.load(self.column_cache_path, allow_pickle=False) as data:
+                    if data['codes'].dtype != DTYPES[self.embedding_dtype]:
+                        self.logger.debug("Cached column embeddings use another dtype, ignoring")
+                        return
+                    encoder_name = str(data['encoder']) if 'encoder' in data else LEGACY_EMBEDDING_MODEL
+                    if encoder_name != self.encoder.name:
+                        self.logger.debug("Cached column embeddings were built with another encoder, ignoring")
+                        return
+                    self.column_embeddings.attach([str(i) for i in data['ids']], data['codes'], data['scales'])
+                self.logger.debug(f"Loaded {len(self.column_embeddings)} column embeddings from {self.column_cache_path}")
+        except Exception as e:
+            self.logger.error(f"Error loading column embeddings: {e}")
+            self.column_embeddings.reset()
+
+    def _save_column_cache(self):
+        """Persist column embeddings for the next run."""
+        os.makedirs(os.path.dirname(self.column_cache_path), exist_ok=True)
+        try:
+            codes, scales = self.column_embeddings.export()
+            np.savez(
+                self.column_cache_path,
+                ids=np.array(self.column_embeddings.ids, dtype=str),
+                codes=codes,
+                scales=scales,
+                encoder=np.array(self.encoder.name)
+            )
+            self.logger.debug(f"Saved {len(self.column_embeddings)} column embeddings to {self.column_cache_path}")
+        except Exception as e:
+            self.logger.error(f"Error saving column embeddings: {e}")
+
+    def sync_schema(self, schema_dict: Dict, fingerprint: str):
+        """Drop embeddings and learned synonyms of columns removed since the last schema."""
+        manifest = ArtefactManifest(self.db_name)
+        if manifest.is_current('name_matches', fingerprint):
+            return
+        columns = schema_columns(schema_dict)
+        
+        with self._embedding_lock:
+            ids = self.column_embeddings.ids
+            keep = [row for row, col in enumerate(ids) if col.lower() in columns]
+            if len(keep) < len(ids):
+                codes, scales = self.column_embeddings.export()
+                kept_ids = [ids[row] for row in keep]
+                if self.column_store is not None:
+                    self.column_store.rewrite(kept_ids, codes[keep], scales[keep], self.embedding_dtype)
+                    self.column_store.sync(self.column_embeddings)
+                else:
+                    self.column_embeddings.reset()
+                    self.column_embeddings.attach(kept_ids, codes[keep], scales[keep])
+                    self._save_column_cache()
+        
+        removed = [col for col in self.dynamic_matches if col not in columns]
+        for col in removed:
+            del self.dynamic_matches[col]
+        if removed:
+            self.synonym_index = self._build_synonym_index()
+            self._save_dynamic()
+        stale_reviews = [col for col in self.review_queue if col not in columns]
+        for col in stale_reviews:
+            del self.review_queue[col]
+        if stale_reviews:
+            self._save_review_queue()
+        
+        manifest.record('name_matches', fingerprint)
+        self.logger.info(
+            f"Schema {fingerprint[:12]}: dropped {len(ids) - len(keep)} column embeddings, "
+            f"{len(removed)} learned synonym sets, {len(stale_reviews)} review entries"
+        )
+
     def _load_global_config(self) -> Dict:
         """Load global configuration."""
         try:
@@ -44,34 +131,84 @@ class NameMatchManager:
             self.logger.error(f"Error loading global config: {e}")
         return {"similarity_threshold": 0.7, "prompt_threshold": 0.56}
 
-    def _load_default(self) -> Dict[str, List[str]]:
+    def _load_default(self) -> Dict[str, Set[str]]:
         """Load default name matches."""
         try:
             if os.path.exists(self.default_path):
                 with open(self.default_path, 'r') as f:
                     self.logger.debug(f"Loaded default matches from {self.default_path}")
-                    return json.load(f)
+                    return self._to_sets(json.load(f))
         except Exception as e:
             self.logger.error(f"Error loading default name matches: {e}")
         return {}
 
-    def _load_dynamic(self) -> Dict[str, List[str]]:
+    def _load_dynamic(self) -> Dict[str, Set[str]]:
         """Load dynamic name matches."""
         try:
             if os.path.exists(self.dynamic_path):
                 with open(self.dynamic_path, 'r') as f:
                     self.logger.debug(f"Loaded dynamic matches from {self.dynamic_path}")
-                    return json.load(f)
+                    return self._to_sets(json.load(f))
         except Exception as e:
             self.logger.error(f"Error loading dynamic name matches: {e}")
         return {}
 
+    def _load_review_queue(self) -> Dict[str, Dict[str, Dict]]:
+        """Load pending synonym candidates."""
+        try:
+            if os.path.exists(self.review_path):
+                with open(self.review_path, 'r') as f:
+                    self.logger.debug(f"Loaded synonym review queue from {self.review_path}")
+                    return json.load(f)
+        except Exception as e:
+            self.logger.error(f"Error loading synonym review queue: {e}")
+        return {}
+
+    def _save_review_queue(self):
+        """Save pending synonym candidates."""
+        os.makedirs(os.path.dirname(self.review_path), exist_ok=True)
+        try:
+            with open(self.review_path, 'w') as f:
+                json.dump(self.review_queue, f, indent=2)
+            self.logger.debug(f"Saved synonym review queue to {self.review_path}")
+        except Exception as e:
+            self.logger.error(f"Error saving synonym review queue: {e}")
+
+    @staticmethod
+    def _to_sets(matches: Dict[str, List[str]]) -> Dict[str, Set[str]]:
+        """Convert JSON synonym lists to lowercase sets."""
+        return {col.lower(): {syn.lower() for syn in synonyms} for col, synonyms in matches.items()}
+
+    @staticmethod
+    def _to_lists(matches: Dict[str, Set[str]]) -> Dict[str, List[str]]:
+        """Convert synonym sets to sorted lists for JSON."""
+        return {col: sorted(synonyms) for col, synonyms in matches.items()}
+
+    def _build_synonym_index(self) -> Dict[str, Set[str]]:
+        """Build reverse synonym -> columns index over both match maps."""
+        index: Dict[str, Set[str]] = {}
+        for matches in (self.default_matches, self.dynamic_matches):
+            for col, synonyms in matches.items():
+                for syn in synonyms:
+                    index.setdefault(syn, set()).add(col)
+        self.logger.debug(f"Built synonym index with {len(index)} synonyms")
+        return index
+
+    def _register_synonym(self, matches: Dict[str, Set[str]], column: str, token: str) -> bool:
+        """Add synonym to a match map and the reverse index; return True if new."""
+        synonyms = matches.setdefault(column, set())
+        if token in synonyms:
+            return False
+        synonyms.add(token)
+        self.synonym_index.setdefault(token, set()).add(column)
+        return True
+
     def _save_dynamic(self):
         """Save dynamic name matches."""
         os.makedirs(os.path.dirname(self.dynamic_path), exist_ok=True)
         try:
             with open(self.dynamic_path, 'w') as f:
-                json.dump(self.dynamic_matches, f, indent=2)
+                json.dump(self._to_lists(self.dynamic_matches), f, indent=2)
             self.logger.debug(f"Saved dynamic matches to {self.dynamic_path}")
         except Exception as e:
             self.logger.error(f"Error saving dynamic name matches: {e}")
@@ -81,13 +218,9 @@ class NameMatchManager:
         os.makedirs(os.path.dirname(self.default_path), exist_ok=True)
         try:
             for col, synonyms in self.dynamic_matches.items():
-                if col not in self.default_matches:
-                    self.default_matches[col] = []
-                for syn in synonyms:
-                    if syn not in self.default_matches[col]:
-                        self.default_matches[col].append(syn)
+                self.default_matches.setdefault(col, set()).update(synonyms)
             with open(self.default_path, 'w') as f:
-                json.dump(self.default_matches, f, indent=2)
+                json.dump(self._to_lists(self.default_matches), f, indent=2)
             self.logger.debug(f"Saved default matches to {self.default_path}")
         except Exception as e:
             self.logger.error(f"Error saving default name matches: {e}")
@@ -95,29 +228,57 @@ class NameMatchManager:
     def get_synonyms(self, column: str) -> List[str]:
         """Get synonyms for a column."""
         col_lower = column.lower()
-        synonyms = self.dynamic_matches.get(col_lower, []) or self.default_matches.get(col_lower, [])
-        self.logger.debug(f"Synonyms for '{col_lower}': {synonyms}")
-        return [column] + synonyms
+        synonyms = self.dynamic_matches.get(col_lower) or self.default_matches.get(col_lower, set())
+        self.logger.debug("Synonyms for '%s': %s", col_lower, synonyms)
+        return [column] + sorted(synonyms)
+
+    def get_all_synonyms(self) -> Dict[str, Set[str]]:
+        """Return default and dynamic synonyms merged per lowercase column."""
+        merged: Dict[str, Set[str]] = {}
+        for matches in (self.default_matches, self.dynamic_matches):
+            for col, synonyms in matches.items():
+                merged.setdefault(col.lower(), set()).update(synonyms)
+        return merged
 
     def get_token_embeddings(self, tokens: List[str]) -> np.ndarray:
         """Generate embeddings for tokens."""
         try:
-            embeddings = self.model.encode(tokens)
-            self.logger.debug(f"Generated embeddings for {len(tokens)} tokens")
+            embeddings = self.encoder.encode(tokens)
+            self.logger.debug("Generated embeddings for %s tokens", len(tokens))
             return embeddings
         except Exception as e:
             self.logger.error(f"Error generating token embeddings: {e}")
             return np.array([])
 
+    def get_column_embeddings(self, columns: List[str]) -> np.ndarray:
+        """Return column embeddings, encoding uncached columns in one batch."""
+        if not columns:
+            return np.empty((0, 0), dtype=np.float32)
+        with self._embedding_lock:
+            missing = list(dict.fromkeys(col for col in columns if col not in self.column_embeddings))
+            if missing and self.column_store is not None and self.column_store.is_stale():
+                # Another process may already have encoded these columns
+                self.column_store.sync(self.column_embeddings)
+                missing = [col for col in missing if col not in self.column_embeddings]
+            if missing:
+                embeddings = self.encoder.encode(missing)
+                if self.column_store is not None:
+                    self.column_store.add(self.column_embeddings, missing, embeddings)
+                else:
+                    self.column_embeddings.add(missing, embeddings)
+                    self._save_column_cache()
+                self.logger.debug("Encoded %s column embeddings as %s", len(missing), self.embedding_dtype)
+            return self.column_embeddings.get(columns)
+
     def get_column_score(self, column: str, token_embeddings: np.ndarray) -> float:
         """Calculate similarity score for column."""
         if not token_embeddings.size:
             return 0.0
         try:
-            col_embedding = self.model.encode([column]).reshape(1, -1)
+            col_embedding = self.get_column_embeddings([column])
             similarities = cosine_similarity(col_embedding, token_embeddings)[0]
             score = max(similarities) if max(similarities) > self.similarity_threshold else 0.0
-            self.logger.debug(f"Column score for '{column}': {score}")
+            self.logger.debug("Column score for '%s': %s", column, score)
             return score
         except Exception as e:
             self.logger.error(f"Error calculating column score: {e}")
@@ -125,73 +286,129 @@ class NameMatchManager:
 
     def update_synonyms(self, tokens: List[str], token_embeddings: np.ndarray, columns: List[str]):
         """Update synonyms based on matches."""
-        if not token_embeddings.size:
-            self.logger.debug("No embeddings provided")
-            return
+        self.queue_synonym_candidates(self.update_synonyms_batch(tokens, token_embeddings, columns))
 
-        for col in columns:
-            col_lower = col.lower()
-            col_embedding = self.model.encode([col]).reshape(1, -1)
-            similarities = cosine_similarity(col_embedding, token_embeddings)[0]
-            
-            for token, sim in zip(tokens, similarities):
-                if sim > self.similarity_threshold:
-                    self._add_synonym(token, col_lower, sim)
-                elif sim > self.config.get('prompt_threshold', 0.56):
-                    self._prompt_for_synonym(token, col)
+    def update_synonyms_batch(
+        self,
+        tokens: List[str],
+        token_embeddings: np.ndarray,
+        columns: List[str]
+    ) -> List[Tuple[str, str, float]]:
+        """Learn synonyms for all tokens x columns at once.
+
+        Returns mid-confidence (token, column, similarity) candidates that
+        need confirmation instead of prompting for them inline.
+        """
+        if not token_embeddings.size or not columns:
+            self.logger.debug("No embeddings or columns provided")
+            return []
+
+        columns = list(dict.fromkeys(columns))
+        similarities = cosine_similarity(self.get_column_embeddings(columns), token_embeddings)
+        accepted = similarities > self.similarity_threshold
+        candidates = (similarities > self.config.get('prompt_threshold', 0.56)) & ~accepted
+
+        for col_idx, token_idx in np.argwhere(accepted):
+            self._add_synonym(tokens[token_idx], columns[col_idx].lower(), similarities[col_idx, token_idx])
+
+        pending: Dict[Tuple[str, str], float] = {}
+        for col_idx, token_idx in np.argwhere(candidates):
+            key = (tokens[token_idx], columns[col_idx])
+            pending[key] = max(pending.get(key, 0.0), float(similarities[col_idx, token_idx]))
+        queue = sorted(((token, col, sim) for (token, col), sim in pending.items()), key=lambda x: -x[2])
+        self.logger.debug("Synonym batch: %s accepted, %s pending confirmation", int(accepted.sum()), len(queue))
+        return queue
+
+    def queue_synonym_candidates(self, candidates: List[Tuple[str, str, float]]) -> int:
+        """Add synonym candidates to the persistent review queue."""
+        queued = 0
+        now = datetime.now().isoformat()
+        for token, column, similarity in candidates:
+            token_lower = token.lower()
+            col_lower = column.lower()
+            if self._has_conflict(token_lower, col_lower):
+                self.logger.debug("Synonym conflict for '%s' with '%s'", token_lower, column)
+                continue
+            if token_lower in self.dynamic_matches.get(col_lower, ()):
+                continue
+            entry = self.review_queue.setdefault(col_lower, {}).setdefault(
+                token_lower, {'similarity': 0.0, 'count': 0}
+            )
+            entry['similarity'] = max(entry['similarity'], round(float(similarity), 4))
+            entry['count'] += 1
+            entry['last_seen'] = now
+            queued += 1
+        if queued:
+            self._save_review_queue()
+            self.logger.debug("Queued %s synonym candidates for review", queued)
+        return queued
+
+    def get_review_candidates(self) -> List[Dict]:
+        """Return pending synonym candidates, most frequent first."""
+        candidates = [
+            {'token': token, 'column': col, **entry}
+            for col, tokens in self.review_queue.items()
+            for token, entry in tokens.items()
+        ]
+        candidates.sort(key=lambda c: (-c['count'], -c['similarity'], c['column'], c['token']))
+        return candidates
+
+    def _remove_from_review(self, token: str, column: str):
+        """Drop a candidate from the review queue."""
+        tokens = self.review_queue.get(column, {})
+        tokens.pop(token, None)
+        if not tokens:
+            self.review_queue.pop(column, None)
+
+    def approve_synonyms(self, candidates: List[Tuple[str, str]]) -> int:
+        """Approve (token, column) candidates in bulk."""
+        approved = 0
+        for token, column in candidates:
+            token_lower = token.lower()
+            col_lower = column.lower()
+            self._remove_from_review(token_lower, col_lower)
+            if self._has_conflict(token_lower, col_lower):
+                self.logger.debug("Synonym conflict for '%s' with '%s'", token_lower, column)
+                continue
+            if self._register_synonym(self.dynamic_matches, col_lower, token_lower):
+                self.logger.info(f"User confirmed synonym '{token_lower}' for '{column}'")
+                approved += 1
+        self._save_dynamic()
+        self._save_review_queue()
+        return approved
+
+    def reject_synonyms(self, candidates: List[Tuple[str, str]]) -> int:
+        """Discard (token, column) candidates in bulk."""
+        for token, column in candidates:
+            self._remove_from_review(token.lower(), column.lower())
+        self._save_review_queue()
+        self.logger.debug(f"Rejected {len(candidates)} synonym candidates")
+        return len(candidates)
 
     def _add_synonym(self, token: str, column: str, similarity: float):
         """Add synonym if no conflicts."""
         token_lower = token.lower()
         if self._has_conflict(token_lower, column):
-            self.logger.debug(f"Synonym conflict for '{token_lower}' with '{column}'")
+            self.logger.debug("Synonym conflict for '%s' with '%s'", token_lower, column)
             return
         
-        if column not in self.dynamic_matches:
-            self.dynamic_matches[column] = []
-        if token_lower not in self.dynamic_matches[column]:
-            self.dynamic_matches[column].append(token_lower)
+        if self._register_synonym(self.dynamic_matches, column, token_lower):
             self.logger.info(f"Added synonym '{token_lower}' for '{column}' (sim={similarity:.2f})")
 
-    def _prompt_for_synonym(self, token: str, column: str):
-        """Prompt user for synonym confirmation."""
-        token_lower = token.lower()
-        if self._has_conflict(token_lower, column):
-            self.logger.debug(f"Synonym conflict for '{token_lower}' with '{column}'")
-            return
-        
-        # Check existing synonyms
-        for col, synonyms in self.dynamic_matches.items():
-            if token_lower in synonyms and col == column.lower():
-                self.logger.debug(f"Synonym '{token_lower}' already exists for '{column}'")
-                return
-        
-        confirm = input(f"Does '{token}' refer to column '{column}'? (y/n): ").strip().lower()
-        if confirm == 'y':
-            if column not in self.dynamic_matches:
-                self.dynamic_matches[column] = []
-            if token_lower not in self.dynamic_matches[column]:
-                self.dynamic_matches[column].append(token_lower)
-                self.logger.info(f"User confirmed synonym '{token_lower}' for '{column}'")
-                self._save_dynamic()
-
     def _has_conflict(self, token: str, column: str) -> bool:
         """Check for synonym conflicts."""
-        for col, synonyms in self.dynamic_matches.items():
-            if col != column and token in synonyms:
-                return True
-        for col, synonyms in self.default_matches.items():
-            if col != column and token in synonyms:
-                return True
-        return False
+        owners = self.synonym_index.get(token)
+        return bool(owners) and (len(owners) > 1 or column not in owners)
 
     def get_unmatched_tokens(self, tokens: List[str], columns: List[str]) -> List[str]:
         """Return unmatched tokens."""
-        matched = set()
-        for col in columns:
-            matched.update(self.get_synonyms(col))
-        unmatched = [t for t in tokens if t.lower() not in matched]
-        self.logger.debug(f"Unmatched tokens: {unmatched}")
+        column_set = {col.lower() for col in columns}
+        unmatched = [
+            t for t in tokens
+            if t.lower() not in column_set
+            and column_set.isdisjoint(self.synonym_index.get(t.lower(), ()))
+        ]
+        self.logger.debug("Unmatched tokens: %s", unmatched)
         return unmatched
 
     def save_dynamic(self):
@@ -0,0 +1,234 @@
+# analysis/parallel_scoring.py: Vectorised table scoring, optionally sharded across processes
+# Kept free of model imports so spawned workers start quickly
+
+import heapq
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+TABLE_NAME_BONUS = 0.5
+COLUMN_WEIGHT = 0.8
+# Seconds past a deadline to wait for workers to return partial shard results
+SHARD_GRACE = 0.05
+
+# Per-worker read-only state, filled by _init_worker
+_WORKER_STATE: Dict = {}
+
+def score_shard(
+    column_matrix: np.ndarray,
+    column_owner: np.ndarray,
+    table_names: List[str],
+    table_start: int,
+    token_matrix: np.ndarray,
+    query_lower: str,
+    bonus: Dict[int, float],
+    threshold: float,
+    k: int,
+    chunk: int = 65536,
+    deadline: Optional[float] = None
+) -> Tuple[List[Tuple[int, float]], bool]:
+    """Score tables [table_start, table_start + len(table_names)) and return their top k.
+
+    column_owner holds absolute table ids for the rows of column_matrix.
+    Rows and tokens are expected to be L2-normalized. Column blocks stop once
+    time.monotonic() passes deadline; the flag says whether every column was scored.
+    """
+    table_count = len(table_names)
+    scores = np.zeros(table_count, dtype=np.float64)
+    complete = True
+    if len(column_matrix) and len(token_matrix):
+        for start in range(0, len(column_matrix), chunk):
+            if deadline is not None and time.monotonic() >= deadline:
+                complete = False
+                break
+            block = slice(start, start + chunk)
+            best = (column_matrix[block] @ token_matrix.T).max(axis=1)
+            best[best <= threshold] = 0.0
+            scores += np.bincount(column_owner[block] - table_start, weights=best, minlength=table_count)
+        scores *= COLUMN_WEIGHT
+    for offset, name in enumerate(table_names):
+        if name in query_lower:
+            scores[offset] += TABLE_NAME_BONUS
+    for table_id, value in bonus.items():
+        if table_start <= table_id < table_start + table_count:
+            scores[table_id - table_start] += value
+    positive = np.flatnonzero(scores > 0)
+    if len(positive) > k:
+        positive = positive[np.argpartition(-scores[positive], k - 1)[:k]]
+    return [(table_start + int(i), float(scores[i])) for i in positive], complete
+
+def _init_worker(matrix_name: str, shape: Tuple[int, int], owner_name: str, table_names: List[str]):
+    """Attach shared column state in a worker process."""
+    matrix_shm = shared_memory.SharedMemory(name=matrix_name)
+    owner_shm = shared_memory.SharedMemory(name=owner_name)
+    _WORKER_STATE.update({
+        'matrix_shm': matrix_shm,
+        'owner_shm': owner_shm,
+        'matrix': np.ndarray(shape, dtype=np.float32, buffer=matrix_shm.buf),
+        'owner': np.ndarray((shape[0],), dtype=np.int64, buffer=owner_shm.buf),
+        'table_names': table_names
+    })
+
+def _score_worker_shard(
+    shard: Tuple[int, int, int, int],
+    token_matrix: np.ndarray,
+    query_lower: str,
+    bonus: Dict[int, float],
+    threshold: float,
+    k: int,
+    deadline: Optional[float] = None
+) -> Tuple[List[Tuple[int, float]], bool]:
+    """Score one shard inside a worker."""
+    table_start, table_end, col_start, col_end = shard
+    return score_shard(
+        _WORKER_STATE['matrix'][col_start:col_end],
+        _WORKER_STATE['owner'][col_start:col_end],
+        _WORKER_STATE['table_names'][table_start:table_end],
+        table_start, token_matrix, query_lower, bonus, threshold, k, deadline=deadline
+    )
+
+class TableScorer:
+    """Scores all tables for a query, in-process or across a worker pool."""
+
+    def __init__(
+        self,
+        table_names: List[str],
+        column_owner: np.ndarray,
+        column_matrix: np.ndarray,
+        threshold: float,
+        workers: int = 0
+    ):
+        """Initialize with lowercase table names and owner-sorted column rows."""
+        self.table_names = table_names
+        self.column_owner = np.ascontiguousarray(column_owner, dtype=np.int64)
+        self.column_matrix = np.ascontiguousarray(column_matrix, dtype=np.float32)
+        self.threshold = threshold
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._shm: List[shared_memory.SharedMemory] = []
+        # First column row of each table, plus the end sentinel
+        self.bounds = np.searchsorted(self.column_owner, np.arange(len(table_names) + 1))
+        self.shards = self._make_shards(max(workers, 1))
+        if workers > 0:
+            self._start_pool()
+
+    def _make_shards(self, count: int) -> List[Tuple[int, int, int, int]]:
+        """Split tables into contiguous shards with roughly equal column counts."""
+        total_tables = len(self.table_names)
+        if not total_tables:
+            return []
+        bounds = self.bounds
+        targets = np.linspace(0, len(self.column_owner), count + 1)
+        table_cuts = sorted(set([0, total_tables] + [
+            int(np.searchsorted(bounds, target)) for target in targets[1:-1]
+        ]))
+        return [
+            (start, end, int(bounds[start]), int(bounds[end]))
+            for start, end in zip(table_cuts, table_cuts[1:]) if end > start
+        ]
+
+    def _start_pool(self):
+        """Copy column state into shared memory and start workers."""
+        matrix_shm = shared_memory.SharedMemory(create=True, size=max(self.column_matrix.nbytes, 1))
+        owner_shm = shared_memory.SharedMemory(create=True, size=max(self.column_owner.nbytes, 1))
+        np.ndarray(self.column_matrix.shape, dtype=np.float32, buffer=matrix_shm.buf)[:] = self.column_matrix
+        np.ndarray(self.column_owner.shape, dtype=np.int64, buffer=owner_shm.buf)[:] = self.column_owner
+        self._shm = [matrix_shm, owner_shm]
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(matrix_shm.name, self.column_matrix.shape, owner_shm.name, self.table_names)
+        )
+
+    def score(
+        self,
+        token_matrix: np.ndarray,
+        query: str,
+        bonus: Dict[int, float],
+        k: int = 5
+    ) -> List[Tuple[int, float]]:
+        """Return the k best (table id, score) pairs merged across shards."""
+        return self.score_within(token_matrix, query, bonus, k)[0]
+
+    def score_within(
+        self,
+        token_matrix: np.ndarray,
+        query: str,
+        bonus: Dict[int, float],
+        k: int = 5,
+        deadline: Optional[float] = None
+    ) -> Tuple[List[Tuple[int, float]], bool]:
+        """Score until time.monotonic() reaches deadline; return the best k so far and whether scoring finished.
+
+        Workers stop scoring at the deadline too (the monotonic clock is system-wide),
+        and shards that have not reported shortly after it are left out.
+        """
+        query_lower = query.lower()
+        token_matrix = np.asarray(token_matrix, dtype=np.float32)
+        if self._pool is None:
+            results, complete = score_shard(
+                self.column_matrix, self.column_owner, self.table_names, 0,
+                token_matrix, query_lower, bonus, self.threshold, k, deadline=deadline
+            )
+        else:
+            futures = [
+                self._pool.submit(
+                    _score_worker_shard, shard, token_matrix, query_lower, bonus, self.threshold, k, deadline
+                )
+                for shard in self.shards
+            ]
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0) + SHARD_GRACE
+            done, pending = wait(futures, timeout=timeout)
+            for future in pending:
+                future.cancel()
+            shard_results = [future.result() for future in futures if future in done]
+            results = [item for items, _ in shard_results for item in items]
+            complete = not pending and all(finished for _, finished in shard_results)
+        return heapq.nlargest(k, results, key=lambda item: item[1]), complete
+
+    def name_matches(self, query: str) -> List[int]:
+        """Return ids of tables whose name appears in the query."""
+        query_lower = query.lower()
+        return [table_id for table_id, name in enumerate(self.table_names) if name in query_lower]
+
+    def score_candidates(
+        self,
+        token_matrix: np.ndarray,
+        query: str,
+        bonus: Dict[int, float],
+        candidates: np.ndarray,
+        k: int = 5
+    ) -> List[Tuple[int, float]]:
+        """Score only the candidate tables in-process, gathering their column rows."""
+        candidates = np.unique(np.asarray(candidates, dtype=np.int64))
+        if not len(candidates):
+            return []
+        starts = self.bounds[candidates]
+        lengths = self.bounds[candidates + 1] - starts
+        local = np.repeat(np.arange(len(candidates)), lengths)
+        rows = starts[local] + np.arange(len(local)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        scores = np.zeros(len(candidates), dtype=np.float64)
+        token_matrix = np.asarray(token_matrix, dtype=np.float32)
+        if len(rows) and len(token_matrix):
+            best = (self.column_matrix[rows] @ token_matrix.T).max(axis=1)
+            best[best <= self.threshold] = 0.0
+            scores += COLUMN_WEIGHT * np.bincount(local, weights=best, minlength=len(candidates))
+        query_lower = query.lower()
+        for offset, table_id in enumerate(candidates):
+            if self.table_names[table_id] in query_lower:
+                scores[offset] += TABLE_NAME_BONUS
+            scores[offset] += bonus.get(int(table_id), 0.0)
+        results = [(int(candidates[i]), float(scores[i])) for i in np.flatnonzero(scores > 0)]
+        return heapq.nlargest(k, results, key=lambda item: item[1])
+
+    def close(self):
+        """Stop workers and release shared memory."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        for shm in self._shm:
+            shm.close()
+            shm.unlink()
+        self._shm = []
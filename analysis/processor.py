@@ -1,25 +1,16 @@
 # analysis/processor.py: Processes natural language queries
 # Fixed E178 error by generating spaCy patterns from query strings
 
-import os
 import spacy
 from spacy.matcher import Matcher
 from typing import Dict
 import logging
-import logging.config
 
 class NLPPipeline:
     """Processes natural language queries for SQL generation."""
     
     def __init__(self, pattern_manager, db_name: str = "BikeStores"):
         """Initialize with pattern manager and database name."""
-        logging_config_path = f"app-config/logging_config.ini"
-        if os.path.exists(logging_config_path):
-            try:
-                logging.config.fileConfig(logging_config_path, disable_existing_loggers=False)
-            except Exception as e:
-                print(f"Error loading logging config: {e}")
-        
         self.logger = logging.getLogger("nlp_pipeline")
         self.nlp = spacy.load("en_core_web_trf")
         self.matcher = Matcher(self.nlp.vocab)
@@ -46,7 +37,7 @@ class NLPPipeline:
 
     def analyze_query(self, query: str) -> Dict:
         """Analyze query with spaCy."""
-        self.logger.debug(f"Analyzing query: {query}")
+        self.logger.debug("Analyzing query: %s", query)
         doc = self.nlp(query.lower())
         matches = self.matcher(doc)
         
@@ -57,5 +48,5 @@ class NLPPipeline:
                         for m_id, start, end in matches],
             "dependencies": [(token.text, token.dep_, token.head.text) for token in doc]
         }
-        self.logger.debug(f"Analysis result: {result}")
+        self.logger.debug("Analysis result: %s", result)
         return result
\ No newline at end of file
@@ -0,0 +1,53 @@
+# analysis/quantization.py: Reduced-precision storage for embedding vectors
+# float16 halves memory; int8 with a per-vector scale quarters it
+
+from typing import Optional, Tuple
+import numpy as np
+
+DTYPES = {
+    'float32': np.float32,
+    'float16': np.float16,
+    'int8': np.int8
+}
+
+def quantize(vectors: np.ndarray, dtype: str = 'float32') -> Tuple[np.ndarray, np.ndarray]:
+    """Encode vectors as (codes, per-vector scales) in the given storage dtype."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+    if dtype != 'int8':
+        return vectors.astype(DTYPES[dtype]), np.ones(len(vectors), dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+def dequantize(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """Decode codes back to float32 vectors."""
+    vectors = codes.astype(np.float32)
+    if codes.dtype == np.int8:
+        vectors *= scales[:, None]
+    return vectors
+
+def quantized_dot(
+    codes: np.ndarray,
+    scales: np.ndarray,
+    query: np.ndarray,
+    rows: Optional[np.ndarray] = None,
+    chunk: int = 16384
+) -> np.ndarray:
+    """Compute codes @ query in float32, decoding chunk by chunk."""
+    query = np.asarray(query, dtype=np.float32)
+    if codes.dtype == np.float32:
+        return codes @ query if rows is None else codes[rows] @ query
+    count = len(codes) if rows is None else len(rows)
+    out = np.empty(count, dtype=np.float32)
+    for start in range(0, count, chunk):
+        block = slice(start, min(start + chunk, count))
+        index = block if rows is None else rows[block]
+        out[block] = codes[index].astype(np.float32) @ query
+    if codes.dtype == np.int8:
+        out *= scales if rows is None else scales[rows]
+    return out
@@ -0,0 +1,80 @@
+# analysis/result_cache.py: Bounded LRU/TTL cache for table identification results
+# Entries carry their own validity check so callers can version them
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+class ResultCache:
+    """Least-recently-used cache with optional time-to-live and hit statistics."""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 0):
+        """Initialize with capacity (0 disables) and TTL in seconds (0 means no expiry)."""
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._stored_at: Dict[Hashable, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, is_valid: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        """Return the cached value, dropping it if expired or rejected by is_valid."""
+        if key not in self._entries:
+            self.misses += 1
+            return None
+        value = self._entries[key]
+        if self.ttl and time.monotonic() - self._stored_at[key] > self.ttl:
+            self.expired += 1
+            self._drop(key)
+            self.misses += 1
+            return None
+        if is_valid is not None and not is_valid(value):
+            self.stale += 1
+            self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entry when full."""
+        if self.max_size <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        self._stored_at[key] = time.monotonic()
+        while len(self._entries) > self.max_size:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, key: Hashable):
+        """Remove one entry."""
+        self._entries.pop(key, None)
+        self._stored_at.pop(key, None)
+
+    def clear(self):
+        """Remove all entries, keeping statistics."""
+        self._entries.clear()
+        self._stored_at.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters and hit rate."""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'stale': self.stale,
+            'expired': self.expired,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
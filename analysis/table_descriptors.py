@@ -0,0 +1,110 @@
+# analysis/table_descriptors.py: One dense descriptor embedding per table
+# Built from schema, table and column names plus MS_Description text; ranks all tables with one product
+
+import os
+import re
+import hashlib
+import logging
+from typing import Dict, List
+import numpy as np
+from analysis.quantization import quantized_dot
+from feedback.index import ExactIndex, normalize
+
+# Columns beyond this add little once the encoder truncates the descriptor
+MAX_DESCRIPTOR_COLUMNS = 48
+
+def split_identifier(name: str) -> str:
+    """Turn snake_case or camelCase identifiers into lowercase words."""
+    words = re.sub(r'([a-z0-9])([A-Z])', r'\1 \2', name).replace('_', ' ')
+    return ' '.join(words.split()).lower()
+
+def describe_table(schema_dict: Dict, schema: str, table: str) -> str:
+    """Build the descriptor text for a table."""
+    info = schema_dict['tables'][schema][table]
+    columns = schema_dict.get('columns', {}).get(schema, {}).get(table, {})
+    parts = [f"{split_identifier(table)} table in {split_identifier(schema)}"]
+    if isinstance(info, dict) and info.get('description'):
+        parts.append(str(info['description']))
+    names = list(columns)[:MAX_DESCRIPTOR_COLUMNS]
+    if names:
+        parts.append("columns: " + ", ".join(split_identifier(col) for col in names))
+    described = [
+        f"{split_identifier(col)}: {columns[col]['description']}"
+        for col in names if columns[col].get('description')
+    ]
+    if described:
+        parts.append("; ".join(described))
+    return ". ".join(parts)
+
+class TableDescriptorIndex:
+    """Table x dim descriptor matrix aligned with a table name list.
+
+    Vectors are cached in schema_cache/<db>/table_descriptors.npz keyed by a
+    hash of each descriptor text and the encoder name, so only tables whose
+    names, columns or descriptions changed are re-encoded.
+    """
+
+    def __init__(self, db_name: str, encoder, dtype: str = 'float32'):
+        """Initialize with database name, sentence encoder and storage dtype."""
+        self.logger = logging.getLogger("table_identifier")
+        self.encoder = encoder
+        self.cache_path = os.path.join("schema_cache", db_name, "table_descriptors.npz")
+        self.index = ExactIndex(dtype)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def build(self, schema_dict: Dict, table_names: List[str]) -> 'TableDescriptorIndex':
+        """Embed every table in table_names order, reusing cached vectors."""
+        texts = []
+        for table_full in table_names:
+            schema, table = table_full.split('.', 1)
+            texts.append(describe_table(schema_dict, schema, table))
+        hashes = [hashlib.sha1(text.encode('utf-8')).hexdigest() for text in texts]
+        cached = self._load_cache()
+        missing = list(dict.fromkeys(h for h in hashes if h not in cached))
+        if missing:
+            text_by_hash = dict(zip(hashes, texts))
+            vectors = normalize(self.encoder.encode([text_by_hash[h] for h in missing]))
+            cached.update(zip(missing, vectors))
+            self._save_cache(cached, set(hashes))
+            self.logger.debug(f"Encoded {len(missing)} table descriptors")
+        self.index.reset()
+        if hashes:
+            self.index.add([name.lower() for name in table_names], np.stack([cached[h] for h in hashes]))
+        self.logger.debug(f"Built descriptor index for {len(table_names)} tables")
+        return self
+
+    def similarities(self, query_vector: np.ndarray) -> np.ndarray:
+        """Return cosine similarity of the query to every table, in table order."""
+        if not len(self.index):
+            return np.empty(0, dtype=np.float32)
+        codes, scales = self.index.export()
+        return quantized_dot(codes, scales, normalize(query_vector)[0])
+
+    def _load_cache(self) -> Dict[str, np.ndarray]:
+        """Load cached descriptor vectors by text hash for the current encoder."""
+        try:
+            if os.path.exists(self.cache_path):
+                with np.load(self.cache_path, allow_pickle=False) as data:
+                    if str(data['encoder']) != self.encoder.name:
+                        self.logger.debug("Table descriptors were built with another encoder, ignoring")
+                        return {}
+                    return dict(zip((str(h) for h in data['hashes']), data['vectors']))
+        except Exception as e:
+            self.logger.error(f"Error loading table descriptors: {e}")
+        return {}
+
+    def _save_cache(self, vectors: Dict[str, np.ndarray], keep: set):
+        """Persist vectors of the current descriptors."""
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        try:
+            hashes = [h for h in vectors if h in keep]
+            np.savez(
+                self.cache_path,
+                encoder=np.array(self.encoder.name),
+                hashes=np.array(hashes, dtype=str),
+                vectors=np.stack([vectors[h] for h in hashes]).astype(np.float32)
+            )
+        except Exception as e:
+            self.logger.error(f"Error saving table descriptors: {e}")
@@ -1,57 +1,223 @@
 # analysis/table_identifier.py: Identifies tables in queries
-# Uses sentence_transformers and NameMatchManager
+# Uses the shared sentence encoder and NameMatchManager
 
 import spacy
+import numpy as np
 from typing import Dict, List, Optional, Tuple
 import json
 import os
+import time
 import logging
-import logging.config
-from sentence_transformers import SentenceTransformer
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from analysis.name_match_manager import NameMatchManager
+from analysis.weight_matrix import WeightMatrix
+from analysis.parallel_scoring import TableScorer
+from schema.join_graph import JoinGraph
+from schema.lexical_index import LexicalIndex
+from schema.value_index import ValueIndex
+from analysis.result_cache import ResultCache
+from analysis.table_descriptors import TableDescriptorIndex
+from schema.fingerprint import ArtefactManifest, catalog_fingerprint
+from feedback.index import normalize
 
 nlp = spacy.load("en_core_web_sm")
 
+# Threads for speculative NLP scoring; a discarded job may still be finishing when the next starts
+SPECULATIVE_WORKERS = 2
+
 class TableIdentifier:
     """Identifies tables in natural language queries."""
     
-    def __init__(self, schema_dict: Dict, feedback_manager, pattern_manager):
-        """Initialize with schema, feedback, and patterns."""
-        logging_config_path = "app-config/logging_config.ini"
-        if os.path.exists(logging_config_path):
-            try:
-                logging.config.fileConfig(logging_config_path, disable_existing_loggers=False)
-            except Exception as e:
-                print(f"Error loading logging config: {e}")
-        
+    def __init__(
+        self,
+        schema_dict: Dict,
+        feedback_manager,
+        pattern_manager,
+        name_match_manager: Optional[NameMatchManager] = None,
+        join_graph: Optional[JoinGraph] = None,
+        lexical_index: Optional[LexicalIndex] = None,
+        value_index: Optional[ValueIndex] = None
+    ):
+        """Initialize with schema, feedback, patterns and optional shared name matcher, join graph, BM25 and value indexes."""
         self.logger = logging.getLogger("table_identifier")
         self.schema_dict = schema_dict
         self.feedback_manager = feedback_manager
         self.pattern_manager = pattern_manager
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.name_match_manager = NameMatchManager(feedback_manager.db_name)
+        self.name_match_manager = name_match_manager or NameMatchManager(feedback_manager.db_name, feedback_manager.encoder)
+        self.encoder = self.name_match_manager.encoder
+        self.schema_version = schema_dict.get('fingerprint') or catalog_fingerprint(schema_dict)
+        self.manifest = ArtefactManifest(feedback_manager.db_name)
+        self.table_names = [
+            f"{schema}.{table}"
+            for schema in self.schema_dict['tables']
+            for table in self.schema_dict['tables'][schema]
+        ]
         self.weights = self._load_weights()
+        self.name_match_manager.sync_schema(schema_dict, self.schema_version)
+        self.table_ids = {name.lower(): i for i, name in enumerate(self.table_names)}
+        self._scorer: Optional[TableScorer] = None
+        self._descriptors: Optional[TableDescriptorIndex] = None
+        self.descriptor_config = self.name_match_manager.config.get('table_descriptors', {})
+        # Serialises NLP scoring with weight updates once scoring can run on a speculative thread
+        self._scoring_lock = threading.RLock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.join_graph = join_graph or JoinGraph.from_schema(
+            schema_dict, self.name_match_manager.config.get('join_max_hops', 3)
+        )
+        self.lexical_config = self.name_match_manager.config.get('lexical_index', {})
+        self.lexical_index = None
+        if self.lexical_config.get('enabled', False):
+            self.lexical_index = lexical_index or LexicalIndex.from_schema(
+                schema_dict, self.name_match_manager.get_all_synonyms(),
+                self.lexical_config.get('k1', 1.2), self.lexical_config.get('b', 0.75)
+            )
+        self.value_config = self.name_match_manager.config.get('value_index', {})
+        self.value_index = value_index
+        cache_config = self.name_match_manager.config.get('result_cache', {})
+        self.result_cache = ResultCache(cache_config.get('max_size', 1024), cache_config.get('ttl', 3600))
+        self.cache_by_pattern = cache_config.get('key_by_pattern', False)
+        self.cascade_config = self.name_match_manager.config.get('cascade', {})
         self.logger.debug("Initialized TableIdentifier")
 
-    def _load_weights(self) -> Dict:
-        """Load table weights."""
-        weights_path = os.path.join("schema_cache", self.feedback_manager.db_name, "weights.json")
-        if os.path.exists(weights_path):
-            try:
-                with open(weights_path) as f:
-                    self.logger.debug(f"Loaded weights from {weights_path}")
-                    return json.load(f)
-            except Exception as e:
-                self.logger.error(f"Error loading weights: {e}")
-        return {}
-
-    def _save_weights(self):
+    def _get_scorer(self) -> TableScorer:
+        """Build the table scorer over all column embeddings on first use."""
+        if self._scorer is None:
+            columns, owners = [], []
+            for table_id, table_full in enumerate(self.table_names):
+                schema, table = table_full.split('.', 1)
+                for col in self.schema_dict['columns'][schema][table]:
+                    columns.append(col)
+                    owners.append(table_id)
+            column_matrix = normalize(self.name_match_manager.get_column_embeddings(columns)) if columns else np.empty((0, 0))
+            config = self.name_match_manager.config
+            workers = config.get('scoring_workers', 0)
+            if len(self.table_names) < config.get('parallel_min_tables', 2000):
+                workers = 0
+            self._scorer = TableScorer(
+                [name.split('.', 1)[1].lower() for name in self.table_names],
+                np.array(owners, dtype=np.int64),
+                column_matrix,
+                self.name_match_manager.similarity_threshold,
+                workers
+            )
+            self.logger.debug(f"Built table scorer: {len(self.table_names)} tables, {len(columns)} columns, {workers} workers")
+        return self._scorer
+
+    def _lexical_scores(self, query: str) -> Dict[int, float]:
+        """Return BM25 evidence for the best matching tables, scaled so the top table gets the configured weight."""
+        if self.lexical_index is None:
+            return {}
+        hits = self.lexical_index.search(query, self.lexical_config.get('candidates', 50))
+        if not hits or hits[0][1] <= 0:
+            return {}
+        # Tables sharing only a common term with the query would otherwise pad every answer
+        floor = self.lexical_config.get('min_score_ratio', 0.9) * hits[0][1]
+        scale = self.lexical_config.get('weight', 0.3) / hits[0][1]
+        # Doc ids are positions in the (possibly cached) index, not this identifier's table ids
+        scores = {}
+        for doc_id, score in hits:
+            table_id = self.table_ids.get(self.lexical_index.tables[doc_id].lower())
+            if score >= floor and table_id is not None:
+                scores[table_id] = score * scale
+        return scores
+
+    def _value_scores(self, query: str) -> Dict[int, float]:
+        """Return a fixed bonus for tables whose sampled column values contain a query word or phrase."""
+        if self.value_index is None:
+            return {}
+        matches = self.value_index.matches(query, self.value_config.get('max_tables', 3))
+        if matches:
+            self.logger.debug("Value matches: %s", matches)
+        weight = self.value_config.get('weight', 0.3)
+        return {
+            self.table_ids[table.lower()]: weight
+            for table in matches if table.lower() in self.table_ids
+        }
+
+    def _get_descriptors(self) -> Optional[TableDescriptorIndex]:
+        """Build the table descriptor index on first use when retrieval is enabled for this schema size."""
+        if not self.descriptor_config.get('enabled', False):
+            return None
+        if len(self.table_names) < self.descriptor_config.get('min_tables', 500):
+            return None
+        if self._descriptors is None:
+            self._descriptors = TableDescriptorIndex(
+                self.feedback_manager.db_name, self.encoder, self.name_match_manager.embedding_dtype
+            ).build(self.schema_dict, self.table_names)
+        return self._descriptors
+
+    def _score_with_descriptors(
+        self,
+        query: str,
+        token_matrix: np.ndarray,
+        bonus: Dict[int, float],
+        descriptors: TableDescriptorIndex,
+        expired: bool = False
+    ) -> List[Tuple[int, float]]:
+        """Retrieve candidate tables by descriptor similarity, then score only their columns."""
+        scorer = self._get_scorer()
+        candidates = list(bonus) + scorer.name_matches(query)
+        similarities = np.zeros(len(self.table_names), dtype=np.float32)
+        if not expired:
+            similarities = descriptors.similarities(self.encoder.encode(query))
+            count = min(self.descriptor_config.get('candidates', 100), len(similarities))
+            if count:
+                candidates.extend(np.argpartition(-similarities, count - 1)[:count].tolist())
+        weight = self.descriptor_config.get('weight', 0.5)
+        # Only descriptors close to the best one add evidence; the rest are candidates for column scoring only
+        floor = max(
+            self.descriptor_config.get('min_score_ratio', 0.8) * float(similarities.max(initial=0.0)),
+            self.descriptor_config.get('min_similarity', 0.25)
+        )
+        bonus = dict(bonus)
+        for table_id in set(candidates):
+            if similarities[table_id] >= floor:
+                bonus[table_id] = bonus.get(table_id, 0.0) + weight * float(similarities[table_id])
+        return scorer.score_candidates(token_matrix, query, bonus, np.array(candidates, dtype=np.int64), k=5)
+
+    def close(self):
+        """Release speculative threads and scoring workers."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        with self._scoring_lock:
+            if self._scorer is not None:
+                self._scorer.close()
+                self._scorer = None
+
+    def _load_weights(self) -> WeightMatrix:
+        """Load table weights, dropping tables removed since they were saved."""
+        cache_dir = os.path.join("schema_cache", self.feedback_manager.db_name)
+        matrix_path = os.path.join(cache_dir, "weights.npz")
+        legacy_path = os.path.join(cache_dir, "weights.json")
+        weights = WeightMatrix()
+        try:
+            if os.path.exists(matrix_path):
+                weights = WeightMatrix.load(matrix_path)
+                self.logger.debug(f"Loaded {len(weights)} weights from {matrix_path}")
+            elif os.path.exists(legacy_path):
+                with open(legacy_path) as f:
+                    weights = WeightMatrix.from_dict(json.load(f))
+                self.logger.debug(f"Migrated {len(weights)} weights from {legacy_path}")
+        except Exception as e:
+            self.logger.error(f"Error loading weights: {e}")
+            return WeightMatrix()
+        
+        if len(weights.tables) and not self.manifest.is_current('weights', self.schema_version):
+            removed = weights.retain_tables(self.table_names)
+            if removed:
+                self.logger.info(f"Schema changed: dropped learned weights for {removed} removed tables")
+            self._save_weights(weights)
+        return weights
+
+    def _save_weights(self, weights: Optional[WeightMatrix] = None):
         """Save table weights."""
-        weights_path = os.path.join("schema_cache", self.feedback_manager.db_name, "weights.json")
+        weights_path = os.path.join("schema_cache", self.feedback_manager.db_name, "weights.npz")
         os.makedirs(os.path.dirname(weights_path), exist_ok=True)
         try:
-            with open(weights_path, 'w') as f:
-                json.dump(self.weights, f)
+            (weights if weights is not None else self.weights).save(weights_path)
+            self.manifest.record('weights', self.schema_version)
             self.logger.debug(f"Saved weights to {weights_path}")
         except Exception as e:
             self.logger.error(f"Error saving weights: {e}")
@@ -61,74 +227,234 @@ class TableIdentifier:
         self.name_match_manager.save_to_default()
         self.logger.debug("Saved name matches")
 
-    def identify_tables(self, query: str) -> Tuple[Optional[List[str]], bool]:
+    def identify_tables(self, query: str, deadline: Optional[float] = None) -> Tuple[Optional[List[str]], bool]:
         """Identify tables in query."""
-        self.logger.debug(f"Identifying tables for query: {query}")
-        feedback = self.feedback_manager.get_similar_feedback(query)
-        if feedback and feedback[0]['tables']:
-            tables = feedback[0]['tables']
-            valid_tables, _ = self.feedback_manager.validate_tables(tables, self.schema_dict)
+        result = self.identify_tables_cascade(query, deadline)
+        return result['tables'], result['confidence']
+
+    def identify_tables_cascade(self, query: str, deadline: Optional[float] = None) -> Dict:
+        """Run cache, exact, pattern, semantic and NLP tiers in order, stopping at the first confident one.
+
+        deadline is a time.monotonic() value; without one, cascade.deadline_ms from global
+        defaults applies (0 means no limit). Once it passes, the best answer so far is
+        returned unconfident with timed_out set. 'tiers' maps each tier that ran to its confidence.
+        """
+        started = time.monotonic()
+        if deadline is None and self.cascade_config.get('deadline_ms'):
+            deadline = started + self.cascade_config['deadline_ms'] / 1000
+        self.logger.debug("Identifying tables for query: %s", query)
+        result = {'tables': None, 'confidence': False, 'tier': None, 'tiers': {}, 'timed_out': False}
+        
+        cache_key = self.pattern_manager.normalize_query(query, self.cache_by_pattern)
+        feedback_generation = self.feedback_manager.get_generation()
+        cached = self.result_cache.get(cache_key, lambda entry: self._is_cache_valid(entry, feedback_generation))
+        result['tiers']['cache'] = 1.0 if cached else 0.0
+        if cached:
+            self.logger.debug("Result cache hit for query: %s", query)
+            return self._finish_cascade(result, started, list(cached['tables']), cached['confidence'], 'cache')
+        
+        entry = {'schema': self.schema_version, 'feedback': feedback_generation, 'lemmas': None}
+        for tier, lookup in (('exact', self.feedback_manager.get_exact_feedback), ('pattern', self.feedback_manager.get_pattern_feedback)):
+            valid_tables = self._feedback_tables(lookup(query))
+            result['tiers'][tier] = 1.0 if valid_tables else 0.0
             if valid_tables:
-                self.logger.info(f"Used feedback tables: {valid_tables}")
-                return valid_tables, True
-        return self._identify_tables_nlp(query)
+                self.logger.info(f"Used {tier} feedback tables: {valid_tables}")
+                self.result_cache.put(cache_key, {**entry, 'tables': tuple(valid_tables), 'confidence': True})
+                return self._finish_cascade(result, started, valid_tables, True, tier)
+        
+        # Start NLP scoring now so a semantic miss costs max(feedback, NLP) rather than their sum
+        speculative: Optional[Future] = None
+        cancel = threading.Event()
+        if self.cascade_config.get('speculative', False) and not self._expired(deadline):
+            speculative = self._get_executor().submit(self._run_nlp_tier, query, deadline, cancel)
+        
+        # Below-threshold semantic matches are kept as the fallback answer if time runs out
+        fallback = None
+        if self._expired(deadline):
+            result['timed_out'] = True
+        else:
+            feedback = self.feedback_manager.get_semantic_feedback(
+                query, self.cascade_config.get('fallback_threshold', 0.6)
+            )
+            similarity = feedback[0]['similarity'] if feedback else 0.0
+            valid_tables = self._feedback_tables(feedback)
+            result['tiers']['semantic'] = similarity
+            if valid_tables and similarity >= self.cascade_config.get('semantic_threshold', 0.85):
+                self._discard(speculative, cancel)
+                self.logger.info(f"Used semantic feedback tables: {valid_tables}")
+                self.result_cache.put(cache_key, {**entry, 'tables': tuple(valid_tables), 'confidence': True})
+                return self._finish_cascade(result, started, valid_tables, True, 'semantic')
+            if valid_tables:
+                fallback = valid_tables
+        
+        if fallback and self._expired(deadline):
+            self._discard(speculative, cancel)
+            result['timed_out'] = True
+            return self._finish_cascade(result, started, fallback, False, 'semantic')
+        
+        scored = speculative.result() if speculative is not None else self._run_nlp_tier(query, deadline)
+        if speculative is not None:
+            result['speculative'] = True
+        tables, confidence = scored['tables'], scored['confidence']
+        result['tiers']['nlp'] = scored['score']
+        if not scored['complete']:
+            result['timed_out'] = True
+            self.logger.info(f"Deadline reached during table scoring for query: {query}")
+            if fallback:
+                return self._finish_cascade(result, started, fallback, False, 'semantic')
+            return self._finish_cascade(result, started, tables, False, 'nlp')
+        if tables is not None:
+            self.result_cache.put(cache_key, {
+                **entry, 'lemmas': scored['lemmas'], 'weights': scored['weights'],
+                'tables': tuple(tables), 'confidence': confidence
+            })
+        return self._finish_cascade(result, started, tables, confidence, 'nlp')
 
-    def _identify_tables_nlp(self, query: str) -> Tuple[Optional[List[str]], bool]:
-        """Identify tables using NLP."""
-        try:
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Start the speculative scoring threads on first use."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=SPECULATIVE_WORKERS, thread_name_prefix="speculative-nlp")
+        return self._executor
+
+    @staticmethod
+    def _discard(speculative: Optional[Future], cancel: threading.Event):
+        """Drop a speculative NLP job: unstarted jobs never run, running ones stop at the next stage."""
+        if speculative is not None:
+            cancel.set()
+            speculative.cancel()
+
+    def _run_nlp_tier(self, query: str, deadline: Optional[float] = None, cancel: Optional[threading.Event] = None) -> Dict:
+        """Run NLP scoring, recording the lemmas and weight version the result depends on."""
+        with self._scoring_lock:
+            if cancel is not None and cancel.is_set():
+                return {'tables': None, 'confidence': False, 'score': 0.0, 'complete': False}
             doc = nlp(query.lower())
-            table_scores = {}
-            token_embeddings = self.name_match_manager.get_token_embeddings([t.lemma_ for t in doc])
+            lemmas = tuple(t.lemma_.lower() for t in doc)
+            weights_version = self.weights.version(lemmas)
+            tables, confidence, best_score, complete = self._identify_tables_nlp(query, doc, deadline, cancel)
+        return {
+            'tables': tables,
+            'confidence': confidence,
+            'score': best_score,
+            'complete': complete,
+            'lemmas': lemmas,
+            'weights': weights_version
+        }
+
+    def _feedback_tables(self, feedback: Optional[List[Dict]]) -> List[str]:
+        """Return the best feedback entry's tables that still exist in the schema."""
+        if not feedback or not feedback[0]['tables']:
+            return []
+        valid_tables, _ = self.feedback_manager.validate_tables(feedback[0]['tables'], self.schema_dict)
+        return valid_tables
+
+    @staticmethod
+    def _expired(deadline: Optional[float]) -> bool:
+        """Check whether a time.monotonic() deadline has passed."""
+        return deadline is not None and time.monotonic() >= deadline
+
+    def _finish_cascade(self, result: Dict, started: float, tables: Optional[List[str]], confidence: bool, tier: str) -> Dict:
+        """Fill in the answer and timing of a cascade result."""
+        result.update(
+            tables=tables,
+            confidence=confidence,
+            tier=tier,
+            elapsed_ms=round(1000 * (time.monotonic() - started), 2)
+        )
+        self.logger.debug(
+            "Cascade answered by %s after %s in %.1f ms (timed out: %s)",
+            tier, list(result['tiers']), result['elapsed_ms'], result['timed_out']
+        )
+        return result
+
+    def _is_cache_valid(self, entry: Dict, feedback_generation: int) -> bool:
+        """Check a cached result against current schema, feedback and learned weights."""
+        if entry['schema'] != self.schema_version or entry['feedback'] != feedback_generation:
+            return False
+        return entry['lemmas'] is None or self.weights.version(entry['lemmas']) == entry['weights']
+
+    def get_cache_stats(self) -> Dict[str, float]:
+        """Return result cache statistics."""
+        return self.result_cache.stats()
+
+    def _identify_tables_nlp(
+        self,
+        query: str,
+        doc=None,
+        deadline: Optional[float] = None,
+        cancel: Optional[threading.Event] = None
+    ) -> Tuple[Optional[List[str]], bool, float, bool]:
+        """Identify tables using NLP; return tables, confidence, best score and whether scoring finished."""
+        try:
+            if doc is None:
+                doc = nlp(query.lower())
+            # Past the deadline only table names and learned weights are scored
+            expired = self._expired(deadline)
+            token_embeddings = np.empty(0) if expired else self.name_match_manager.get_token_embeddings([t.lemma_ for t in doc])
+            pattern_weights = self.pattern_manager.get_pattern_weights(query)
+            learned_weights = self.weights.score(t.lemma_.lower() for t in doc)
             
-            for schema in self.schema_dict['tables']:
-                for table in self.schema_dict['tables'][schema]:
-                    table_full = f"{schema}.{table}"
-                    score = 0.0
-                    
-                    if table.lower() in query.lower():
-                        score += 0.5
-                    
-                    for col in self.schema_dict['columns'][schema][table]:
-                        col_score = self.name_match_manager.get_column_score(col, token_embeddings)
-                        score += col_score * 0.8
-                    
-                    score += self.pattern_manager.get_pattern_weight(query, table_full)
-                    for token in doc:
-                        lemma = token.lemma_.lower()
-                        score += self.weights.get(table_full, {}).get(lemma, 0.0)
-                    
-                    if score > 0:
-                        table_scores[table_full] = score
+            bonus: Dict[int, float] = {}
+            for weights in (pattern_weights, learned_weights):
+                for table_full, weight in weights.items():
+                    table_id = self.table_ids.get(table_full.lower())
+                    if table_id is not None:
+                        bonus[table_id] = bonus.get(table_id, 0.0) + weight
+            for scores in (self._lexical_scores(query), self._value_scores(query)):
+                for table_id, weight in scores.items():
+                    bonus[table_id] = bonus.get(table_id, 0.0) + weight
             
-            sorted_tables = sorted(table_scores.items(), key=lambda x: x[1], reverse=True)[:5]
-            selected_tables = [table for table, _ in sorted_tables]
+            if cancel is not None and cancel.is_set():
+                return None, False, 0.0, False
+            token_matrix = normalize(token_embeddings) if token_embeddings.size else np.empty((0, 0))
+            descriptors = self._get_descriptors()
+            if descriptors is not None:
+                top_tables, complete = self._score_with_descriptors(query, token_matrix, bonus, descriptors, expired), True
+            else:
+                top_tables, complete = self._get_scorer().score_within(token_matrix, query, bonus, k=5, deadline=deadline)
+            complete = complete and not expired
+            selected_tables = [self.table_names[table_id] for table_id, _ in top_tables]
+            if self.name_match_manager.config.get('bridge_tables', True):
+                bridges = self.join_graph.bridge_tables(selected_tables)
+                if bridges:
+                    self.logger.debug("Added bridge tables: %s", bridges)
+                    selected_tables.extend(bridges)
             
             confidence = bool(selected_tables)
-            self.logger.debug(f"Tables: {selected_tables}, Confidence: {confidence}")
-            return selected_tables or None, confidence
+            self.logger.debug("Tables: %s, Confidence: %s", selected_tables, confidence)
+            return selected_tables or None, confidence, top_tables[0][1] if top_tables else 0.0, complete
         
         except Exception as e:
             self.logger.error(f"NLP error: {e}")
-            return None, False
+            return None, False, 0.0, True
 
     def update_weights_from_feedback(self, query: str, tables: List[str]):
         """Update weights based on feedback."""
-        self.logger.debug(f"Updating weights for query: {query}, Tables: {tables}")
+        self.logger.debug("Updating weights for query: %s, Tables: %s", query, tables)
         doc = nlp(query.lower())
         tokens = [token.lemma_.lower() for token in doc if token.pos_ in ('NOUN', 'VERB', 'ADJ')]
+        config = self.name_match_manager.config
         
+        table_columns = {}
         for table in tables:
             schema, table_name = table.split('.')
-            columns = self.schema_dict['columns'][schema][table_name]
-            token_embeddings = self.name_match_manager.get_token_embeddings(tokens)
-            self.name_match_manager.update_synonyms(tokens, token_embeddings, columns)
-            
-            unmatched = self.name_match_manager.get_unmatched_tokens(tokens, columns)
-            table_weights = self.weights.get(table, {})
-            for token in unmatched:
-                table_weights[token] = table_weights.get(token, 0.0) + 0.1
-            self.weights[table] = table_weights
+            table_columns[table] = list(self.schema_dict['columns'][schema][table_name])
+        token_embeddings = self.name_match_manager.get_token_embeddings(tokens)
+        # Candidates were already queued when the query was processed; only learn accepted synonyms here
+        self.name_match_manager.update_synonyms_batch(
+            tokens, token_embeddings, [col for columns in table_columns.values() for col in columns]
+        )
         
-        self._save_weights()
+        with self._scoring_lock:
+            self.weights.decay(config.get('weight_decay', 1.0))
+            for table, columns in table_columns.items():
+                unmatched = self.name_match_manager.get_unmatched_tokens(tokens, columns)
+                for token in unmatched:
+                    self.weights.add(table, token, 0.1)
+            
+            pruned = self.weights.prune(config.get('weight_prune_threshold', 0.01))
+            if pruned:
+                self.logger.debug("Pruned %s stale weights", pruned)
+            self._save_weights()
         self.name_match_manager.save_dynamic()
-        self.logger.debug("Weights updated")
\ No newline at end of file
+        self.logger.debug("Weights updated")
@@ -0,0 +1,168 @@
+# analysis/weight_matrix.py: Sparse table x lemma matrix for learned weights
+
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+from scipy import sparse
+
+class WeightMatrix:
+    """Vocabulary-indexed sparse matrix of learned token->table weights."""
+
+    def __init__(self):
+        """Initialize an empty matrix."""
+        self.tables: List[str] = []
+        self.table_index: Dict[str, int] = {}
+        self.lemmas: List[str] = []
+        self.vocab: Dict[str, int] = {}
+        self._matrix = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._pending: Dict[Tuple[int, int], float] = {}
+        # Change counters for cache validation: global for whole-matrix edits, per lemma otherwise
+        self.generation = 0
+        self._clock = 0
+        self.lemma_generations: Dict[str, int] = {}
+
+    def _touch(self, lemmas: Iterable[str]):
+        """Record that weights of the given lemmas changed."""
+        self._clock += 1
+        for lemma in lemmas:
+            self.lemma_generations[lemma] = self._clock
+
+    def version(self, lemmas: Iterable[str]) -> Tuple[int, int]:
+        """Return a token that changes whenever the score of these lemmas may change."""
+        return self.generation, max((self.lemma_generations.get(l, 0) for l in lemmas), default=0)
+
+    def _table_id(self, table: str) -> int:
+        """Return row id for table, adding it if new."""
+        if table not in self.table_index:
+            self.table_index[table] = len(self.tables)
+            self.tables.append(table)
+        return self.table_index[table]
+
+    def _lemma_id(self, lemma: str) -> int:
+        """Return column id for lemma, adding it if new."""
+        if lemma not in self.vocab:
+            self.vocab[lemma] = len(self.lemmas)
+            self.lemmas.append(lemma)
+        return self.vocab[lemma]
+
+    def _flush(self):
+        """Merge pending incremental updates into the CSR matrix."""
+        shape = (len(self.tables), len(self.lemmas))
+        if self._matrix.shape != shape:
+            self._matrix.resize(shape)
+        if self._pending:
+            rows, cols = zip(*self._pending.keys())
+            delta = sparse.csr_matrix(
+                (np.fromiter(self._pending.values(), dtype=np.float32), (rows, cols)),
+                shape=shape
+            )
+            self._matrix = (self._matrix + delta).tocsr()
+            self._pending.clear()
+
+    def add(self, table: str, lemma: str, delta: float):
+        """Add delta to the weight of lemma for table."""
+        key = (self._table_id(table), self._lemma_id(lemma))
+        self._pending[key] = self._pending.get(key, 0.0) + delta
+        self._touch((lemma,))
+
+    def get(self, table: str, lemma: str) -> float:
+        """Return weight of lemma for table."""
+        if table not in self.table_index or lemma not in self.vocab:
+            return 0.0
+        self._flush()
+        return float(self._matrix[self.table_index[table], self.vocab[lemma]])
+
+    def score(self, lemmas: Iterable[str]) -> Dict[str, float]:
+        """Score a bag of lemmas against all tables in one sparse product."""
+        self._flush()
+        counts = np.zeros(len(self.lemmas), dtype=np.float32)
+        for lemma in lemmas:
+            idx = self.vocab.get(lemma)
+            if idx is not None:
+                counts[idx] += 1.0
+        if not counts.any():
+            return {}
+        scores = self._matrix @ counts
+        return {self.tables[i]: float(scores[i]) for i in np.flatnonzero(scores)}
+
+    def decay(self, factor: float):
+        """Multiply all weights by factor."""
+        if factor == 1.0:
+            return
+        self._flush()
+        self._matrix.data *= factor
+        self.generation += 1
+
+    def prune(self, min_weight: float) -> int:
+        """Drop weights below min_weight and return how many were removed."""
+        self._flush()
+        stale = np.abs(self._matrix.data) < min_weight
+        removed = int(stale.sum())
+        if removed:
+            self._touch(self.lemmas[i] for i in np.unique(self._matrix.indices[stale]))
+            self._matrix.data[stale] = 0.0
+            self._matrix.eliminate_zeros()
+        return removed
+
+    def retain_tables(self, tables: Iterable[str]) -> int:
+        """Drop rows of tables not among the given names (case-insensitive); return how many were removed."""
+        self._flush()
+        keep_names = {table.lower() for table in tables}
+        keep = [i for i, table in enumerate(self.tables) if table.lower() in keep_names]
+        removed = len(self.tables) - len(keep)
+        if removed:
+            self._matrix = self._matrix[keep].tocsr()
+            self.tables = [self.tables[i] for i in keep]
+            self.table_index = {t: i for i, t in enumerate(self.tables)}
+            self.generation += 1
+        return removed
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        """Return weights as nested {table: {lemma: weight}} dict."""
+        self._flush()
+        coo = self._matrix.tocoo()
+        weights: Dict[str, Dict[str, float]] = {}
+        for row, col, value in zip(coo.row, coo.col, coo.data):
+            weights.setdefault(self.tables[row], {})[self.lemmas[col]] = float(value)
+        return weights
+
+    @classmethod
+    def from_dict(cls, weights: Dict[str, Dict[str, float]]) -> "WeightMatrix":
+        """Build matrix from nested {table: {lemma: weight}} dict."""
+        matrix = cls()
+        for table, lemma_weights in weights.items():
+            for lemma, weight in lemma_weights.items():
+                matrix.add(table, lemma, float(weight))
+        matrix._flush()
+        return matrix
+
+    def save(self, path: str):
+        """Save matrix in compressed npz format."""
+        self._flush()
+        np.savez_compressed(
+            path,
+            data=self._matrix.data.astype(np.float32),
+            indices=self._matrix.indices.astype(np.int32),
+            indptr=self._matrix.indptr.astype(np.int32),
+            tables=np.array(self.tables, dtype=str),
+            lemmas=np.array(self.lemmas, dtype=str)
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "WeightMatrix":
+        """Load matrix saved with save()."""
+        matrix = cls()
+        with np.load(path, allow_pickle=False) as data:
+            matrix.tables = [str(t) for t in data['tables']]
+            matrix.lemmas = [str(l) for l in data['lemmas']]
+            matrix.table_index = {t: i for i, t in enumerate(matrix.tables)}
+            matrix.vocab = {l: i for i, l in enumerate(matrix.lemmas)}
+            matrix._matrix = sparse.csr_matrix(
+                (data['data'], data['indices'], data['indptr']),
+                shape=(len(matrix.tables), len(matrix.lemmas))
+            )
+        return matrix
+
+    def __len__(self) -> int:
+        """Return number of stored weights."""
+        self._flush()
+        return self._matrix.nnz
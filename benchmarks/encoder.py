@@ -0,0 +1,105 @@
+# benchmarks/encoder.py: Parity and speed of ONNX encoders against the PyTorch path
+# Usage: python -m benchmarks.encoder --export --db BikeStores
+# Exits non-zero when an ONNX encoder's cosine scores drift past the tolerance
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import numpy as np
+from analysis.encoder import ONNX_FILES, OnnxEncoder, TorchEncoder, export_onnx
+
+SAMPLE_TEXTS = [
+    "show all customers from new york",
+    "list products with list price above 500",
+    "which stores have the most staff",
+    "orders shipped late in 2018",
+    "total quantity in stock per store",
+    "brand names of mountain bikes",
+    "customer email and phone",
+    "order_date", "required_date", "shipped_date", "list_price", "model_year",
+    "first_name", "last_name", "zip_code", "manager_id", "category_name", "quantity"
+]
+
+# Minimum per-text cosine between ONNX and PyTorch embeddings, and maximum score error
+TOLERANCE = {'fp32': (0.9999, 1e-3), 'int8': (0.98, 0.05)}
+
+def load_texts(db_name: str) -> list:
+    """Feedback queries for the database, padded with built-in samples."""
+    texts = []
+    for path in sorted(glob.glob(os.path.join("feedback_cache", db_name, "*_meta.json"))):
+        with open(path) as f:
+            texts.append(json.load(f)['query'])
+    return list(dict.fromkeys(texts + SAMPLE_TEXTS))
+
+def time_encoder(encoder, texts: list, batch_size: int, repeat: int) -> tuple:
+    """Return single-text p50/p95 latency in ms and batched throughput in texts/s."""
+    encoder.encode(texts[:batch_size])  # warm up
+    latencies = []
+    for _ in range(repeat):
+        for text in texts:
+            start = time.perf_counter()
+            encoder.encode(text)
+            latencies.append(1000 * (time.perf_counter() - start))
+    start = time.perf_counter()
+    for _ in range(repeat):
+        encoder.encode(texts, batch_size=batch_size)
+    throughput = repeat * len(texts) / (time.perf_counter() - start)
+    return float(np.percentile(latencies, 50)), float(np.percentile(latencies, 95)), throughput
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default="BikeStores")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--onnx-dir", default=None, help="defaults to models/<model>")
+    parser.add_argument("--export", action="store_true", help="export the ONNX models first")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=0)
+    args = parser.parse_args()
+
+    onnx_dir = args.onnx_dir or os.path.join("models", args.model)
+    if args.export:
+        start = time.perf_counter()
+        export_onnx(args.model, onnx_dir)
+        print(f"Exported {args.model} to {onnx_dir} in {time.perf_counter() - start:.1f}s")
+
+    texts = load_texts(args.db)
+    start = time.perf_counter()
+    encoders = {'torch': TorchEncoder(args.model, args.batch_size)}
+    load_times = {'torch': time.perf_counter() - start}
+    for precision in ONNX_FILES:
+        if not os.path.exists(os.path.join(onnx_dir, ONNX_FILES[precision])):
+            print(f"skipping onnx-{precision}: {ONNX_FILES[precision]} not in {onnx_dir}")
+            continue
+        start = time.perf_counter()
+        encoders[precision] = OnnxEncoder(onnx_dir, precision, args.batch_size, threads=args.threads)
+        load_times[precision] = time.perf_counter() - start
+
+    reference = encoders['torch'].encode(texts)
+    reference_scores = reference @ reference.T
+    reference_top1 = np.argsort(-reference_scores, axis=1)[:, 1]
+    print(f"{len(texts)} texts, dim {reference.shape[1]}")
+    print(f"{'encoder':<8}{'load s':>8}{'p50 ms':>9}{'p95 ms':>9}{'texts/s':>10}"
+          f"{'min cos':>10}{'max |dS|':>10}{'top1':>7}")
+    failed = False
+    for name, encoder in encoders.items():
+        embeddings = encoder.encode(texts)
+        agreement = np.sum(embeddings * reference, axis=1)
+        scores = embeddings @ embeddings.T
+        score_error = np.abs(scores - reference_scores).max()
+        top1 = np.mean(np.argsort(-scores, axis=1)[:, 1] == reference_top1)
+        p50, p95, throughput = time_encoder(encoder, texts, args.batch_size, args.repeat)
+        print(f"{name:<8}{load_times[name]:>8.2f}{p50:>9.2f}{p95:>9.2f}{throughput:>10.1f}"
+              f"{agreement.min():>10.5f}{score_error:>10.2e}{top1:>7.2f}")
+        if name in TOLERANCE:
+            min_cosine, max_error = TOLERANCE[name]
+            if agreement.min() < min_cosine or score_error > max_error:
+                print(f"parity failed for onnx-{name}: cosine >= {min_cosine} and |dS| <= {max_error} required")
+                failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
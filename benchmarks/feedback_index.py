@@ -0,0 +1,70 @@
+# benchmarks/feedback_index.py: Compares approximate feedback indexes against exact search
+# Usage: python -m benchmarks.feedback_index --size 200000 --queries 200
+
+import argparse
+import time
+from typing import List
+import numpy as np
+from feedback.index import ExactIndex, IVFIndex, FaissIndex, faiss
+
+def synthetic_embeddings(size: int, dim: int, clusters: int, noise: float, seed: int) -> np.ndarray:
+    """Generate clustered unit vectors resembling sentence embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size)
+    vectors = centers[labels] + noise * rng.standard_normal((size, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def evaluate(index, queries: np.ndarray, truth: List[set], k: int):
+    """Return recall@k and mean latency in milliseconds."""
+    hits = 0
+    start = time.perf_counter()
+    results = [index.search(q, k) for q in queries]
+    elapsed = time.perf_counter() - start
+    for result, expected in zip(results, truth):
+        hits += len({item_id for item_id, _ in result} & expected)
+    return hits / (k * len(queries)), 1000 * elapsed / len(queries)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--noise", type=float, default=1.0)
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    args = parser.parse_args()
+
+    vectors = synthetic_embeddings(args.size + args.queries, args.dim, clusters=args.size // 50 or 1, noise=args.noise, seed=0)
+    data, queries = vectors[:args.size], vectors[args.size:]
+    ids = [str(i) for i in range(args.size)]
+
+    exact = ExactIndex()
+    exact.add(ids, data)
+    truth = [{item_id for item_id, _ in exact.search(q, args.k)} for q in queries]
+    _, exact_ms = evaluate(exact, queries, truth, args.k)
+    print(f"{'index':<24}{'build s':>10}{'recall@' + str(args.k):>12}{'ms/query':>12}")
+    print(f"{'exact':<24}{0.0:>10.2f}{1.0:>12.3f}{exact_ms:>12.3f}")
+
+    start = time.perf_counter()
+    ivf = IVFIndex(nlist=args.nlist)
+    ivf.add(ids, data)
+    build = time.perf_counter() - start
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        recall, ms = evaluate(ivf, queries, truth, args.k)
+        print(f"{'ivf nprobe=' + str(nprobe):<24}{build:>10.2f}{recall:>12.3f}{ms:>12.3f}")
+
+    if faiss is not None:
+        start = time.perf_counter()
+        hnsw = FaissIndex()
+        hnsw.add(ids, data)
+        build = time.perf_counter() - start
+        for ef in (16, 64, 256):
+            hnsw._index.hnsw.efSearch = ef
+            recall, ms = evaluate(hnsw, queries, truth, args.k)
+            print(f"{'faiss hnsw ef=' + str(ef):<24}{build:>10.2f}{recall:>12.3f}{ms:>12.3f}")
+
+if __name__ == "__main__":
+    main()
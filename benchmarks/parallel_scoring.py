@@ -0,0 +1,52 @@
+# benchmarks/parallel_scoring.py: Throughput of sharded table scoring on a synthetic schema
+# Usage: python -m benchmarks.parallel_scoring --tables 20000 --workers 0 2 4 8
+
+import argparse
+import os
+import time
+import numpy as np
+from analysis.parallel_scoring import TableScorer
+from feedback.index import normalize
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tables", type=int, default=20000)
+    parser.add_argument("--columns", type=int, default=12, help="columns per table")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--tokens", type=int, default=8, help="tokens per query")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    table_names = [f"table_{i}" for i in range(args.tables)]
+    owners = np.repeat(np.arange(args.tables), args.columns)
+    columns = normalize(rng.standard_normal((len(owners), args.dim)).astype(np.float32))
+    queries = [
+        (normalize(rng.standard_normal((args.tokens, args.dim)).astype(np.float32)), f"show table_{i} rows")
+        for i in rng.integers(0, args.tables, args.queries)
+    ]
+    print(f"{args.tables} tables, {len(owners)} columns, dim {args.dim}, {os.cpu_count()} cpus")
+    print(f"{'workers':>8}{'setup s':>10}{'ms/query':>12}{'queries/s':>12}{'speedup':>10}")
+
+    baseline = None
+    reference = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        scorer = TableScorer(table_names, owners, columns, threshold=0.1, workers=workers)
+        scorer.score(*queries[0], {}, k=5)  # warm up workers
+        setup = time.perf_counter() - start
+        start = time.perf_counter()
+        results = [scorer.score(tokens, text, {}, k=5) for tokens, text in queries]
+        elapsed = time.perf_counter() - start
+        scorer.close()
+        if reference is None:
+            reference = results
+        elif [[t for t, _ in r] for r in results] != [[t for t, _ in r] for r in reference]:
+            print(f"warning: top-k differs from in-process result with {workers} workers")
+        qps = len(queries) / elapsed
+        baseline = baseline or qps
+        print(f"{workers:>8}{setup:>10.2f}{1000 * elapsed / len(queries):>12.2f}{qps:>12.1f}{qps / baseline:>10.2f}")
+
+if __name__ == "__main__":
+    main()
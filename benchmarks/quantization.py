@@ -0,0 +1,50 @@
+# benchmarks/quantization.py: Accuracy and memory of quantized feedback embeddings
+# Usage: python -m benchmarks.quantization --db BikeStores
+
+import argparse
+import glob
+import os
+import numpy as np
+from feedback.index import ExactIndex
+
+def load_feedback_embeddings(db_name: str) -> np.ndarray:
+    """Load every stored feedback embedding for a database."""
+    paths = sorted(glob.glob(os.path.join("feedback_cache", db_name, "*_emb.npy")))
+    return np.vstack([np.load(path).reshape(1, -1) for path in paths])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default="BikeStores")
+    parser.add_argument("--threshold", type=float, default=0.85)
+    args = parser.parse_args()
+
+    vectors = load_feedback_embeddings(args.db)
+    ids = [str(i) for i in range(len(vectors))]
+    indexes = {}
+    for dtype in ('float32', 'float16', 'int8'):
+        indexes[dtype] = ExactIndex(dtype)
+        indexes[dtype].add(ids, vectors)
+
+    # Leave-one-out: each stored query searches the rest of the store
+    reference = {}
+    for i, vector in enumerate(vectors):
+        reference[i] = dict(indexes['float32'].search(vector, len(ids)))
+
+    print(f"{len(vectors)} feedback embeddings from feedback_cache/{args.db}")
+    print(f"{'dtype':<10}{'bytes/vec':>10}{'max |err|':>12}{'mean |err|':>12}{'top1 agree':>12}{'flips':>8}")
+    for dtype, index in indexes.items():
+        errors, agree, flips = [], 0, 0
+        for i, vector in enumerate(vectors):
+            result = dict(index.search(vector, len(ids)))
+            ref = reference[i]
+            for item_id, sim in result.items():
+                errors.append(abs(sim - ref[item_id]))
+                if item_id != str(i) and (sim >= args.threshold) != (ref[item_id] >= args.threshold):
+                    flips += 1
+            ranked = lambda sims: max((s, j) for j, s in sims.items() if j != str(i))[1]
+            agree += ranked(result) == ranked(ref)
+        print(f"{dtype:<10}{index.nbytes / len(ids):>10.0f}{max(errors):>12.2e}{np.mean(errors):>12.2e}"
+              f"{agree / len(vectors):>12.3f}{flips:>8d}")
+
+if __name__ == "__main__":
+    main()
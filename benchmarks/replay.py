@@ -0,0 +1,200 @@
+# benchmarks/replay.py: Replays stored feedback queries through TableIdentifier as a labelled test set
+# Usage: python -m benchmarks.replay --db BikeStores --config baseline --config int8:embedding_dtype=int8
+# Feedback lookups are held out, so every query is answered by the NLP tier (or the result cache, cleared per query)
+# Learned table weights and dynamic synonyms are trained on these same queries, so they are held out too unless --with-learned
+
+import argparse
+import copy
+import glob
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Tuple
+import numpy as np
+from analysis.encoder import get_encoder
+from analysis.name_match_manager import NameMatchManager
+from analysis.table_identifier import TableIdentifier
+from analysis.weight_matrix import WeightMatrix
+from cli.profiling import ProfileSession
+from config.logging_setup import configure_logging
+from config.patterns import PatternManager
+from feedback.manager import FeedbackManager
+from schema.manager import SchemaManager
+
+class HeldOutFeedback:
+    """FeedbackManager view whose lookups always miss, so replayed queries cannot see their own labels."""
+
+    def __init__(self, feedback_manager: FeedbackManager):
+        """Wrap a feedback manager."""
+        self._feedback_manager = feedback_manager
+
+    def __getattr__(self, name):
+        return getattr(self._feedback_manager, name)
+
+    def get_exact_feedback(self, query: str):
+        return None
+
+    def get_pattern_feedback(self, query: str):
+        return None
+
+    def get_semantic_feedback(self, query: str, threshold: float = 0.85):
+        return None
+
+    def get_similar_feedback(self, query: str, threshold: float = 0.85):
+        return None
+
+def hold_out_learned(name_matcher: NameMatchManager):
+    """Drop dynamic synonyms learned from feedback, leaving only the default name matches."""
+    name_matcher.dynamic_matches = {}
+    name_matcher.synonym_index = name_matcher._build_synonym_index()
+
+def load_gold(db_name: str, schema_dict: Dict) -> List[Tuple[str, List[str], int]]:
+    """Return (query, tables, count) for every stored feedback entry with tables still in the schema."""
+    known = {
+        f"{schema}.{table}".lower(): f"{schema}.{table}"
+        for schema in schema_dict['tables'] for table in schema_dict['tables'][schema]
+    }
+    gold = []
+    for path in sorted(glob.glob(os.path.join("feedback_cache", db_name, "*_meta.json"))):
+        with open(path) as f:
+            meta = json.load(f)
+        tables = [known[t.lower()] for t in meta.get('tables', []) if t.lower() in known]
+        if tables:
+            gold.append((meta['query'], tables, meta.get('count', 1)))
+    return gold
+
+def parse_config(spec: str, defaults: Dict) -> Tuple[str, Dict]:
+    """Parse 'name:key=value,key.sub=value' into a name and a copy of defaults with overrides (JSON values)."""
+    name, _, overrides = spec.partition(':')
+    config = copy.deepcopy(defaults)
+    for item in filter(None, overrides.split(',')):
+        key, _, raw = item.partition('=')
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            value = raw
+        target = config
+        *parents, leaf = key.strip().split('.')
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[leaf] = value
+    return name, config
+
+def replay(identifier: TableIdentifier, gold: List[Tuple[str, List[str], int]], ks: List[int]) -> Tuple[Dict, List[Dict]]:
+    """Run every gold query and return aggregate metrics and per-query records."""
+    records = []
+    start = time.perf_counter()
+    for query, tables, count in gold:
+        identifier.result_cache.clear()
+        query_start = time.perf_counter()
+        result = identifier.identify_tables_cascade(query)
+        latency = 1000 * (time.perf_counter() - query_start)
+        predicted = result['tables'] or []
+        expected = {t.lower() for t in tables}
+        record = {
+            'query': query,
+            'gold': tables,
+            'predicted': predicted,
+            'count': count,
+            'latency_ms': round(latency, 3),
+            'tier': result['tier'],
+            'timed_out': result['timed_out'],
+            'exact': {t.lower() for t in predicted} == expected
+        }
+        for k in ks:
+            hits = len({t.lower() for t in predicted[:k]} & expected)
+            record[f'p@{k}'] = hits / len(predicted[:k]) if predicted else 0.0
+            record[f'r@{k}'] = hits / len(expected)
+        records.append(record)
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([r['latency_ms'] for r in records])
+    metrics = {
+        'queries': len(records),
+        'exact': float(np.mean([r['exact'] for r in records])),
+        'latency_p50_ms': float(np.percentile(latencies, 50)),
+        'latency_p95_ms': float(np.percentile(latencies, 95)),
+        'latency_mean_ms': float(latencies.mean()),
+        'throughput_qps': len(records) / elapsed if elapsed else 0.0,
+        'timed_out': int(sum(r['timed_out'] for r in records))
+    }
+    for k in ks:
+        metrics[f'p@{k}'] = float(np.mean([r[f'p@{k}'] for r in records]))
+        metrics[f'r@{k}'] = float(np.mean([r[f'r@{k}'] for r in records]))
+    return metrics, records
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default="BikeStores")
+    parser.add_argument("--config", action="append", default=[],
+                        help="name[:key=value,...] overriding global_defaults.json; repeatable (default: baseline)")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--repeat", type=int, default=1, help="replay passes per configuration; the last one is reported")
+    parser.add_argument("--output", default=None, help="write metrics and per-query records as JSON")
+    parser.add_argument("--profile", choices=["cprofile", "sample"], default=None,
+                        help="profile each configuration under profiles/replay/<name>")
+    parser.add_argument("--with-learned", action="store_true",
+                        help="keep weights.npz and dynamic synonyms learned from the replayed feedback (optimistic)")
+    args = parser.parse_args()
+
+    configure_logging()
+    schema_manager = SchemaManager(args.db)
+    if not os.path.exists(schema_manager.cache_file):
+        print(f"No cached schema for {args.db}; connect once with main.py to build schema_cache/{args.db}")
+        sys.exit(1)
+    schema_dict = schema_manager.load_from_cache()
+    gold = load_gold(args.db, schema_dict)
+    if not gold:
+        print(f"No feedback with known tables in feedback_cache/{args.db}")
+        sys.exit(1)
+    with open("app-config/global_defaults.json") as f:
+        defaults = json.load(f)
+
+    feedback_manager = HeldOutFeedback(FeedbackManager(args.db))
+    pattern_manager = PatternManager(schema_dict)
+    results = {}
+    mode = "with learned weights and synonyms" if args.with_learned else "learned weights and synonyms held out"
+    print(f"{len(gold)} labelled queries from feedback_cache/{args.db} ({mode})")
+    header = f"{'config':<16}{'setup s':>8}{'exact':>7}"
+    header += "".join(f"{f'P@{k}':>7}{f'R@{k}':>7}" for k in args.k)
+    print(header + f"{'p50 ms':>9}{'p95 ms':>9}{'q/s':>8}{'late':>6}")
+    for spec in args.config or ["baseline"]:
+        name, config = parse_config(spec, defaults)
+        profiler = ProfileSession(args.profile, os.path.join("profiles", "replay", name)) if args.profile else None
+        if profiler:
+            profiler.start()
+        start = time.perf_counter()
+        name_matcher = NameMatchManager(args.db, get_encoder(config.get('encoder', {})), config)
+        if not args.with_learned:
+            hold_out_learned(name_matcher)
+        value_index = None
+        if config.get('value_index', {}).get('enabled', False):
+            # Replay never connects, so only a value index profiled by main.py can be used
+            value_index = schema_manager.load_value_index(schema_dict, None, config['value_index'])
+        identifier = TableIdentifier(
+            schema_dict, feedback_manager, pattern_manager, name_matcher, value_index=value_index
+        )
+        if not args.with_learned:
+            identifier.weights = WeightMatrix()
+        identifier.identify_tables(gold[0][0])  # builds the scorer and any retrieval indexes
+        setup = time.perf_counter() - start
+        for _ in range(args.repeat):
+            metrics, records = replay(identifier, gold, args.k)
+        identifier.close()
+        if profiler:
+            profiler.stop()
+        metrics['setup_s'] = setup
+        results[name] = {'config': spec, 'learned': args.with_learned, 'metrics': metrics, 'records': records}
+        row = f"{name:<16}{setup:>8.2f}{metrics['exact']:>7.3f}"
+        row += "".join(f"{metrics[f'p@{k}']:>7.3f}{metrics[f'r@{k}']:>7.3f}" for k in args.k)
+        print(row + f"{metrics['latency_p50_ms']:>9.2f}{metrics['latency_p95_ms']:>9.2f}"
+              f"{metrics['throughput_qps']:>8.1f}{metrics['timed_out']:>6d}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.output}")
+
+if __name__ == "__main__":
+    main()
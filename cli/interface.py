@@ -19,6 +19,7 @@ class DatabaseAnalyzerCLI:
             print("3. Reload Configurations")
             print("4. Manage Feedback")
             print("5. Exit")
+            print("6. Export DDL")
             
             choice = input("Select option: ").strip()
             
@@ -36,6 +37,8 @@ class DatabaseAnalyzerCLI:
             elif choice == "5":
                 print("Exiting...")
                 break
+            elif choice == "6":
+                self._export_ddl()
             else:
                 print("Invalid choice")
 
@@ -194,6 +197,19 @@ class DatabaseAnalyzerCLI:
         if selected_tables:
             self.analyzer.update_feedback(query, selected_tables)
 
+    def _export_ddl(self):
+        if not self.analyzer.is_connected():
+            print("Not connected to database!")
+            return
+        
+        selection = input("Tables (comma-separated, blank for all): ").strip()
+        tables = [t.strip() for t in selection.split(',') if t.strip()] if selection else None
+        output_path = input("Output file (blank to print): ").strip()
+        try:
+            self.analyzer.generate_ddl(tables, output_path or None)
+        except Exception as e:
+            print(f"Error exporting DDL: {str(e)}")
+
     def _reload_configurations(self):
         try:
             if self.analyzer.reload_all_configurations():
@@ -212,6 +228,8 @@ class DatabaseAnalyzerCLI:
         print("1. Export feedback")
         print("2. Import feedback")
         print("3. Clear local feedback")
+        print("4. Review synonym suggestions")
+        print("5. Re-embedding status")
         choice = input("Select option: ").strip()
         
         if choice == "1":
@@ -223,9 +241,56 @@ class DatabaseAnalyzerCLI:
                 self.analyzer.clear_feedback()
             except Exception as e:
                 print(f"Error clearing feedback: {str(e)}")
+        elif choice == "4":
+            self._review_synonyms()
+        elif choice == "5":
+            self._show_reembed_status()
         else:
             print("Invalid choice")
 
+    def _show_reembed_status(self):
+        status = self.analyzer.get_reembed_status()
+        if status is None:
+            print("No re-embedding job: all feedback embeddings match the current model")
+            return
+        done = status['done'] + status['failed']
+        state = "running" if status['running'] else "cancelled" if status['cancelled'] else "finished"
+        line = f"Re-embedding with {status['model']}: {done}/{status['total']} ({status['failed']} failed), {state}"
+        if status['running'] and status.get('eta_s') is not None:
+            line += f", about {status['eta_s']:.0f}s left"
+        print(line)
+
+    def _review_synonyms(self):
+        candidates = self.analyzer.get_synonym_candidates()
+        if not candidates:
+            print("No synonym suggestions pending")
+            return
+
+        print("\nPending Synonym Suggestions:")
+        for i, c in enumerate(candidates, 1):
+            print(f"{i}. '{c['token']}' -> {c['column']} (similarity {c['similarity']:.2f}, seen {c['count']} times)")
+
+        selection = input("Enter numbers to approve (comma-separated), 'all', or blank for none: ").strip().lower()
+        if selection == 'all':
+            approved = set(range(len(candidates)))
+        else:
+            approved = {
+                int(item) - 1 for item in selection.split(',')
+                if item.strip().isdigit() and 0 < int(item) <= len(candidates)
+            }
+        remaining = [i for i in range(len(candidates)) if i not in approved]
+        rejected = []
+        if remaining and input("Discard the remaining suggestions? (y/n): ").strip().lower() == 'y':
+            rejected = remaining
+
+        registered = self.analyzer.review_synonyms(
+            [(candidates[i]['token'], candidates[i]['column']) for i in sorted(approved)],
+            [(candidates[i]['token'], candidates[i]['column']) for i in rejected]
+        )
+        skipped = len(approved) - registered
+        print(f"Approved {registered} synonyms" + (f" ({skipped} skipped as conflicts or duplicates)" if skipped else "")
+              + f", discarded {len(rejected)}")
+
     def _export_feedback(self):
         if not self.analyzer.feedback_manager:
             print("Feedback manager not initialized. Please connect to a database.")
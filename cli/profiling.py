@@ -0,0 +1,130 @@
+# cli/profiling.py: Opt-in profiling of interactive sessions and batch runs
+# Enabled with --profile or ANALYZER_PROFILE; artefacts go to profiles/<timestamp>/
+
+import os
+import io
+import json
+import time
+import cProfile
+import pstats
+import logging
+import tracemalloc
+from datetime import datetime
+from typing import Dict, List, Optional
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+except ImportError:
+    SamplingProfiler = None
+
+PROFILE_ENV = "ANALYZER_PROFILE"
+PROFILE_DIR_ENV = "ANALYZER_PROFILE_DIR"
+PROFILE_EVERY_ENV = "ANALYZER_PROFILE_EVERY"
+
+class ProfileSession:
+    """Wraps a run with a CPU profiler and tracemalloc snapshots at key points.
+
+    Artefacts written to the session directory:
+      session.prof / session.txt   cProfile stats (or profile.html with the sampler)
+      NN_<label>.snapshot          tracemalloc snapshots, loadable with Snapshot.load
+      NN_<label>.txt               top allocation sites for each snapshot
+      summary.json                 timings and traced memory at each snapshot
+    """
+
+    def __init__(self, mode: str = "cprofile", output_root: str = "profiles", snapshot_every: int = 25, frames: int = 10):
+        """Initialize with profiler mode ('cprofile' or 'sample'), output root and query snapshot interval."""
+        self.logger = logging.getLogger("analyzer")
+        if mode == "sample" and SamplingProfiler is None:
+            self.logger.warning("pyinstrument not installed, falling back to cProfile")
+            mode = "cprofile"
+        self.mode = mode
+        self.snapshot_every = snapshot_every
+        self.frames = frames
+        self.output_dir = os.path.join(output_root, datetime.now().strftime("%Y%m%d_%H%M%S"))
+        self.queries = 0
+        self.snapshots: List[Dict] = []
+        self._profiler = None
+        self._started = 0.0
+
+    @classmethod
+    def from_env(cls, mode: Optional[str] = None, output_root: Optional[str] = None, snapshot_every: Optional[int] = None) -> Optional['ProfileSession']:
+        """Create a session from explicit options or environment variables; None when profiling is off."""
+        mode = mode or os.environ.get(PROFILE_ENV)
+        if not mode or mode.lower() in ("0", "false", "off"):
+            return None
+        if mode.lower() in ("1", "true", "on"):
+            mode = "cprofile"
+        return cls(
+            mode.lower(),
+            output_root or os.environ.get(PROFILE_DIR_ENV, "profiles"),
+            snapshot_every or int(os.environ.get(PROFILE_EVERY_ENV, 25))
+        )
+
+    def start(self):
+        """Begin CPU and memory profiling."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        tracemalloc.start(self.frames)
+        self._started = time.perf_counter()
+        if self.mode == "sample":
+            self._profiler = SamplingProfiler()
+            self._profiler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self.logger.info(f"Profiling ({self.mode}) to {self.output_dir}")
+
+    def snapshot(self, label: str):
+        """Dump a tracemalloc snapshot and its top allocation sites."""
+        if not tracemalloc.is_tracing():
+            return
+        name = f"{len(self.snapshots):02d}_{label}"
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        snapshot.dump(os.path.join(self.output_dir, f"{name}.snapshot"))
+        with open(os.path.join(self.output_dir, f"{name}.txt"), 'w') as f:
+            for stat in snapshot.statistics('lineno')[:50]:
+                f.write(f"{stat}\n")
+        current, peak = tracemalloc.get_traced_memory()
+        self.snapshots.append({
+            'label': label,
+            'elapsed_s': round(time.perf_counter() - self._started, 3),
+            'queries': self.queries,
+            'traced_bytes': current,
+            'peak_bytes': peak
+        })
+        self.logger.debug(f"Profile snapshot {name}: {current / 1e6:.1f} MB traced, peak {peak / 1e6:.1f} MB")
+
+    def query_completed(self):
+        """Count a processed query and snapshot every snapshot_every queries."""
+        self.queries += 1
+        if self.snapshot_every and self.queries % self.snapshot_every == 0:
+            self.snapshot(f"after_{self.queries}_queries")
+
+    def stop(self):
+        """Stop profiling and write all artefacts."""
+        if self._profiler is None:
+            return
+        self.snapshot("end")
+        if self.mode == "sample":
+            self._profiler.stop()
+            with open(os.path.join(self.output_dir, "profile.html"), 'w') as f:
+                f.write(self._profiler.output_html())
+        else:
+            self._profiler.disable()
+            self._profiler.dump_stats(os.path.join(self.output_dir, "session.prof"))
+            report = io.StringIO()
+            pstats.Stats(self._profiler, stream=report).sort_stats("cumulative").print_stats(60)
+            with open(os.path.join(self.output_dir, "session.txt"), 'w') as f:
+                f.write(report.getvalue())
+        tracemalloc.stop()
+        self._profiler = None
+        with open(os.path.join(self.output_dir, "summary.json"), 'w') as f:
+            json.dump({
+                'mode': self.mode,
+                'duration_s': round(time.perf_counter() - self._started, 3),
+                'queries': self.queries,
+                'snapshots': self.snapshots
+            }, f, indent=2)
+        self.logger.info(f"Profile written to {self.output_dir}")
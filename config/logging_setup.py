@@ -0,0 +1,91 @@
+# config/logging_setup.py: One-time logging configuration with a background writer
+# Handlers from logging_config.ini run on a QueueListener thread, off the query path
+
+import os
+import json
+import queue
+import atexit
+import logging
+import logging.config
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, FrozenSet, List
+
+_listeners: List[QueueListener] = []
+_configured = False
+
+class DebugSampler(logging.Filter):
+    """Pass every record at INFO and above, and one in every_n DEBUG records."""
+
+    def __init__(self, every_n: int):
+        super().__init__()
+        self.every_n = max(1, int(every_n))
+        self.seen = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        self.seen += 1
+        return (self.seen - 1) % self.every_n == 0
+
+def _load_settings(defaults_path: str) -> Dict:
+    """Read the 'logging' section of global defaults."""
+    try:
+        if os.path.exists(defaults_path):
+            with open(defaults_path) as f:
+                return json.load(f).get('logging', {})
+    except Exception as e:
+        print(f"Error loading logging settings: {e}")
+    return {}
+
+def _configured_loggers() -> List[logging.Logger]:
+    """Return the root logger and every named logger that owns handlers."""
+    loggers = [logging.getLogger()]
+    for logger in logging.Logger.manager.loggerDict.values():
+        if isinstance(logger, logging.Logger) and logger.handlers:
+            loggers.append(logger)
+    return loggers
+
+def _route_through_queues(loggers: List[logging.Logger]):
+    """Replace each distinct handler set with one QueueHandler served by a listener thread."""
+    queue_handlers: Dict[FrozenSet[logging.Handler], QueueHandler] = {}
+    for logger in loggers:
+        if not logger.handlers:
+            continue
+        handlers = frozenset(logger.handlers)
+        if handlers not in queue_handlers:
+            log_queue = queue.SimpleQueue()
+            queue_handlers[handlers] = QueueHandler(log_queue)
+            listener = QueueListener(log_queue, *logger.handlers, respect_handler_level=True)
+            listener.start()
+            _listeners.append(listener)
+        logger.handlers = [queue_handlers[handlers]]
+
+def configure_logging(
+    config_path: str = "app-config/logging_config.ini",
+    defaults_path: str = "app-config/global_defaults.json"
+) -> bool:
+    """Configure logging once per process; later calls are no-ops."""
+    global _configured
+    if _configured:
+        return True
+    if not os.path.exists(config_path):
+        return False
+    try:
+        logging.config.fileConfig(config_path, disable_existing_loggers=False)
+    except Exception as e:
+        print(f"Error loading logging config: {e}")
+        return False
+
+    settings = _load_settings(defaults_path)
+    if settings.get('async', True):
+        _route_through_queues(_configured_loggers())
+        atexit.register(shutdown_logging)
+    for name, every_n in settings.get('debug_sample_every', {}).items():
+        logging.getLogger(name).addFilter(DebugSampler(every_n))
+    _configured = True
+    return True
+
+def shutdown_logging():
+    """Flush queued records and stop listener threads."""
+    while _listeners:
+        _listeners.pop().stop()
@@ -9,16 +9,19 @@ class DatabaseConnection:
         self.connection = None
         self.current_config = None
 
+    @staticmethod
+    def _connection_string(config: Dict) -> str:
+        return (
+            f"DRIVER={{{config['driver']}}};"
+            f"SERVER={config['server']};"
+            f"DATABASE={config['database']};"
+            f"UID={config['username']};"
+            f"PWD={config['password']}"
+        )
+
     def connect(self, config: Dict) -> bool:
         try:
-            conn_str = (
-                f"DRIVER={{{config['driver']}}};"
-                f"SERVER={config['server']};"
-                f"DATABASE={config['database']};"
-                f"UID={config['username']};"
-                f"PWD={config['password']}"
-            )
-            self.connection = pyodbc.connect(conn_str)
+            self.connection = pyodbc.connect(self._connection_string(config))
             self.current_config = config
             return True
         except Exception as e:
@@ -36,6 +39,10 @@ class DatabaseConnection:
 
     def get_cursor(self) -> Optional[pyodbc.Cursor]:
         return self.connection.cursor() if self.connection else None
+
+    def open_connection(self) -> pyodbc.Connection:
+        return pyodbc.connect(self._connection_string(self.current_config))
+
 class DBConfigManager:
     def load_configs(self, config_path: str) -> Dict:
         if not os.path.exists(config_path):
@@ -3,25 +3,74 @@
 import json
 import os
 import re
-from typing import Dict
+from collections import deque
+from typing import Dict, List, Optional
 import logging
-import logging.config
+
+class PhraseAutomaton:
+    """Aho-Corasick automaton over word tokens for multi-pattern matching."""
+
+    def __init__(self, phrases: Dict[str, List[str]]):
+        """Compile phrases (phrase id -> token list) into a single automaton."""
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[str]] = [[]]
+        for phrase_id, tokens in phrases.items():
+            self._insert(phrase_id, tokens)
+        self._build_failure_links()
+
+    def _insert(self, phrase_id: str, tokens: List[str]):
+        """Add a phrase to the trie."""
+        if not tokens:
+            return
+        state = 0
+        for token in tokens:
+            next_state = self.goto[state].get(token)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][token] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append(phrase_id)
+
+    def _build_failure_links(self):
+        """Compute failure links breadth-first and merge outputs."""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and token not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                if state:
+                    self.fail[next_state] = self.goto[fallback].get(token, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def match(self, tokens: List[str]) -> List[str]:
+        """Return ids of all phrases occurring in tokens (single pass)."""
+        state = 0
+        matched = []
+        for token in tokens:
+            while state and token not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(token, 0)
+            matched.extend(self.output[state])
+        return matched
 
 class PatternManager:
     """Manages patterns for query analysis."""
     
     def __init__(self, schema_dict: Dict):
         """Initialize with schema dictionary."""
-        logging_config_path = "app-config/logging_config.ini"
-        if os.path.exists(logging_config_path):
-            try:
-                logging.config.fileConfig(logging_config_path, disable_existing_loggers=False)
-            except Exception as e:
-                print(f"Error loading logging config: {e}")
-        
         self.logger = logging.getLogger("patterns")
         self.schema_dict = schema_dict
         self.pattern_weights = self._load_patterns()
+        self.automaton = self._compile_patterns()
+        self._last_query: Optional[str] = None
+        self._last_weights: Dict[str, float] = {}
         self.logger.debug(f"Initialized PatternManager with {len(self.pattern_weights)} patterns")
 
     def _load_patterns(self) -> Dict[str, Dict[str, float]]:
@@ -47,6 +96,57 @@ class PatternManager:
             }
         return normalized
 
+    def _compile_patterns(self) -> PhraseAutomaton:
+        """Compile all patterns into one phrase automaton."""
+        phrases = {pattern: pattern.split() for pattern in self.pattern_weights}
+        automaton = PhraseAutomaton(phrases)
+        self.logger.debug(f"Compiled {len(phrases)} patterns into {len(automaton.goto)} automaton states")
+        return automaton
+
+    def _tokenize(self, query: str) -> List[str]:
+        """Tokenize query, replacing literals with pattern placeholders."""
+        words = re.findall(r"[\w'-]+|[^\w\s]", query.lower())
+        tokens = []
+        i = 0
+        while i < len(words):
+            word = words[i]
+            if word in ('between', 'from', 'to') and i + 1 < len(words) and words[i + 1].isdigit():
+                tokens.append('[date_range]')
+                i += 2
+                continue
+            if re.fullmatch(r'\d{4}', word):
+                tokens.append('[year]')
+            elif word.isdigit():
+                tokens.append('[value]')
+            else:
+                tokens.append(word)
+            i += 1
+        return tokens
+
+    def normalize_query(self, query: str, collapse_literals: bool = False) -> str:
+        """Return a canonical form of query, optionally with literals replaced by placeholders."""
+        if collapse_literals:
+            return ' '.join(self._tokenize(query))
+        return re.sub(r'\s+', ' ', query.lower().strip())
+
     def get_patterns(self) -> Dict[str, Dict[str, float]]:
         """Return the loaded patterns."""
-        return self.pattern_weights
\ No newline at end of file
+        return self.pattern_weights
+
+    def get_pattern_weights(self, query: str) -> Dict[str, float]:
+        """Return sparse table -> weight map for all patterns found in query."""
+        if query == self._last_query:
+            return self._last_weights
+        weights: Dict[str, float] = {}
+        for pattern in set(self.automaton.match(self._tokenize(query))):
+            for table, weight in self.pattern_weights[pattern].items():
+                table_lower = table.lower()
+                weights[table_lower] = weights.get(table_lower, 0.0) + weight
+        self._last_query = query
+        self._last_weights = weights
+        self.logger.debug("Pattern weights for query '%s': %s", query, weights)
+        return weights
+
+    def get_pattern_weight(self, query: str, table_full: str) -> float:
+        """Return pattern weight of a single table for query."""
+        return self.get_pattern_weights(query).get(table_full.lower(), 0.0)
@@ -0,0 +1,343 @@
+# feedback/index.py: Vector indexes for feedback embedding lookup
+# Exact scan, pure-NumPy IVF and optional faiss HNSW behind one API
+
+import os
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from analysis.quantization import DTYPES, quantize, dequantize, quantized_dot
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so inner product equals cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+class ExactIndex:
+    """Brute-force cosine search over an in-memory embedding matrix."""
+
+    kind = "exact"
+
+    def __init__(self, dtype: str = 'float32'):
+        """Initialize an empty index storing vectors as float32, float16 or int8."""
+        self.logger = logging.getLogger("feedback")
+        self.dtype = dtype
+        self.reset()
+
+    def reset(self):
+        """Remove all vectors."""
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self._buffer = np.empty((0, 0), dtype=DTYPES[self.dtype])
+        self._scales = np.empty(0, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self.rows
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Return the (n, dim) matrix of normalized vectors as float32."""
+        count = len(self.ids)
+        return dequantize(self._buffer[:count], self._scales[:count])
+
+    @property
+    def nbytes(self) -> int:
+        """Return memory used by stored vectors."""
+        count = len(self.ids)
+        return self._buffer[:count].nbytes + self._scales[:count].nbytes
+
+    def add(self, ids: List[str], vectors: np.ndarray) -> np.ndarray:
+        """Append vectors and return their row numbers."""
+        codes, scales = quantize(normalize(vectors), self.dtype)
+        if self.ids and self._buffer.shape[1] != codes.shape[1]:
+            self.logger.warning(
+                f"Vector dimension changed from {self._buffer.shape[1]} to {codes.shape[1]}, "
+                f"dropping {len(self.ids)} indexed vectors"
+            )
+            self.reset()
+        start = len(self.ids)
+        needed = start + len(ids)
+        if self._buffer.shape[0] < needed or self._buffer.shape[1] != codes.shape[1]:
+            capacity = max(needed, 2 * self._buffer.shape[0], 64)
+            grown = np.empty((capacity, codes.shape[1]), dtype=codes.dtype)
+            grown_scales = np.empty(capacity, dtype=np.float32)
+            if start:
+                grown[:start] = self._buffer[:start]
+                grown_scales[:start] = self._scales[:start]
+            self._buffer = grown
+            self._scales = grown_scales
+        self._buffer[start:needed] = codes
+        self._scales[start:needed] = scales
+        for offset, item_id in enumerate(ids):
+            self.rows[item_id] = start + offset
+        self.ids.extend(ids)
+        return np.arange(start, needed)
+
+    def attach(self, ids: List[str], codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        """Use an externally owned (e.g. memory-mapped) matrix; return rows new to the index."""
+        previous = len(self.ids)
+        if len(ids) < previous or ids[:previous] != self.ids:
+            previous = 0
+            self.rows = {}
+        self.ids = list(ids)
+        for row in range(previous, len(ids)):
+            self.rows[ids[row]] = row
+        self._buffer = codes
+        self._scales = scales
+        return np.arange(previous, len(ids))
+
+    def export(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return stored (codes, scales) in row order."""
+        count = len(self.ids)
+        return self._buffer[:count], self._scales[:count]
+
+    def get(self, ids: List[str]) -> np.ndarray:
+        """Return float32 vectors for the given ids."""
+        rows = np.array([self.rows[item_id] for item_id in ids], dtype=np.int64)
+        return dequantize(self._buffer[rows], self._scales[rows])
+
+    def _rank(self, rows: np.ndarray, sims: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """Return the k best (id, similarity) among scored candidate rows."""
+        if not len(rows):
+            return []
+        if k < len(sims):
+            top = np.argpartition(-sims, k - 1)[:k]
+        else:
+            top = np.arange(len(sims))
+        top = top[np.argsort(-sims[top])]
+        return [(self.ids[rows[i]], float(sims[i])) for i in top]
+
+    def search(self, vector: np.ndarray, k: int = 10) -> List[Tuple[str, float]]:
+        """Return the k most similar (id, similarity) pairs."""
+        if not self.ids:
+            return []
+        count = len(self.ids)
+        sims = quantized_dot(self._buffer[:count], self._scales[:count], normalize(vector)[0])
+        return self._rank(np.arange(count), sims, k)
+
+    def save(self, index_dir: str):
+        """Exact search has no trained state to persist."""
+
+    def load(self, index_dir: str):
+        """Exact search has no trained state to load."""
+
+class IVFIndex(ExactIndex):
+    """Inverted-file index: spherical k-means buckets probed per query."""
+
+    kind = "ivf"
+
+    def __init__(
+        self,
+        nlist: int = 256,
+        nprobe: int = 8,
+        train_size: Optional[int] = None,
+        seed: int = 0,
+        dtype: str = 'float32'
+    ):
+        """Initialize with list count, lists probed per query and training size."""
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size or nlist * 8
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        super().__init__(dtype)
+
+    def reset(self):
+        """Remove all vectors, keeping any trained centroids."""
+        super().reset()
+        self._lists: List[List[int]] = [[] for _ in range(self.nlist)]
+        self._list_arrays: List[Optional[np.ndarray]] = [None] * self.nlist
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def _train(self, iterations: int = 10):
+        """Fit centroids with spherical k-means on a sample of vectors."""
+        rng = np.random.default_rng(self.seed)
+        rows = np.sort(rng.choice(len(self.ids), min(len(self.ids), self.nlist * 64), replace=False))
+        sample = dequantize(self._buffer[rows], self._scales[rows])
+        centroids = sample[rng.choice(len(sample), self.nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = normalize(sums)
+        self.centroids = centroids
+        self._lists = [[] for _ in range(self.nlist)]
+        self._list_arrays = [None] * self.nlist
+        self._assign(np.arange(len(self.ids)))
+        self.logger.debug(f"Trained IVF index with {self.nlist} lists on {len(sample)} vectors")
+
+    def _assign(self, rows: np.ndarray, chunk: int = 65536):
+        """Append rows to the inverted list of their nearest centroid."""
+        for start in range(0, len(rows), chunk):
+            block = rows[start:start + chunk]
+            decoded = dequantize(self._buffer[block], self._scales[block])
+            nearest = np.argmax(decoded @ self.centroids.T, axis=1)
+            for row, list_id in zip(block.tolist(), nearest.tolist()):
+                self._lists[list_id].append(row)
+                self._list_arrays[list_id] = None
+
+    def _list_array(self, list_id: int) -> np.ndarray:
+        """Return inverted list as an array, cached until it changes."""
+        if self._list_arrays[list_id] is None:
+            self._list_arrays[list_id] = np.array(self._lists[list_id], dtype=np.int64)
+        return self._list_arrays[list_id]
+
+    def add(self, ids: List[str], vectors: np.ndarray) -> np.ndarray:
+        """Append vectors, training the coarse quantizer once enough exist."""
+        if self.trained and self.centroids.shape[1] != np.asarray(vectors).shape[-1]:
+            self.centroids = None
+        rows = super().add(ids, vectors)
+        if self.trained:
+            self._assign(rows)
+        elif len(self.ids) >= max(self.train_size, self.nlist):
+            self._train()
+        return rows
+
+    def attach(self, ids: List[str], codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        """Use an external matrix, assigning only rows new to the index."""
+        rows = super().attach(ids, codes, scales)
+        if len(rows) == len(self.ids):
+            self._lists = [[] for _ in range(self.nlist)]
+            self._list_arrays = [None] * self.nlist
+        if self.trained:
+            self._assign(rows)
+        elif len(self.ids) >= max(self.train_size, self.nlist):
+            self._train()
+        return rows
+
+    def search(self, vector: np.ndarray, k: int = 10) -> List[Tuple[str, float]]:
+        """Return approximate k most similar (id, similarity) pairs."""
+        if not self.trained:
+            return super().search(vector, k)
+        query = normalize(vector)[0]
+        nprobe = min(self.nprobe, self.nlist)
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        rows = np.concatenate([self._list_array(list_id) for list_id in probe])
+        return self._rank(rows, quantized_dot(self._buffer, self._scales, query, rows), k)
+
+    def save(self, index_dir: str):
+        """Persist trained centroids."""
+        if not self.trained:
+            return
+        os.makedirs(index_dir, exist_ok=True)
+        np.save(os.path.join(index_dir, "ivf_centroids.npy"), self.centroids)
+
+    def load(self, index_dir: str):
+        """Load trained centroids if present."""
+        path = os.path.join(index_dir, "ivf_centroids.npy")
+        if os.path.exists(path):
+            centroids = np.load(path)
+            if centroids.shape[0] == self.nlist:
+                self.centroids = centroids
+                self.reset()
+
+class FaissIndex(ExactIndex):
+    """HNSW graph index backed by faiss-cpu."""
+
+    kind = "faiss"
+
+    def __init__(self, m: int = 32, ef_search: int = 64):
+        """Initialize with graph degree and search breadth."""
+        if faiss is None:
+            raise ImportError("faiss-cpu is required for the faiss feedback index")
+        self.m = m
+        self.ef_search = ef_search
+        self._index = None
+        super().__init__('float32')
+
+    def reset(self):
+        """Remove all vectors."""
+        self.ids = []
+        self.rows = {}
+        self._index = None
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Return the (n, dim) matrix of normalized vectors."""
+        if self._index is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return self._index.reconstruct_n(0, self._index.ntotal)
+
+    def add(self, ids: List[str], vectors: np.ndarray) -> np.ndarray:
+        """Insert vectors into the HNSW graph."""
+        vectors = normalize(vectors)
+        if self._index is None:
+            self._index = faiss.IndexHNSWFlat(vectors.shape[1], self.m, faiss.METRIC_INNER_PRODUCT)
+        self._index.hnsw.efSearch = self.ef_search
+        start = len(self.ids)
+        self._index.add(vectors)
+        for offset, item_id in enumerate(ids):
+            self.rows[item_id] = start + offset
+        self.ids.extend(ids)
+        return np.arange(start, start + len(ids))
+
+    def attach(self, ids: List[str], codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        """Copy rows not yet in the graph; faiss keeps its own memory."""
+        new = [row for row, item_id in enumerate(ids) if item_id not in self.rows]
+        if new:
+            self.add([ids[row] for row in new], dequantize(codes[new], scales[new]))
+        return np.array(new, dtype=np.int64)
+
+    def get(self, ids: List[str]) -> np.ndarray:
+        """Return float32 vectors for the given ids."""
+        return np.vstack([self._index.reconstruct(self.rows[item_id]) for item_id in ids])
+
+    def search(self, vector: np.ndarray, k: int = 10) -> List[Tuple[str, float]]:
+        """Return approximate k most similar (id, similarity) pairs."""
+        if not self.ids:
+            return []
+        sims, rows = self._index.search(normalize(vector), min(k, len(self.ids)))
+        return [(self.ids[row], float(sim)) for sim, row in zip(sims[0], rows[0]) if row >= 0]
+
+    def save(self, index_dir: str):
+        """Persist the graph and its id mapping."""
+        if self._index is None:
+            return
+        os.makedirs(index_dir, exist_ok=True)
+        faiss.write_index(self._index, os.path.join(index_dir, "hnsw.faiss"))
+        with open(os.path.join(index_dir, "hnsw_ids.json"), 'w') as f:
+            json.dump(self.ids, f)
+
+    def load(self, index_dir: str):
+        """Load a persisted graph so only new vectors need inserting."""
+        index_path = os.path.join(index_dir, "hnsw.faiss")
+        ids_path = os.path.join(index_dir, "hnsw_ids.json")
+        if os.path.exists(index_path) and os.path.exists(ids_path):
+            self._index = faiss.read_index(index_path)
+            with open(ids_path) as f:
+                self.ids = json.load(f)
+            self.rows = {item_id: row for row, item_id in enumerate(self.ids)}
+
+def create_index(config: Dict) -> ExactIndex:
+    """Create a feedback index from the 'feedback_index' config section."""
+    kind = config.get('type', 'exact')
+    dtype = config.get('dtype', 'float32')
+    if kind == 'ivf':
+        return IVFIndex(
+            nlist=config.get('nlist', 256),
+            nprobe=config.get('nprobe', 8),
+            train_size=config.get('train_size'),
+            dtype=dtype
+        )
+    if kind == 'faiss':
+        if faiss is not None:
+            return FaissIndex(m=config.get('hnsw_m', 32), ef_search=config.get('ef_search', 64))
+        logging.getLogger("feedback").warning("faiss not installed, falling back to exact feedback index")
+    return ExactIndex(dtype)
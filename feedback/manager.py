@@ -3,45 +3,92 @@
 import os
 import json
 import re
+import shutil
+import threading
 import numpy as np
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from typing import Dict, List, Optional, Set, Tuple
 import spacy
 import logging
-import logging.config
+from feedback.index import create_index, normalize
+from feedback.top_queries import TopQueries
+from analysis.embedding_store import MappedEmbeddingStore
+from analysis.encoder import LEGACY_EMBEDDING_MODEL, Encoder, get_encoder, model_slug
+from analysis.quantization import quantize
 
 nlp = spacy.load("en_core_web_sm")
 
 class FeedbackManager:
     """Manages feedback for query-table mappings."""
     
-    def __init__(self, db_name: str):
-        """Initialize with database name."""
-        logging_config_path = f"app-config/logging_config.ini"
-        if os.path.exists(logging_config_path):
-            try:
-                logging.config.fileConfig(logging_config_path, disable_existing_loggers=False)
-            except Exception as e:
-                print(f"Error loading logging config: {e}")
-        
+    def __init__(self, db_name: str, encoder: Optional[Encoder] = None):
+        """Initialize with database name and optional encoder (shared default otherwise)."""
         self.logger = logging.getLogger("feedback")
         self.db_name = db_name
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.encoder = encoder or get_encoder()
+        self.model_id = self.encoder.name
         self.feedback_dir = os.path.join("feedback_cache", db_name)
+        # Indexes and shared stores are per model so vectors from different models never mix
+        self.index_dir = os.path.join(self.feedback_dir, "index", model_slug(self.model_id))
+        # Serialises feedback writes with background re-embedding and index swaps
+        self._lock = threading.RLock()
+        self.stale_count = 0
         os.makedirs(self.feedback_dir, exist_ok=True)
         self.feedback_cache = {}
+        self.feedback_by_id = {}
         self.pattern_cache = {}
+        self.pattern_ids: Dict[str, Set[str]] = {}
+        self.top_queries = TopQueries()
+        self.generation = 0
+        self.index_config = self._load_index_config()
+        self.index = create_index(self.index_config)
+        self.index.load(self.index_dir)
+        self.shared_store = self._create_shared_store()
         self._load_feedback_cache()
         self.logger.debug(f"Initialized FeedbackManager for {db_name}")
 
+    def _load_index_config(self) -> Dict:
+        """Load feedback index settings from global defaults."""
+        config_path = "app-config/global_defaults.json"
+        try:
+            if os.path.exists(config_path):
+                with open(config_path) as f:
+                    defaults = json.load(f)
+                config = defaults.get('feedback_index', {})
+                config.setdefault('dtype', defaults.get('embedding_dtype', 'float32'))
+                config.setdefault('shared', defaults.get('shared_embeddings', False))
+                return config
+        except Exception as e:
+            self.logger.error(f"Error loading feedback index config: {e}")
+        return {}
+
+    def _create_shared_store(self) -> Optional[MappedEmbeddingStore]:
+        """Create the memory-mapped embedding store when sharing is enabled."""
+        if not self.index_config.get('shared'):
+            return None
+        if self.index.kind == 'faiss':
+            self.logger.warning("Shared embeddings are not supported with the faiss index")
+            return None
+        return MappedEmbeddingStore(os.path.join(self.feedback_dir, "shared", model_slug(self.model_id)), "embeddings")
+
+    def _refresh_if_stale(self):
+        """Reload feedback written by another process sharing the store."""
+        if self.shared_store is not None and self.shared_store.is_stale():
+            self.logger.debug("Shared feedback store changed, reloading")
+            with self._lock:
+                self._load_feedback_cache()
+
     def _load_feedback_cache(self):
         """Load feedback from cache."""
         self.feedback_cache.clear()
+        self.feedback_by_id.clear()
         self.pattern_cache.clear()
+        self.pattern_ids.clear()
+        self.top_queries.clear()
+        self.generation += 1
         
-        for fname in os.listdir(self.feedback_dir):
+        # Ids are creation timestamps, so the oldest entry defines each pattern as it did when stored
+        for fname in sorted(os.listdir(self.feedback_dir)):
             if fname.endswith("_meta.json"):
                 try:
                     with open(os.path.join(self.feedback_dir, fname)) as f:
@@ -49,28 +96,185 @@ class FeedbackManager:
                         if 'query' not in meta or 'tables' not in meta or 'timestamp' not in meta:
                             self.logger.warning(f"Skipping invalid feedback file {fname}")
                             continue
-                        normalized_tables = [t.lower() for t in meta.get('tables', [])]
-                        query_lower = meta['query'].lower()
-                        
-                        self.feedback_cache[query_lower] = {
-                            'query': meta['query'],
-                            'tables': normalized_tables,
-                            'timestamp': meta['timestamp'],
-                            'count': meta.get('count', 1)
-                        }
-                        
-                        pattern = self._extract_query_pattern(meta['query'])
-                        if pattern not in self.pattern_cache:
-                            self.pattern_cache[pattern] = {
-                                'tables': normalized_tables,
-                                'timestamp': meta['timestamp'],
-                                'count': meta.get('count', 1)
-                            }
-                        else:
-                            self.pattern_cache[pattern]['count'] += meta.get('count', 1)
+                        self._cache_feedback(fname.replace("_meta.json", ""), meta, meta.get('count', 1), loading=True)
                     self.logger.debug(f"Loaded feedback file {fname}")
                 except Exception as e:
                     self.logger.error(f"Error loading feedback file {fname}: {e}")
+        self._load_embeddings()
+        # Counted here and in rebuild_index only; stores add current-model embeddings
+        stale_count = len(self.stale_embeddings())
+        if stale_count and stale_count != self.stale_count:
+            self.logger.warning(f"{stale_count} feedback entries lack a {self.model_id} embedding and are excluded from semantic search")
+        self.stale_count = stale_count
+
+    def _cache_feedback(self, feedback_id: str, meta: Dict, added_count: int, loading: bool = False):
+        """Add or refresh one feedback entry in the in-memory caches."""
+        normalized_tables = [t.lower() for t in meta.get('tables', [])]
+        query_lower = meta['query'].lower()
+        previous = self.feedback_cache.get(query_lower)
+        if previous and previous['query'] != meta['query']:
+            self.top_queries.remove(previous['query'])
+
+        pattern = self._extract_query_pattern(meta['query'])
+        previous_pattern = self.feedback_by_id.get(feedback_id, {}).get('pattern')
+        if previous_pattern is not None and previous_pattern != pattern:
+            self.pattern_ids.get(previous_pattern, set()).discard(feedback_id)
+            self._rebuild_pattern(previous_pattern)
+        self.pattern_ids.setdefault(pattern, set()).add(feedback_id)
+        self.feedback_cache[query_lower] = {
+            'id': feedback_id,
+            'query': meta['query'],
+            'tables': normalized_tables,
+            'timestamp': meta['timestamp'],
+            'count': meta.get('count', 1),
+            'embedding_model': meta.get('embedding_model', LEGACY_EMBEDDING_MODEL),
+            'pattern': pattern
+        }
+        self.feedback_by_id[feedback_id] = self.feedback_cache[query_lower]
+        if normalized_tables:
+            self.top_queries.update(meta['query'], meta.get('count', 1))
+        else:
+            self.top_queries.remove(meta['query'])
+
+        cached = self.pattern_cache.get(pattern)
+        if cached is None:
+            self.pattern_cache[pattern] = {
+                'id': feedback_id,
+                'tables': normalized_tables,
+                'timestamp': meta['timestamp'],
+                'count': meta.get('count', 1)
+            }
+        elif cached['id'] == feedback_id:
+            # The entry defining the pattern was corrected, so the pattern follows it
+            cached['tables'] = normalized_tables
+            cached['timestamp'] = meta['timestamp']
+            cached['count'] += added_count
+        elif loading:
+            cached['count'] += added_count
+        else:
+            self._rebuild_pattern(pattern)
+
+    def _rebuild_pattern(self, pattern: str):
+        """Recompute one pattern_cache entry from the feedback entries sharing the pattern."""
+        entries = [self.feedback_by_id[feedback_id] for feedback_id in sorted(self.pattern_ids.get(pattern, ()))]
+        if not entries:
+            self.pattern_cache.pop(pattern, None)
+            self.pattern_ids.pop(pattern, None)
+            return
+        owner = self.pattern_cache.get(pattern, {}).get('id')
+        defining = next((entry for entry in entries if entry['id'] == owner), entries[0])
+        self.pattern_cache[pattern] = {
+            'id': defining['id'],
+            'tables': defining['tables'],
+            'timestamp': defining['timestamp'],
+            'count': sum(entry['count'] for entry in entries)
+        }
+
+    def _load_embeddings(self):
+        """Add embeddings of the current model not yet in the index."""
+        if self.shared_store is not None and not self.shared_store.sync(self.index):
+            self.index.reset()
+        new_ids, vectors = self._read_embeddings(
+            [feedback_id for feedback_id in self.feedback_by_id if feedback_id not in self.index]
+        )
+        if new_ids:
+            if self.shared_store is not None:
+                self.shared_store.add(self.index, new_ids, np.vstack(vectors))
+            else:
+                self.index.add(new_ids, np.vstack(vectors))
+            self.index.save(self.index_dir)
+            self.logger.debug("Indexed %s feedback embeddings (%s, total %s)", len(new_ids), self.index.kind, len(self.index))
+
+    def _embedding_path(self, feedback_id: str) -> str:
+        """Return the embedding file of a feedback entry."""
+        return os.path.join(self.feedback_dir, f"{feedback_id}_emb.npy")
+
+    def _read_embeddings(self, feedback_ids: List[str]) -> Tuple[List[str], List[np.ndarray]]:
+        """Read stored embeddings produced by the current model."""
+        ids, vectors = [], []
+        for feedback_id in feedback_ids:
+            entry = self.feedback_by_id.get(feedback_id)
+            emb_path = self._embedding_path(feedback_id)
+            if entry is None or entry['embedding_model'] != self.model_id or not os.path.exists(emb_path):
+                continue
+            try:
+                vectors.append(np.load(emb_path).reshape(-1))
+                ids.append(feedback_id)
+            except Exception as e:
+                self.logger.error(f"Error loading embedding {emb_path}: {e}")
+        return ids, vectors
+
+    def stale_embeddings(self) -> List[str]:
+        """Return ids of feedback whose embedding is missing or from another model."""
+        with self._lock:
+            # Snapshot: the re-embedding thread calls this while stores and reloads mutate the cache
+            entries = [(feedback_id, entry['embedding_model']) for feedback_id, entry in self.feedback_by_id.items()]
+        return [
+            feedback_id for feedback_id, model in entries
+            if model != self.model_id or not os.path.exists(self._embedding_path(feedback_id))
+        ]
+
+    def write_embeddings(self, feedback_ids: List[str], vectors: np.ndarray, model_id: str) -> int:
+        """Replace embeddings and tag their meta with the model; return how many were written."""
+        written = 0
+        with self._lock:
+            for feedback_id, vector in zip(feedback_ids, vectors):
+                meta_path = os.path.join(self.feedback_dir, f"{feedback_id}_meta.json")
+                try:
+                    tmp_path = os.path.join(self.feedback_dir, f"{feedback_id}_emb.{os.getpid()}.tmp.npy")
+                    np.save(tmp_path, np.asarray(vector, dtype=np.float32))
+                    os.replace(tmp_path, self._embedding_path(feedback_id))
+                    with open(meta_path) as f:
+                        meta = json.load(f)
+                    was_stale = meta.get('embedding_model') != self.model_id
+                    meta['embedding_model'] = model_id
+                    tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+                    with open(tmp_path, 'w') as f:
+                        json.dump(meta, f)
+                    os.replace(tmp_path, meta_path)
+                    if feedback_id in self.feedback_by_id:
+                        self.feedback_by_id[feedback_id]['embedding_model'] = model_id
+                    if was_stale and model_id == self.model_id:
+                        self.stale_count = max(0, self.stale_count - 1)
+                    written += 1
+                except Exception as e:
+                    self.logger.error(f"Error re-embedding feedback {feedback_id}: {e}")
+        return written
+
+    def rebuild_index(self):
+        """Build a fresh index over all current-model embeddings and swap it in."""
+        index = create_index(self.index_config)
+        with self._lock:
+            ids, vectors = self._read_embeddings(list(self.feedback_by_id))
+            if self.shared_store is not None:
+                # Other processes keep their attached generation until they see the new meta
+                if ids:
+                    codes, scales = quantize(normalize(np.vstack(vectors)), index.dtype)
+                    self.shared_store.rewrite(ids, codes, scales, index.dtype)
+                else:
+                    self.shared_store.clear(index.dtype)
+                self.shared_store.sync(index)
+            elif ids:
+                index.add(ids, np.vstack(vectors))
+            index.save(self.index_dir)
+            self.index = index
+            self.stale_count = len(self.stale_embeddings())
+            self.generation += 1
+        self.logger.info(f"Swapped in feedback index with {len(index)} {self.model_id} embeddings")
+
+    def start_reembedding(self, batch_size: int = 256, workers: int = 0, encoder_config: Optional[Dict] = None):
+        """Re-encode stale embeddings in a background thread; returns the ReembedJob or None if none are stale."""
+        if not self.stale_embeddings():
+            return None
+        from feedback.reembed import ReembedJob
+        job = ReembedJob(self, batch_size, workers, encoder_config)
+        job.start()
+        return job
+
+    def get_generation(self) -> int:
+        """Return a counter that changes whenever stored feedback changes."""
+        self._refresh_if_stale()
+        return self.generation
 
     def _extract_query_pattern(self, query: str) -> str:
         """Extract pattern from query."""
@@ -99,7 +303,7 @@ class FeedbackManager:
                 pattern.append(token.lemma_)
         
         pattern_str = ' '.join(pattern)
-        self.logger.debug(f"Extracted pattern: {pattern_str}")
+        self.logger.debug("Extracted pattern: %s", pattern_str)
         return pattern_str
 
     def store_feedback(self, query: str, correct_tables: List[str], schema_dict: Dict) -> bool:
@@ -117,14 +321,20 @@ class FeedbackManager:
             return False
             
         normalized_tables = [t.lower() for t in valid_tables]
-        existing = self._find_exact_match(query)
-        
-        if existing:
-            self._update_feedback(existing, normalized_tables, query)
-        else:
-            self._create_new_feedback(query, normalized_tables)
-        
-        self._load_feedback_cache()
+        self._refresh_if_stale()
+        with self._lock:
+            existing = self.feedback_cache.get(query.lower(), {}).get('id')
+            
+            if existing:
+                feedback_id, meta = existing, self._update_feedback(existing, normalized_tables, query)
+            else:
+                feedback_id, meta = self._create_new_feedback(query, normalized_tables)
+            
+            if meta is None:
+                return False
+            self._cache_feedback(feedback_id, meta, 1)
+            self._load_embeddings()
+            self.generation += 1
         self.logger.info(f"Stored feedback for query: {query}, tables: {normalized_tables}")
         return True
 
@@ -142,7 +352,7 @@ class FeedbackManager:
         for table in tables:
             parts = table.split('.')
             if len(parts) != 2:
-                self.logger.debug(f"Invalid table format: {table}")
+                self.logger.debug("Invalid table format: %s", table)
                 invalid_tables.append(table)
                 continue
                 
@@ -151,40 +361,25 @@ class FeedbackManager:
             table_lower = table_part.lower()
             
             if schema_lower not in schema_map:
-                self.logger.debug(f"Schema not found: {schema_lower}")
+                self.logger.debug("Schema not found: %s", schema_lower)
                 invalid_tables.append(table)
                 continue
                 
             actual_schema = schema_map[schema_lower]
             
             if table_lower not in table_maps[actual_schema]:
-                self.logger.debug(f"Table not found: {table_lower} in schema: {actual_schema}")
+                self.logger.debug("Table not found: %s in schema: %s", table_lower, actual_schema)
                 invalid_tables.append(table)
                 continue
                 
             actual_table = table_maps[actual_schema][table_lower]
             valid_tables.append(f"{actual_schema}.{actual_table}")
                 
-        self.logger.debug(f"Valid tables: {valid_tables}, Invalid: {invalid_tables}")
+        self.logger.debug("Valid tables: %s, Invalid: %s", valid_tables, invalid_tables)
         return valid_tables, invalid_tables
 
-    def _find_exact_match(self, query: str) -> Optional[str]:
-        """Find existing feedback for query."""
-        query_lower = query.lower()
-        for fname in os.listdir(self.feedback_dir):
-            if fname.endswith("_meta.json"):
-                try:
-                    with open(os.path.join(self.feedback_dir, fname)) as f:
-                        meta = json.load(f)
-                        if 'query' in meta and meta['query'].lower() == query_lower:
-                            self.logger.debug(f"Found exact match for query: {query}")
-                            return fname.replace("_meta.json", "")
-                except Exception:
-                    continue
-        return None
-
-    def _update_feedback(self, feedback_id: str, tables: List[str], query: str):
-        """Update existing feedback."""
+    def _update_feedback(self, feedback_id: str, tables: List[str], query: str) -> Optional[Dict]:
+        """Update existing feedback and return its new meta."""
         meta_path = os.path.join(self.feedback_dir, f"{feedback_id}_meta.json")
         try:
             with open(meta_path, 'r+') as f:
@@ -195,33 +390,48 @@ class FeedbackManager:
                 f.seek(0)
                 json.dump(meta, f)
                 f.truncate()
-            self.logger.debug(f"Updated feedback {feedback_id}")
+            self.logger.debug("Updated feedback %s", feedback_id)
+            return meta
         except Exception as e:
             self.logger.error(f"Error updating feedback {feedback_id}: {e}")
+            return None
 
-    def _create_new_feedback(self, query: str, tables: List[str]):
-        """Create new feedback entry."""
+    def _create_new_feedback(self, query: str, tables: List[str]) -> Tuple[str, Optional[Dict]]:
+        """Create new feedback entry and return its id and meta."""
         timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
         try:
-            embedding = self.model.encode(query)
-            np.save(os.path.join(self.feedback_dir, f"{timestamp}_emb.npy"), embedding)
+            embedding = self.encoder.encode(query)
+            np.save(self._embedding_path(timestamp), embedding)
+            meta = {
+                'query': query,
+                'tables': tables,
+                'timestamp': datetime.now().isoformat(),
+                'count': 1,
+                'embedding_model': self.model_id
+            }
             with open(os.path.join(self.feedback_dir, f"{timestamp}_meta.json"), 'w') as f:
-                json.dump({
-                    'query': query,
-                    'tables': tables,
-                    'timestamp': datetime.now().isoformat(),
-                    'count': 1
-                }, f)
-            self.logger.debug(f"Created new feedback for query: {query}")
+                json.dump(meta, f)
+            self.logger.debug("Created new feedback for query: %s", query)
+            return timestamp, meta
         except Exception as e:
             self.logger.error(f"Error creating feedback for query {query}: {e}")
+            return timestamp, None
 
     def get_similar_feedback(self, query: str, threshold: float = 0.85) -> Optional[List[Dict]]:
-        """Retrieve similar feedback."""
+        """Retrieve similar feedback: exact match, then query pattern, then embedding search."""
+        return (
+            self.get_exact_feedback(query)
+            or self.get_pattern_feedback(query)
+            or self.get_semantic_feedback(query, threshold)
+        )
+
+    def get_exact_feedback(self, query: str) -> Optional[List[Dict]]:
+        """Retrieve feedback stored for exactly this query."""
         try:
+            self._refresh_if_stale()
             query_lower = query.lower()
             if query_lower in self.feedback_cache and self.feedback_cache[query_lower]['tables']:
-                self.logger.debug(f"Exact feedback match for query: {query}")
+                self.logger.debug("Exact feedback match for query: %s", query)
                 return [{
                     'similarity': 1.0,
                     'query': self.feedback_cache[query_lower]['query'],
@@ -230,10 +440,17 @@ class FeedbackManager:
                     'type': 'exact',
                     'count': self.feedback_cache[query_lower]['count']
                 }]
+        except Exception as e:
+            self.logger.error(f"Exact feedback lookup error: {e}")
+        return None
 
+    def get_pattern_feedback(self, query: str) -> Optional[List[Dict]]:
+        """Retrieve feedback stored for the query's pattern."""
+        try:
+            self._refresh_if_stale()
             pattern = self._extract_query_pattern(query)
             if pattern in self.pattern_cache and self.pattern_cache[pattern]['tables']:
-                self.logger.debug(f"Pattern match for query: {query}")
+                self.logger.debug("Pattern match for query: %s", query)
                 return [{
                     'similarity': 1.0,
                     'query': query,
@@ -243,38 +460,31 @@ class FeedbackManager:
                     'pattern': pattern,
                     'count': self.pattern_cache[pattern]['count']
                 }]
+        except Exception as e:
+            self.logger.error(f"Pattern feedback lookup error: {e}")
+        return None
 
-            query_emb = self.model.encode(query).reshape(1, -1)
+    def get_semantic_feedback(self, query: str, threshold: float = 0.85) -> Optional[List[Dict]]:
+        """Retrieve feedback whose query embedding is at least threshold similar, best first."""
+        try:
+            self._refresh_if_stale()
+            query_emb = self.encoder.encode(query)
             feedback_items = []
             
-            for fname in os.listdir(self.feedback_dir):
-                if fname.endswith("_emb.npy"):
-                    emb_path = os.path.join(self.feedback_dir, fname)
-                    meta_path = emb_path.replace("_emb.npy", "_meta.json")
-                    
-                    if os.path.exists(meta_path):
-                        try:
-                            with open(meta_path) as f:
-                                meta = json.load(f)
-                            if not meta.get('tables') or 'query' not in meta:
-                                continue
-                            stored_emb = np.load(emb_path)
-                            similarity = cosine_similarity(query_emb, stored_emb.reshape(1, -1))[0][0]
-                            
-                            if similarity >= threshold:
-                                feedback_items.append({
-                                    "similarity": similarity,
-                                    "query": meta["query"],
-                                    "tables": meta["tables"],
-                                    "timestamp": meta["timestamp"],
-                                    "type": "semantic",
-                                    "count": meta.get('count', 1)
-                                })
-                        except Exception:
-                            continue
+            for feedback_id, similarity in self.index.search(query_emb, self.index_config.get('top_k', 10)):
+                meta = self.feedback_by_id.get(feedback_id)
+                if similarity < threshold or not meta or not meta['tables']:
+                    continue
+                feedback_items.append({
+                    "similarity": similarity,
+                    "query": meta["query"],
+                    "tables": meta["tables"],
+                    "timestamp": meta["timestamp"],
+                    "type": "semantic",
+                    "count": meta['count']
+                })
             
-            feedback_items.sort(key=lambda x: x["similarity"], reverse=True)
-            self.logger.debug(f"Similar feedback: {feedback_items}")
+            self.logger.debug("Similar feedback: %s", feedback_items)
             return feedback_items if feedback_items else None
         
         except Exception as e:
@@ -283,21 +493,26 @@ class FeedbackManager:
 
     def get_top_queries(self, n: int) -> List[Tuple[str, int]]:
         """Get top N queries."""
-        top_queries = [
-            (meta['query'], meta['count'])
-            for query, meta in self.feedback_cache.items()
-            if meta['tables'] and 'query' in meta
-        ]
-        top_queries.sort(key=lambda x: (-x[1], x[0]))
-        self.logger.debug(f"Top {n} queries: {top_queries[:n]}")
-        return top_queries[:n]
+        self._refresh_if_stale()
+        top_queries = self.top_queries.get(n)
+        self.logger.debug("Top %d queries: %s", n, top_queries)
+        return top_queries
 
     def clear_feedback(self):
         """Clear all feedback data."""
+        with self._lock:
+            self._clear_feedback()
+
+    def _clear_feedback(self):
+        """Remove feedback files and indexes."""
         try:
             for fname in os.listdir(self.feedback_dir):
                 if fname.endswith(("_meta.json", "_emb.npy")):
                     os.remove(os.path.join(self.feedback_dir, fname))
+            shutil.rmtree(self.index_dir, ignore_errors=True)
+            self.index.reset()
+            if self.shared_store is not None:
+                self.shared_store.clear(self.index.dtype)
             self._load_feedback_cache()
             self.logger.info("Feedback cleared")
         except Exception as e:
@@ -0,0 +1,176 @@
+# feedback/reembed.py: Re-encodes feedback whose embedding is missing or came from another model
+# Usage: python -m feedback.reembed --db BikeStores --workers 4 --batch-size 512
+# Runs batches in the background (optionally in worker processes); the live index serves until the rebuilt one is swapped in
+
+import argparse
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from analysis.encoder import get_encoder
+
+_worker_encoder = None
+
+def _init_worker(encoder_config: Dict):
+    """Load the encoder once per worker process."""
+    global _worker_encoder
+    _worker_encoder = get_encoder(encoder_config)
+
+def _encode_in_worker(texts: List[str]) -> Tuple[str, np.ndarray]:
+    """Encode one batch in a worker process; returns the worker's model id with the vectors."""
+    return _worker_encoder.name, _worker_encoder.encode(texts)
+
+class ReembedJob:
+    """Brings every feedback embedding up to the feedback manager's current model."""
+
+    def __init__(
+        self,
+        feedback_manager,
+        batch_size: int = 256,
+        workers: int = 0,
+        encoder_config: Optional[Dict] = None,
+        progress: Optional[Callable[[Dict], None]] = None
+    ):
+        """Initialize with a FeedbackManager, batch size and worker processes (0 encodes in-thread).
+
+        Workers build their encoder from encoder_config, by default the global defaults.
+        """
+        self.logger = logging.getLogger("feedback")
+        self.feedback_manager = feedback_manager
+        self.batch_size = max(1, batch_size)
+        self.workers = workers
+        self.encoder_config = encoder_config
+        self.progress = progress
+        self.thread = None
+        self.cancelled = threading.Event()
+        self.state = {
+            'model': feedback_manager.model_id, 'total': 0, 'done': 0, 'failed': 0,
+            'running': False, 'cancelled': False, 'elapsed_s': 0.0
+        }
+
+    def status(self) -> Dict:
+        """Return a copy of the job progress."""
+        return dict(self.state)
+
+    def start(self) -> threading.Thread:
+        """Run the job in a daemon thread."""
+        self.state['running'] = True
+        self.thread = threading.Thread(target=self.run, name="feedback-reembed", daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def cancel(self):
+        """Stop after the current batch without swapping the index."""
+        self.cancelled.set()
+
+    def run(self) -> Dict:
+        """Re-encode stale feedback in batches, then swap in a rebuilt index."""
+        fm = self.feedback_manager
+        start = time.perf_counter()
+        stale = fm.stale_embeddings()
+        self.state.update(total=len(stale), done=0, failed=0, running=True)
+        self.logger.info(f"Re-embedding {len(stale)} feedback entries with {fm.model_id}")
+        batches = [stale[i:i + self.batch_size] for i in range(0, len(stale), self.batch_size)]
+        encoded = self._encode(batches)
+        try:
+            for ids, vectors in zip(batches, encoded):
+                if self.cancelled.is_set():
+                    break
+                written = fm.write_embeddings(ids, vectors, fm.model_id) if vectors is not None else 0
+                self.state['done'] += written
+                self.state['failed'] += len(ids) - written
+                self._report(start)
+            if self.cancelled.is_set():
+                self.state['cancelled'] = True
+                self.logger.info("Re-embedding cancelled, keeping the current index")
+            else:
+                fm.rebuild_index()
+        except Exception as e:
+            self.logger.error(f"Re-embedding failed: {e}")
+        finally:
+            encoded.close()
+            self.state['running'] = False
+            self.state['elapsed_s'] = time.perf_counter() - start
+        self.logger.info(
+            f"Re-embedded {self.state['done']}/{self.state['total']} feedback entries in {self.state['elapsed_s']:.1f}s"
+        )
+        return self.status()
+
+    def _queries(self, ids: List[str]) -> List[str]:
+        """Return the query text of each feedback id."""
+        return [self.feedback_manager.feedback_by_id.get(feedback_id, {}).get('query', '') for feedback_id in ids]
+
+    def _encode(self, batches: List[List[str]]):
+        """Yield one (n, dim) matrix per batch, or None for a batch that failed."""
+        if self.workers <= 0:
+            for ids in batches:
+                try:
+                    yield self.feedback_manager.encoder.encode(self._queries(ids), self.batch_size)
+                except Exception as e:
+                    self.logger.error(f"Error encoding feedback batch: {e}")
+                    yield None
+            return
+        # spawn: forking a process that already holds a loaded model can deadlock its thread pools
+        with ProcessPoolExecutor(
+            self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.encoder_config,)
+        ) as pool:
+            futures = [pool.submit(_encode_in_worker, self._queries(ids)) for ids in batches]
+            try:
+                for future in futures:
+                    if self.cancelled.is_set():
+                        return
+                    try:
+                        model_id, vectors = future.result()
+                        if model_id != self.feedback_manager.model_id:
+                            raise ValueError(f"worker encoder {model_id} does not match {self.feedback_manager.model_id}")
+                        yield vectors
+                    except Exception as e:
+                        self.logger.error(f"Error encoding feedback batch: {e}")
+                        yield None
+            finally:
+                # Otherwise leaving the pool would still wait for every queued batch
+                for pending in futures:
+                    pending.cancel()
+
+    def _report(self, start: float):
+        """Log progress and notify the callback."""
+        done = self.state['done'] + self.state['failed']
+        elapsed = time.perf_counter() - start
+        rate = done / elapsed if elapsed else 0.0
+        self.state['elapsed_s'] = elapsed
+        self.state['rate'] = rate
+        self.state['eta_s'] = (self.state['total'] - done) / rate if rate else None
+        self.logger.info(f"Re-embedded {done}/{self.state['total']} ({rate:.0f}/s)")
+        if self.progress:
+            self.progress(self.status())
+
+def main():
+    from config.logging_setup import configure_logging
+    from feedback.manager import FeedbackManager
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default="BikeStores")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=0, help="encoder processes; 0 encodes in this process")
+    args = parser.parse_args()
+
+    configure_logging()
+    feedback_manager = FeedbackManager(args.db)
+    print(f"{len(feedback_manager.stale_embeddings())} of {len(feedback_manager.feedback_by_id)} "
+          f"feedback entries need a {feedback_manager.model_id} embedding")
+
+    def show(state: Dict):
+        done = state['done'] + state['failed']
+        eta = f", eta {state['eta_s']:.0f}s" if state.get('eta_s') is not None else ""
+        print(f"\r{done}/{state['total']} ({state['rate']:.0f}/s{eta})", end="", flush=True)
+
+    state = ReembedJob(feedback_manager, args.batch_size, args.workers, progress=show).run()
+    print(f"\nRe-embedded {state['done']}, failed {state['failed']}, in {state['elapsed_s']:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# feedback/top_queries.py: Most frequent feedback queries, maintained incrementally
+# Keeps only the leading entries ordered so reads never sort the whole feedback set
+
+import heapq
+from bisect import bisect_left, insort
+from typing import Dict, List, Tuple
+
+class TopQueries:
+    """Bounded, ordered view of the highest-count queries."""
+
+    def __init__(self, capacity: int = 10):
+        """Initialize with the number of entries kept ordered."""
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        # (-count, query) ascending, so the best entry comes first
+        self.top: List[Tuple[int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def clear(self):
+        """Drop all entries."""
+        self.counts.clear()
+        self.top = []
+
+    def rebuild(self, counts: Dict[str, int]):
+        """Replace all entries at once."""
+        self.counts = dict(counts)
+        self._refill()
+
+    def _refill(self):
+        """Recompute the ordered head from all counts."""
+        self.top = heapq.nsmallest(self.capacity, ((-count, query) for query, count in self.counts.items()))
+
+    def _discard(self, key: Tuple[int, str]) -> bool:
+        """Remove key from the ordered head if present."""
+        pos = bisect_left(self.top, key)
+        if pos < len(self.top) and self.top[pos] == key:
+            del self.top[pos]
+            return True
+        return False
+
+    def update(self, query: str, count: int):
+        """Set the count of a query and reposition it."""
+        old = self.counts.get(query)
+        self.counts[query] = count
+        key = (-count, query)
+        was_top = old is not None and self._discard((-old, query))
+        if was_top and old is not None and count < old and len(self.counts) > self.capacity:
+            # A lowered count may let an entry outside the head overtake it
+            self._refill()
+            return
+        if len(self.top) < self.capacity or key < self.top[-1]:
+            insort(self.top, key)
+            if len(self.top) > self.capacity:
+                self.top.pop()
+
+    def remove(self, query: str):
+        """Drop a query."""
+        old = self.counts.pop(query, None)
+        if old is not None and self._discard((-old, query)) and len(self.counts) >= self.capacity:
+            self._refill()
+
+    def get(self, n: int) -> List[Tuple[str, int]]:
+        """Return the n highest (query, count) pairs."""
+        if n <= self.capacity or len(self.counts) <= self.capacity:
+            head = self.top[:n]
+        else:
+            head = heapq.nsmallest(n, ((-count, query) for query, count in self.counts.items()))
+        return [(query, -neg_count) for neg_count, query in head]
@@ -1,32 +1,32 @@
 # main.py: Entry point for Database Schema Analyzer
 # Initializes components and runs CLI
 
+import argparse
 import logging
-import logging.config
 import os
-from typing import Dict, List, Tuple
+import sys
+from typing import Dict, List, Optional, Tuple
 from config.manager import DBConfigManager, DatabaseConnection
+from config.logging_setup import configure_logging
 from config.patterns import PatternManager
 from schema.manager import SchemaManager
+from schema.ddl import DDLExporter
+from schema.lexical_index import LexicalIndex
+from schema.value_index import ValueIndex
 from feedback.manager import FeedbackManager
 from analysis.table_identifier import TableIdentifier
 from analysis.name_match_manager import NameMatchManager
 from analysis.processor import NLPPipeline
 from nlp.QueryProcessor import QueryProcessor
 from cli.interface import DatabaseAnalyzerCLI
+from cli.profiling import ProfileSession
 
 class DatabaseAnalyzer:
     """Main class for database schema analysis and query processing."""
     
-    def __init__(self):
-        """Initialize logging and components."""
-        logging_config_path = "app-config/logging_config.ini"
-        if os.path.exists(logging_config_path):
-            try:
-                logging.config.fileConfig(logging_config_path, disable_existing_loggers=False)
-            except Exception as e:
-                print(f"Error loading logging config: {e}")
-        
+    def __init__(self, profiler: Optional[ProfileSession] = None):
+        """Initialize logging, components and optional profiler."""
+        configure_logging()
         self.logger = logging.getLogger("analyzer")
         self.connection_manager = DatabaseConnection()
         self.config_manager = DBConfigManager()
@@ -37,16 +37,21 @@ class DatabaseAnalyzer:
         self.name_matcher = None
         self.table_identifier = None
         self.query_processor = None
+        self.reembed_job = None
         self.current_config = None
         self.schema_dict = {}
+        self.profiler = profiler
         self.logger.debug("Initialized DatabaseAnalyzer")
 
     def run(self):
         """Run the CLI."""
         cli = DatabaseAnalyzerCLI(self)
         cli.run()
+        self._stop_reembedding()
         if self.table_identifier:
             self.table_identifier.save_name_matches()
+            self.logger.info(f"Result cache stats: {self.table_identifier.get_cache_stats()}")
+            self.table_identifier.close()
         if self.connection_manager:
             self.connection_manager.close()
         self.logger.info("Application shutdown")
@@ -86,6 +91,7 @@ class DatabaseAnalyzer:
         """Initialize all component managers."""
         db_name = self.current_config['database']
         self.logger.debug(f"Initializing managers for {db_name}")
+        self._stop_reembedding()
         self.schema_manager = SchemaManager(db_name)
         
         if self.schema_manager.needs_refresh(self.connection_manager.connection):
@@ -96,15 +102,24 @@ class DatabaseAnalyzer:
         else:
             self.logger.debug("Loading schema from cache")
             self.schema_dict = self.schema_manager.load_from_cache()
+        if self.profiler:
+            self.profiler.snapshot("schema_loaded")
         
         self.pattern_manager = PatternManager(self.schema_dict)
         self.feedback_manager = FeedbackManager(db_name)
         self.nlp_pipeline = NLPPipeline(self.pattern_manager, db_name)
         self.name_matcher = NameMatchManager(db_name)
+        self._start_reembedding()
         self.table_identifier = TableIdentifier(
             self.schema_dict,
             self.feedback_manager,
-            self.pattern_manager
+            self.pattern_manager,
+            self.name_matcher,
+            self.schema_manager.load_join_graph(
+                self.schema_dict, self.name_matcher.config.get('join_max_hops', 3)
+            ),
+            self._load_lexical_index(),
+            self._load_value_index()
         )
         self.query_processor = QueryProcessor(
             self.connection_manager,
@@ -115,8 +130,50 @@ class DatabaseAnalyzer:
             self.pattern_manager,
             db_name
         )
+        if self.profiler:
+            self.profiler.snapshot("models_loaded")
         self.logger.debug("Managers initialized")
 
+    def _start_reembedding(self):
+        """Re-encode feedback embedded by another model in the background."""
+        config = self.name_matcher.config.get('reembed', {})
+        if config.get('auto', True):
+            self.reembed_job = self.feedback_manager.start_reembedding(
+                config.get('batch_size', 256), config.get('workers', 0), self.name_matcher.config.get('encoder', {})
+            )
+
+    def _stop_reembedding(self):
+        """Cancel a running re-embedding job and wait for it before its FeedbackManager is replaced."""
+        if self.reembed_job is None:
+            return
+        self.reembed_job.cancel()
+        if self.reembed_job.thread is not None:
+            self.reembed_job.thread.join()
+        self.logger.debug(f"Stopped re-embedding: {self.reembed_job.status()}")
+        self.reembed_job = None
+
+    def get_reembed_status(self) -> Optional[Dict]:
+        """Return progress of the background re-embedding job, or None if none was started."""
+        return self.reembed_job.status() if self.reembed_job else None
+
+    def _load_lexical_index(self) -> Optional[LexicalIndex]:
+        """Load the BM25 index over the current schema and name-match synonyms, if enabled."""
+        config = self.name_matcher.config.get('lexical_index', {})
+        if not config.get('enabled', False):
+            return None
+        return self.schema_manager.load_lexical_index(
+            self.schema_dict, self.name_matcher.get_all_synonyms(), config.get('k1', 1.2), config.get('b', 0.75)
+        )
+
+    def _load_value_index(self, refresh: bool = False) -> Optional[ValueIndex]:
+        """Load the sampled column-value index, profiling the database when it is missing or stale, if enabled."""
+        config = self.name_matcher.config.get('value_index', {})
+        if not config.get('enabled', False):
+            return None
+        return self.schema_manager.load_value_index(
+            self.schema_dict, self.connection_manager.open_connection, config, refresh
+        )
+
     def reload_all_configurations(self) -> bool:
         """Reload all configurations and caches."""
         if not self.connection_manager.is_connected():
@@ -126,6 +183,9 @@ class DatabaseAnalyzer:
             
         try:
             self.logger.debug("Rebuilding schema")
+            if self.table_identifier:
+                self.table_identifier.close()
+            self._stop_reembedding()
             self.schema_dict = self.schema_manager.build_data_dict(
                 self.connection_manager.connection
             )
@@ -133,10 +193,17 @@ class DatabaseAnalyzer:
             self.feedback_manager = FeedbackManager(self.current_config['database'])
             self.nlp_pipeline = NLPPipeline(self.pattern_manager, self.current_config['database'])
             self.name_matcher = NameMatchManager(self.current_config['database'])
+            self._start_reembedding()
             self.table_identifier = TableIdentifier(
                 self.schema_dict,
                 self.feedback_manager,
-                self.pattern_manager
+                self.pattern_manager,
+                self.name_matcher,
+                self.schema_manager.load_join_graph(
+                    self.schema_dict, self.name_matcher.config.get('join_max_hops', 3)
+                ),
+                self._load_lexical_index(),
+                self._load_value_index(refresh=True)
             )
             self.query_processor = QueryProcessor(
                 self.connection_manager,
@@ -154,8 +221,8 @@ class DatabaseAnalyzer:
             print(f"Reload failed: {e}")
             return False
 
-    def process_query(self, query: str) -> Tuple[List[str], bool]:
-        """Process a natural language query."""
+    def process_query(self, query: str, deadline: Optional[float] = None) -> Tuple[List[str], bool]:
+        """Process a natural language query, optionally bounded by a time.monotonic() deadline."""
         if not self.connection_manager.is_connected():
             self.logger.error("Not connected to database")
             print("Not connected to database!")
@@ -167,8 +234,10 @@ class DatabaseAnalyzer:
             return None, False
             
         try:
-            tables, confidence = self.query_processor.process_query(query)
-            self.logger.debug(f"Query: {query}, Tables: {tables}, Confidence: {confidence}")
+            tables, confidence = self.query_processor.process_query(query, deadline)
+            if self.profiler:
+                self.profiler.query_completed()
+            self.logger.debug("Query: %s, Tables: %s, Confidence: %s", query, tables, confidence)
             return tables, confidence
         except Exception as e:
             self.logger.error(f"Query processing error: {e}")
@@ -196,17 +265,18 @@ class DatabaseAnalyzer:
             else:
                 invalid.append(table)
                 
-        self.logger.debug(f"Validated tables: Valid={valid}, Invalid={invalid}")
+        self.logger.debug("Validated tables: Valid=%s, Invalid=%s", valid, invalid)
         return valid, invalid
 
-    def generate_ddl(self, tables: List[str]):
-        """Generate DDL for specified tables."""
-        for table in tables:
+    def generate_ddl(self, tables: Optional[List[str]] = None, output_path: Optional[str] = None) -> int:
+        """Stream DDL for specified tables (all when None) to a file or stdout."""
+        selected = []
+        for table in (self.get_all_tables() if tables is None else tables):
             if '.' not in table:
                 print(f"Invalid format: {table}")
                 continue
                 
-            schema, table_name = table.split('.')
+            schema, table_name = table.split('.', 1)
             if schema not in self.schema_dict['tables']:
                 print(f"Schema not found: {schema}")
                 continue
@@ -214,23 +284,22 @@ class DatabaseAnalyzer:
             if table_name not in self.schema_dict['tables'][schema]:
                 print(f"Table not found: {table_name} in schema {schema}")
                 continue
-                
-            self.logger.debug(f"Generating DDL for {schema}.{table_name}")
-            print(f"\n-- DDL for {schema}.{table_name}")
-            columns = self.schema_dict['columns'][schema][table_name]
-            col_defs = []
-            
-            for col_name, col_info in columns.items():
-                col_def = f"    [{col_name}] {col_info['type']}"
-                if col_info.get('is_primary_key'):
-                    col_def += " PRIMARY KEY"
-                if not col_info.get('nullable'):
-                    col_def += " NOT NULL"
-                col_defs.append(col_def)
-                
-            print("CREATE TABLE [{}].[{}] (\n{}\n);".format(
-                schema, table_name, ",\n".join(col_defs)
-            ))
+            selected.append((schema, table_name))
+        
+        self.logger.debug(f"Generating DDL for {len(selected)} tables")
+        exporter = DDLExporter(self.schema_dict, self.connection_manager.connection)
+        if not output_path:
+            return exporter.export(selected, sys.stdout)
+        try:
+            with open(output_path, 'w') as f:
+                count = exporter.export(selected, f)
+            print(f"Wrote DDL for {count} tables to {output_path}")
+            self.logger.info(f"Exported DDL for {count} tables to {output_path}")
+            return count
+        except Exception as e:
+            self.logger.error(f"DDL export failed: {e}")
+            print(f"DDL export failed: {e}")
+            return 0
 
     def close_connection(self):
         """Close database connection."""
@@ -246,7 +315,7 @@ class DatabaseAnalyzer:
         tables = []
         for schema in self.schema_dict['tables']:
             tables.extend(f"{schema}.{table}" for table in self.schema_dict['tables'][schema])
-        self.logger.debug(f"All tables: {tables}")
+        self.logger.debug("All tables: %s", tables)
         return tables
 
     def confirm_tables(self, query: str, tables: List[str]):
@@ -265,6 +334,28 @@ class DatabaseAnalyzer:
                 self.table_identifier.update_weights_from_feedback(query, tables)
             self.logger.info(f"Updated feedback for query: {query}")
 
+    def get_synonym_candidates(self) -> List[Dict]:
+        """Get pending synonym suggestions."""
+        if not self.name_matcher:
+            return []
+        return self.name_matcher.get_review_candidates()
+
+    def review_synonyms(self, approved: List[Tuple[str, str]], rejected: List[Tuple[str, str]]) -> int:
+        """Apply bulk synonym review decisions and return how many synonyms were registered."""
+        if not self.name_matcher:
+            self.logger.error("Name matcher not initialized")
+            return 0
+        count = self.name_matcher.approve_synonyms(approved)
+        self.name_matcher.reject_synonyms(rejected)
+        self.logger.info(f"Synonym review: {count} approved, {len(rejected)} rejected")
+        return count
+
+    def get_cache_stats(self) -> Dict:
+        """Get table identification cache statistics."""
+        if not self.table_identifier:
+            return {}
+        return self.table_identifier.get_cache_stats()
+
     def clear_feedback(self):
         """Clear all feedback data."""
         if self.feedback_manager:
@@ -276,5 +367,19 @@ class DatabaseAnalyzer:
             print("Feedback manager not initialized. Please connect to a database.")
 
 if __name__ == "__main__":
-    analyzer = DatabaseAnalyzer()
-    analyzer.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Database Schema Analyzer")
+    parser.add_argument("--profile", nargs="?", const="cprofile", choices=["cprofile", "sample"],
+                        help="profile the session (also enabled by ANALYZER_PROFILE)")
+    parser.add_argument("--profile-dir", help="root directory for profile artefacts (default: profiles)")
+    parser.add_argument("--profile-every", type=int, help="take a memory snapshot every N queries (default: 25)")
+    args = parser.parse_args()
+    
+    profiler = ProfileSession.from_env(args.profile, args.profile_dir, args.profile_every)
+    analyzer = DatabaseAnalyzer(profiler)
+    if profiler:
+        profiler.start()
+    try:
+        analyzer.run()
+    finally:
+        if profiler:
+            profiler.stop()
\ No newline at end of file
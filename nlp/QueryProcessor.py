@@ -1,10 +1,8 @@
 # nlp/QueryProcessor.py: Processes natural language queries into SQL
 # Basic version for TableIdentifier-Working-Version-1
 
-import os
 import logging
-import logging.config
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from analysis.table_identifier import TableIdentifier
 from analysis.name_match_manager import NameMatchManager
 from analysis.processor import NLPPipeline
@@ -25,13 +23,6 @@ class QueryProcessor:
         db_name: str
     ):
         """Initialize with required components."""
-        logging_config_path = f"app-config/logging_config.ini"
-        if os.path.exists(logging_config_path):
-            try:
-                logging.config.fileConfig(logging_config_path, disable_existing_loggers=False)
-            except Exception as e:
-                print(f"Error loading logging config: {e}")
-        
         self.logger = logging.getLogger("query_processor")
         self.connection_manager = connection_manager
         self.schema_dict = schema_dict
@@ -42,23 +33,26 @@ class QueryProcessor:
         self.db_name = db_name
         self.logger.debug(f"Initialized QueryProcessor for {db_name}")
 
-    def process_query(self, query: str) -> Tuple[List[str], bool]:
-        """Process a natural language query."""
-        self.logger.debug(f"Processing query: {query}")
-        tables, confidence = self.table_identifier.identify_tables(query)
+    def process_query(self, query: str, deadline: Optional[float] = None) -> Tuple[List[str], bool]:
+        """Process a natural language query, identifying tables within an optional time.monotonic() deadline."""
+        self.logger.debug("Processing query: %s", query)
+        tables, confidence = self.table_identifier.identify_tables(query, deadline)
         if not tables:
             self.logger.warning("No tables identified")
             return None, False
 
         # Basic column matching
         analysis = self.nlp_pipeline.analyze_query(query)
-        tokens = analysis["tokens"]
-        for token in tokens:
-            for table in tables:
-                schema, tbl = table.split('.')
-                columns = self.schema_dict['columns'][schema][tbl]
-                self.name_matcher.update_synonyms([token], self.name_matcher.get_token_embeddings([token]), columns)
+        tokens = list(dict.fromkeys(analysis["tokens"]))
+        columns = []
+        for table in tables:
+            schema, tbl = table.split('.')
+            columns.extend(self.schema_dict['columns'][schema][tbl])
+        pending = self.name_matcher.update_synonyms_batch(
+            tokens, self.name_matcher.get_token_embeddings(tokens), columns
+        )
+        self.name_matcher.queue_synonym_candidates(pending)
 
-        self.table_identifier.update_weights_from_feedback(query, tables)
+        # Table weights are learned only from confirmed tables (DatabaseAnalyzer.confirm_tables/update_feedback)
         self.logger.info(f"Identified tables: {tables}, Confidence: {confidence}")
         return tables, confidence
\ No newline at end of file
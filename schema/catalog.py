@@ -0,0 +1,397 @@
+# schema/catalog.py: Compact in-memory catalog behind a read-only schema_dict view
+# Names are interned once, column records live in NumPy arrays and FK edges are integer column-id pairs
+
+import sys
+from collections.abc import Mapping, Sequence
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+
+# Bits of Catalog.flags
+NULLABLE, IDENTITY, PRIMARY_KEY = 1, 2, 4
+
+class Catalog(Mapping):
+    """Schema metadata in flat arrays, readable as the nested schema_dict it replaces.
+
+    Tables are numbered in schema order and own the contiguous column ids
+    table_columns[t]:table_columns[t + 1]. Column, table and type names are
+    integer ids into interned name lists; descriptions are stored sparsely.
+    Nested lookups return the same shapes as before (plain dicts for a
+    table's or a column's info), built on access. Only the scalar
+    'database' and 'fingerprint' keys can be assigned.
+    """
+
+    __slots__ = (
+        'scalars', 'names', 'schema_names', 'schema_object_ids', 'schema_index', 'listed_schemas',
+        'table_schema', 'table_name_ids', 'table_object_ids', 'table_descriptions', 'table_columns', 'table_index',
+        'column_name_ids', 'column_ids', 'column_type_ids', 'max_length', 'precision', 'scale', 'flags',
+        'column_descriptions', 'fk_from', 'fk_to', 'unresolved_relationships'
+    )
+
+    STRUCTURE = ('schemas', 'tables', 'columns', 'relationships')
+
+    def __init__(self):
+        """Create an empty catalog; use from_dict() to fill one."""
+        self.scalars: Dict[str, str] = {}
+        self.names: List[str] = []
+        self.schema_names: List[str] = []
+        self.schema_object_ids: List[Optional[int]] = []
+        self.schema_index: Dict[str, int] = {}
+        self.listed_schemas: List[str] = []
+        self.table_schema = np.empty(0, dtype=np.int32)
+        self.table_name_ids = np.empty(0, dtype=np.int32)
+        self.table_object_ids = np.empty(0, dtype=np.int64)
+        self.table_descriptions: Dict[int, str] = {}
+        self.table_columns = np.zeros(1, dtype=np.int64)
+        self.table_index: List[Dict[str, int]] = []
+        self.column_name_ids = np.empty(0, dtype=np.int32)
+        self.column_ids = np.empty(0, dtype=np.int32)
+        self.column_type_ids = np.empty(0, dtype=np.int32)
+        self.max_length = np.empty(0, dtype=np.int32)
+        self.precision = np.empty(0, dtype=np.int16)
+        self.scale = np.empty(0, dtype=np.int16)
+        self.flags = np.empty(0, dtype=np.uint8)
+        self.column_descriptions: Dict[int, str] = {}
+        self.fk_from = np.empty(0, dtype=np.int32)
+        self.fk_to = np.empty(0, dtype=np.int32)
+        self.unresolved_relationships: List[Dict] = []
+
+    @classmethod
+    def from_dict(cls, schema_dict: Dict) -> 'Catalog':
+        """Build a catalog from a nested schema_dict (as cached in schema.json)."""
+        catalog = cls()
+        name_ids: Dict[str, int] = {}
+
+        def intern(name: str) -> int:
+            name_id = name_ids.get(name)
+            if name_id is None:
+                name_id = name_ids[name] = len(catalog.names)
+                catalog.names.append(sys.intern(str(name)))
+            return name_id
+
+        for key, value in schema_dict.items():
+            if key not in cls.STRUCTURE:
+                catalog.scalars[key] = value
+        schemas = schema_dict.get('schemas', {})
+        catalog.listed_schemas = [sys.intern(str(schema)) for schema in schemas]
+        # Schema ids follow the 'tables' order, which fixes the table order every consumer relies on
+        tables_order = list(schema_dict.get('tables', {}))
+        for schema in tables_order + [s for s in schemas if s not in tables_order]:
+            catalog.schema_index[schema] = len(catalog.schema_names)
+            catalog.schema_names.append(sys.intern(str(schema)))
+            catalog.schema_object_ids.append(schemas.get(schema, {}).get('id'))
+            catalog.table_index.append({})
+
+        table_schema, table_name_ids, table_object_ids, table_columns = [], [], [], [0]
+        column_name_ids, column_ids, column_type_ids, max_length, precision, scale, flags = [], [], [], [], [], [], []
+        for schema, tables in schema_dict.get('tables', {}).items():
+            schema_id = catalog.schema_index[schema]
+            columns = schema_dict.get('columns', {}).get(schema, {})
+            for table, info in tables.items():
+                table_id = len(table_name_ids)
+                catalog.table_index[schema_id][table] = table_id
+                table_schema.append(schema_id)
+                table_name_ids.append(intern(table))
+                table_object_ids.append(info.get('id') if isinstance(info, dict) and info.get('id') is not None else -1)
+                if isinstance(info, dict) and info.get('description'):
+                    catalog.table_descriptions[table_id] = info['description']
+                for col, col_info in columns.get(table, {}).items():
+                    if col_info.get('description'):
+                        catalog.column_descriptions[len(column_name_ids)] = col_info['description']
+                    column_name_ids.append(intern(col))
+                    column_ids.append(col_info.get('id') or 0)
+                    column_type_ids.append(intern(col_info.get('type') or ''))
+                    max_length.append(col_info.get('max_length') or 0)
+                    precision.append(col_info.get('precision') or 0)
+                    scale.append(col_info.get('scale') or 0)
+                    flags.append(
+                        (NULLABLE if col_info.get('nullable') else 0)
+                        | (IDENTITY if col_info.get('identity') else 0)
+                        | (PRIMARY_KEY if col_info.get('is_primary_key') else 0)
+                    )
+                table_columns.append(len(column_name_ids))
+
+        catalog.table_schema = np.array(table_schema, dtype=np.int32)
+        catalog.table_name_ids = np.array(table_name_ids, dtype=np.int32)
+        catalog.table_object_ids = np.array(table_object_ids, dtype=np.int64)
+        catalog.table_columns = np.array(table_columns, dtype=np.int64)
+        catalog.column_name_ids = np.array(column_name_ids, dtype=np.int32)
+        catalog.column_ids = np.array(column_ids, dtype=np.int32)
+        catalog.column_type_ids = np.array(column_type_ids, dtype=np.int32)
+        catalog.max_length = np.array(max_length, dtype=np.int32)
+        catalog.precision = np.array(precision, dtype=np.int16)
+        catalog.scale = np.array(scale, dtype=np.int16)
+        catalog.flags = np.array(flags, dtype=np.uint8)
+
+        fk_from, fk_to = [], []
+        for rel in schema_dict.get('relationships', []):
+            source, target = catalog.find_column(rel['from']), catalog.find_column(rel['to'])
+            if source is None or target is None:
+                catalog.unresolved_relationships.append(dict(rel))
+                continue
+            fk_from.append(source)
+            fk_to.append(target)
+        catalog.fk_from = np.array(fk_from, dtype=np.int32)
+        catalog.fk_to = np.array(fk_to, dtype=np.int32)
+        return catalog
+
+    def to_dict(self) -> Dict:
+        """Expand back into a plain nested schema_dict, e.g. for JSON."""
+        schema_dict = dict(self.scalars)
+        schema_dict['schemas'] = {schema: dict(info) for schema, info in self['schemas'].items()}
+        schema_dict['tables'] = {
+            schema: {table: info for table, info in tables.items()} for schema, tables in self['tables'].items()
+        }
+        schema_dict['columns'] = {
+            schema: {table: dict(columns.items()) for table, columns in tables.items()}
+            for schema, tables in self['columns'].items()
+        }
+        schema_dict['relationships'] = list(self['relationships'])
+        return schema_dict
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate size of the arrays, interned names and descriptions."""
+        arrays = sum(
+            getattr(self, name).nbytes for name in (
+                'table_schema', 'table_name_ids', 'table_object_ids', 'table_columns', 'column_name_ids',
+                'column_ids', 'column_type_ids', 'max_length', 'precision', 'scale', 'flags', 'fk_from', 'fk_to'
+            )
+        )
+        strings = sum(sys.getsizeof(name) for name in self.names) + sys.getsizeof(self.names)
+        descriptions = sum(sys.getsizeof(text) for text in self.column_descriptions.values())
+        descriptions += sum(sys.getsizeof(text) for text in self.table_descriptions.values())
+        return arrays + strings + descriptions
+
+    def table_id(self, schema: str, table: str) -> Optional[int]:
+        """Return the id of schema.table, or None."""
+        schema_id = self.schema_index.get(schema)
+        return None if schema_id is None else self.table_index[schema_id].get(table)
+
+    def table_name(self, table_id: int) -> Tuple[str, str]:
+        """Return (schema, table) of a table id."""
+        return self.schema_names[self.table_schema[table_id]], self.names[self.table_name_ids[table_id]]
+
+    def column_range(self, table_id: int) -> range:
+        """Return the column ids of a table."""
+        return range(int(self.table_columns[table_id]), int(self.table_columns[table_id + 1]))
+
+    def column_table(self, column: int) -> int:
+        """Return the table id owning a column id."""
+        return int(np.searchsorted(self.table_columns, column, side='right')) - 1
+
+    def column_name(self, column: int) -> str:
+        """Return the name of a column id."""
+        return self.names[self.column_name_ids[column]]
+
+    def column_info(self, column: int) -> Dict:
+        """Return a column's info dict in the schema_dict layout."""
+        flags = int(self.flags[column])
+        info = {
+            'id': int(self.column_ids[column]),
+            'type': self.names[self.column_type_ids[column]],
+            'max_length': int(self.max_length[column]),
+            'precision': int(self.precision[column]),
+            'scale': int(self.scale[column]),
+            'nullable': bool(flags & NULLABLE),
+            'identity': bool(flags & IDENTITY),
+            'description': self.column_descriptions.get(column)
+        }
+        if flags & PRIMARY_KEY:
+            info['is_primary_key'] = True
+        return info
+
+    def column_ref(self, column: int) -> str:
+        """Return 'schema.table.column' for a column id."""
+        schema, table = self.table_name(self.column_table(column))
+        return f"{schema}.{table}.{self.column_name(column)}"
+
+    def find_column(self, ref: str) -> Optional[int]:
+        """Return the column id of 'schema.table.column', or None."""
+        parts = ref.split('.', 2)
+        if len(parts) != 3:
+            return None
+        table_id = self.table_id(parts[0], parts[1])
+        if table_id is None:
+            return None
+        for column in self.column_range(table_id):
+            if self.column_name(column) == parts[2]:
+                return column
+        return None
+
+    def __getitem__(self, key: str):
+        if key == 'schemas':
+            return _SchemasView(self)
+        if key == 'tables':
+            return _TablesView(self)
+        if key == 'columns':
+            return _ColumnsView(self)
+        if key == 'relationships':
+            return _RelationshipsView(self)
+        return self.scalars[key]
+
+    def __setitem__(self, key: str, value):
+        if key in self.STRUCTURE:
+            raise TypeError(f"Catalog '{key}' is read-only")
+        self.scalars[key] = value
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.scalars
+        yield from self.STRUCTURE
+
+    def __len__(self) -> int:
+        return len(self.scalars) + len(self.STRUCTURE)
+
+class _SchemasView(Mapping):
+    """schema -> {'id', 'tables'}."""
+
+    __slots__ = ('catalog',)
+
+    def __init__(self, catalog: Catalog):
+        self.catalog = catalog
+
+    def __getitem__(self, schema: str) -> Dict:
+        if schema not in self.catalog.listed_schemas:
+            raise KeyError(schema)
+        schema_id = self.catalog.schema_index[schema]
+        return {'id': self.catalog.schema_object_ids[schema_id], 'tables': list(self.catalog.table_index[schema_id])}
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.catalog.listed_schemas)
+
+    def __len__(self) -> int:
+        return len(self.catalog.listed_schemas)
+
+class _TablesView(Mapping):
+    """schema -> table -> {'id', 'columns', 'description'}, over schemas that have tables."""
+
+    __slots__ = ('catalog',)
+
+    def __init__(self, catalog: Catalog):
+        self.catalog = catalog
+
+    def _schemas(self) -> List[str]:
+        return [schema for schema, tables in zip(self.catalog.schema_names, self.catalog.table_index) if tables]
+
+    def __getitem__(self, schema: str) -> '_SchemaTablesView':
+        schema_id = self.catalog.schema_index.get(schema)
+        if schema_id is None or not self.catalog.table_index[schema_id]:
+            raise KeyError(schema)
+        return _SchemaTablesView(self.catalog, schema_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._schemas())
+
+    def __len__(self) -> int:
+        return len(self._schemas())
+
+class _SchemaTablesView(Mapping):
+    """table -> {'id', 'columns', 'description'} for one schema."""
+
+    __slots__ = ('catalog', 'tables')
+
+    def __init__(self, catalog: Catalog, schema_id: int):
+        self.catalog = catalog
+        self.tables = catalog.table_index[schema_id]
+
+    def __getitem__(self, table: str) -> Dict:
+        table_id = self.tables[table]
+        object_id = int(self.catalog.table_object_ids[table_id])
+        return {
+            'id': None if object_id == -1 else object_id,
+            'columns': [self.catalog.column_name(column) for column in self.catalog.column_range(table_id)],
+            'description': self.catalog.table_descriptions.get(table_id)
+        }
+
+    def __contains__(self, table) -> bool:
+        return table in self.tables
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.tables)
+
+    def __len__(self) -> int:
+        return len(self.tables)
+
+class _ColumnsView(_TablesView):
+    """schema -> table -> column -> column info."""
+
+    __slots__ = ()
+
+    def __getitem__(self, schema: str) -> '_SchemaColumnsView':
+        schema_id = self.catalog.schema_index.get(schema)
+        if schema_id is None or not self.catalog.table_index[schema_id]:
+            raise KeyError(schema)
+        return _SchemaColumnsView(self.catalog, schema_id)
+
+class _SchemaColumnsView(_SchemaTablesView):
+    """table -> column -> column info for one schema."""
+
+    __slots__ = ()
+
+    def __getitem__(self, table: str) -> '_TableColumnsView':
+        return _TableColumnsView(self.catalog, self.tables[table])
+
+class _TableColumnsView(Mapping):
+    """column -> column info for one table, in catalog order."""
+
+    __slots__ = ('catalog', 'columns')
+
+    def __init__(self, catalog: Catalog, table_id: int):
+        self.catalog = catalog
+        self.columns = catalog.column_range(table_id)
+
+    def _find(self, col: str) -> int:
+        for column in self.columns:
+            if self.catalog.column_name(column) == col:
+                return column
+        raise KeyError(col)
+
+    def __getitem__(self, col: str) -> Dict:
+        return self.catalog.column_info(self._find(col))
+
+    def __contains__(self, col) -> bool:
+        try:
+            self._find(col)
+            return True
+        except KeyError:
+            return False
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.catalog.column_name(column) for column in self.columns)
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def items(self) -> List[Tuple[str, Dict]]:
+        return [(self.catalog.column_name(column), self.catalog.column_info(column)) for column in self.columns]
+
+    def values(self) -> List[Dict]:
+        return [self.catalog.column_info(column) for column in self.columns]
+
+class _RelationshipsView(Sequence):
+    """FK edges as {'from', 'to', 'cross_schema'} dicts."""
+
+    __slots__ = ('catalog',)
+
+    def __init__(self, catalog: Catalog):
+        self.catalog = catalog
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        edges = len(self.catalog.fk_from)
+        if index >= edges:
+            return dict(self.catalog.unresolved_relationships[index - edges])
+        source, target = int(self.catalog.fk_from[index]), int(self.catalog.fk_to[index])
+        return {
+            'from': self.catalog.column_ref(source),
+            'to': self.catalog.column_ref(target),
+            'cross_schema': bool(
+                self.catalog.table_schema[self.catalog.column_table(source)]
+                != self.catalog.table_schema[self.catalog.column_table(target)]
+            )
+        }
+
+    def __len__(self) -> int:
+        return len(self.catalog.fk_from) + len(self.catalog.unresolved_relationships)
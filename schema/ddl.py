@@ -0,0 +1,302 @@
+# schema/ddl.py: Streams CREATE TABLE scripts for many tables
+# Catalog extras (keys, indexes, defaults, identity, FKs) come from a few set-based queries
+
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, TextIO, Tuple
+
+LENGTH_TYPES = {'varchar', 'char', 'varbinary', 'binary'}
+UNICODE_LENGTH_TYPES = {'nvarchar', 'nchar'}
+DECIMAL_TYPES = {'decimal', 'numeric'}
+FRACTIONAL_TYPES = {'datetime2', 'time', 'datetimeoffset'}
+
+def format_type(col_info: Dict) -> str:
+    """Render a column type with its length, precision or scale."""
+    type_name = col_info['type']
+    type_lower = type_name.lower()
+    max_length = col_info.get('max_length')
+    if type_lower in LENGTH_TYPES | UNICODE_LENGTH_TYPES and max_length is not None:
+        if max_length == -1:
+            return f"{type_name}(MAX)"
+        return f"{type_name}({max_length // 2 if type_lower in UNICODE_LENGTH_TYPES else max_length})"
+    if type_lower in DECIMAL_TYPES and col_info.get('precision') is not None:
+        return f"{type_name}({col_info['precision']}, {col_info.get('scale') or 0})"
+    if type_lower in FRACTIONAL_TYPES and col_info.get('scale') is not None:
+        return f"{type_name}({col_info['scale']})"
+    return type_name
+
+def quote(*parts: str) -> str:
+    """Return a bracket-quoted multipart name."""
+    return '.'.join(f"[{part.replace(']', ']]')}]" for part in parts)
+
+class DDLExporter:
+    """Generates DDL from the cached schema plus bulk-fetched catalog details."""
+
+    def __init__(self, schema_dict: Dict, connection=None):
+        """Initialize with schema dictionary and optional live connection."""
+        self.logger = logging.getLogger("schema")
+        self.schema_dict = schema_dict
+        self.connection = connection
+        self.extras: Optional[Dict] = None
+        self._relationships: Optional[Dict[Tuple[str, str], List[Dict]]] = None
+
+    @staticmethod
+    def _empty_extras() -> Dict:
+        """Return extras with nothing fetched from the catalog."""
+        return {
+            'from_catalog': False,
+            'defaults': {},
+            'identity': {},
+            'indexes': defaultdict(dict),
+            'checks': defaultdict(list),
+            'foreign_keys': defaultdict(dict)
+        }
+
+    def _load_extras(self) -> Dict:
+        """Fetch keys, indexes, defaults, identity and FKs for all tables at once."""
+        if self.extras is not None:
+            return self.extras
+        extras = self._empty_extras()
+        if self.connection is not None:
+            try:
+                with self.connection.cursor() as cursor:
+                    self._fetch_defaults(cursor, extras)
+                    self._fetch_identity(cursor, extras)
+                    self._fetch_indexes(cursor, extras)
+                    self._fetch_checks(cursor, extras)
+                    self._fetch_foreign_keys(cursor, extras)
+                extras['from_catalog'] = True
+                self.logger.debug("Fetched catalog extras for DDL export")
+            except Exception as e:
+                self.logger.error(f"Error fetching catalog extras, exporting from cached schema only: {e}")
+                extras = self._empty_extras()
+        self.extras = extras
+        return extras
+
+    def _fetch_defaults(self, cursor, extras: Dict):
+        """Fetch default constraints."""
+        cursor.execute("""
+            SELECT s.name AS schema_name, t.name AS table_name, c.name AS column_name,
+                   dc.name AS constraint_name, dc.definition
+            FROM sys.default_constraints dc
+            JOIN sys.tables t ON dc.parent_object_id = t.object_id
+            JOIN sys.schemas s ON t.schema_id = s.schema_id
+            JOIN sys.columns c ON
+                c.object_id = dc.parent_object_id AND
+                c.column_id = dc.parent_column_id
+            WHERE t.is_ms_shipped = 0
+        """)
+        for row in cursor.fetchall():
+            key = (row.schema_name.lower(), row.table_name.lower(), row.column_name.lower())
+            extras['defaults'][key] = (row.constraint_name, row.definition)
+
+    def _fetch_identity(self, cursor, extras: Dict):
+        """Fetch identity seeds and increments."""
+        cursor.execute("""
+            SELECT s.name AS schema_name, t.name AS table_name, ic.name AS column_name,
+                   CAST(ic.seed_value AS bigint) AS seed_value,
+                   CAST(ic.increment_value AS bigint) AS increment_value
+            FROM sys.identity_columns ic
+            JOIN sys.tables t ON ic.object_id = t.object_id
+            JOIN sys.schemas s ON t.schema_id = s.schema_id
+            WHERE t.is_ms_shipped = 0
+        """)
+        for row in cursor.fetchall():
+            key = (row.schema_name.lower(), row.table_name.lower(), row.column_name.lower())
+            extras['identity'][key] = (row.seed_value, row.increment_value)
+
+    def _fetch_indexes(self, cursor, extras: Dict):
+        """Fetch primary keys, unique constraints and indexes with their columns."""
+        cursor.execute("""
+            SELECT s.name AS schema_name, t.name AS table_name, i.name AS index_name,
+                   i.type_desc, i.is_primary_key, i.is_unique_constraint, i.is_unique,
+                   i.filter_definition, c.name AS column_name,
+                   ic.is_descending_key, ic.is_included_column
+            FROM sys.indexes i
+            JOIN sys.tables t ON i.object_id = t.object_id
+            JOIN sys.schemas s ON t.schema_id = s.schema_id
+            JOIN sys.index_columns ic ON
+                ic.object_id = i.object_id AND
+                ic.index_id = i.index_id
+            JOIN sys.columns c ON
+                c.object_id = ic.object_id AND
+                c.column_id = ic.column_id
+            WHERE t.is_ms_shipped = 0 AND i.type IN (1, 2) AND i.is_hypothetical = 0
+            ORDER BY s.name, t.name, i.index_id, ic.key_ordinal, ic.index_column_id
+        """)
+        for row in cursor.fetchall():
+            table_key = (row.schema_name.lower(), row.table_name.lower())
+            index = extras['indexes'][table_key].setdefault(row.index_name, {
+                'type': row.type_desc,
+                'primary_key': bool(row.is_primary_key),
+                'unique_constraint': bool(row.is_unique_constraint),
+                'unique': bool(row.is_unique),
+                'filter': row.filter_definition,
+                'columns': [],
+                'included': []
+            })
+            if row.is_included_column:
+                index['included'].append(row.column_name)
+            else:
+                index['columns'].append((row.column_name, bool(row.is_descending_key)))
+
+    def _fetch_checks(self, cursor, extras: Dict):
+        """Fetch check constraints."""
+        cursor.execute("""
+            SELECT s.name AS schema_name, t.name AS table_name,
+                   cc.name AS constraint_name, cc.definition
+            FROM sys.check_constraints cc
+            JOIN sys.tables t ON cc.parent_object_id = t.object_id
+            JOIN sys.schemas s ON t.schema_id = s.schema_id
+            WHERE t.is_ms_shipped = 0
+        """)
+        for row in cursor.fetchall():
+            extras['checks'][(row.schema_name.lower(), row.table_name.lower())].append(
+                (row.constraint_name, row.definition)
+            )
+
+    def _fetch_foreign_keys(self, cursor, extras: Dict):
+        """Fetch foreign keys grouped by constraint, columns in order."""
+        cursor.execute("""
+            SELECT fk.name AS constraint_name,
+                   fs.name AS from_schema, ft.name AS from_table, fc.name AS from_column,
+                   ts.name AS to_schema, tt.name AS to_table, tc.name AS to_column,
+                   fk.delete_referential_action_desc AS on_delete,
+                   fk.update_referential_action_desc AS on_update
+            FROM sys.foreign_keys fk
+            JOIN sys.foreign_key_columns fkc ON fkc.constraint_object_id = fk.object_id
+            JOIN sys.tables ft ON fk.parent_object_id = ft.object_id
+            JOIN sys.schemas fs ON ft.schema_id = fs.schema_id
+            JOIN sys.columns fc ON
+                fc.object_id = fkc.parent_object_id AND
+                fc.column_id = fkc.parent_column_id
+            JOIN sys.tables tt ON fk.referenced_object_id = tt.object_id
+            JOIN sys.schemas ts ON tt.schema_id = ts.schema_id
+            JOIN sys.columns tc ON
+                tc.object_id = fkc.referenced_object_id AND
+                tc.column_id = fkc.referenced_column_id
+            WHERE ft.is_ms_shipped = 0
+            ORDER BY fk.name, fkc.constraint_column_id
+        """)
+        for row in cursor.fetchall():
+            table_key = (row.from_schema.lower(), row.from_table.lower())
+            fk = extras['foreign_keys'][table_key].setdefault(row.constraint_name, {
+                'to_schema': row.to_schema,
+                'to_table': row.to_table,
+                'from_columns': [],
+                'to_columns': [],
+                'on_delete': row.on_delete,
+                'on_update': row.on_update
+            })
+            fk['from_columns'].append(row.from_column)
+            fk['to_columns'].append(row.to_column)
+
+    def _cached_foreign_keys(self, schema: str, table: str) -> Dict[str, Dict]:
+        """Build single-column FKs from schema_dict['relationships'] when the catalog is unavailable."""
+        if self._relationships is None:
+            self._relationships = defaultdict(list)
+            for rel in self.schema_dict.get('relationships', []):
+                from_schema, from_table, _ = rel['from'].split('.', 2)
+                self._relationships[(from_schema.lower(), from_table.lower())].append(rel)
+        fks = {}
+        for rel in self._relationships.get((schema.lower(), table.lower()), []):
+            from_column = rel['from'].rsplit('.', 1)[1]
+            to_schema, to_table, to_column = rel['to'].split('.', 2)
+            fks[f"FK_{table}_{to_table}_{from_column}"] = {
+                'to_schema': to_schema,
+                'to_table': to_table,
+                'from_columns': [from_column],
+                'to_columns': [to_column],
+                'on_delete': 'NO_ACTION',
+                'on_update': 'NO_ACTION'
+            }
+        return fks
+
+    def _column_lines(self, schema: str, table: str, extras: Dict, cached_pk: bool) -> List[str]:
+        """Render column definitions in catalog order."""
+        columns = sorted(
+            self.schema_dict['columns'][schema][table].items(),
+            key=lambda item: item[1].get('id') or 0
+        )
+        pk_columns = [col for col, info in columns if info.get('is_primary_key')] if cached_pk else []
+        inline_pk = len(pk_columns) == 1
+        lines = []
+        for col_name, col_info in columns:
+            key = (schema.lower(), table.lower(), col_name.lower())
+            line = f"    {quote(col_name)} {format_type(col_info)}"
+            if col_info.get('identity'):
+                seed, increment = extras['identity'].get(key, (1, 1))
+                line += f" IDENTITY({seed}, {increment})"
+            line += " NULL" if col_info.get('nullable') else " NOT NULL"
+            if inline_pk and col_info.get('is_primary_key'):
+                line += " PRIMARY KEY"
+            if key in extras['defaults']:
+                constraint, definition = extras['defaults'][key]
+                line += f" CONSTRAINT {quote(constraint)} DEFAULT {definition}"
+            lines.append(line)
+        if len(pk_columns) > 1:
+            lines.append(f"    PRIMARY KEY ({', '.join(quote(col) for col in pk_columns)})")
+        return lines
+
+    def table_ddl(self, schema: str, table: str) -> Tuple[str, List[str]]:
+        """Return (CREATE TABLE and index statements, deferred FK statements) for a table."""
+        extras = self._load_extras()
+        table_key = (schema.lower(), table.lower())
+        indexes = extras['indexes'].get(table_key, {})
+        has_key_constraint = any(index['primary_key'] for index in indexes.values())
+        lines = self._column_lines(schema, table, extras, cached_pk=not has_key_constraint)
+
+        statements = []
+        for name, index in indexes.items():
+            key_columns = ', '.join(f"{quote(col)}{' DESC' if desc else ''}" for col, desc in index['columns'])
+            if index['primary_key'] or index['unique_constraint']:
+                kind = 'PRIMARY KEY' if index['primary_key'] else 'UNIQUE'
+                lines.append(f"    CONSTRAINT {quote(name)} {kind} {index['type']} ({key_columns})")
+                continue
+            statement = (
+                f"CREATE {'UNIQUE ' if index['unique'] else ''}{index['type']} INDEX {quote(name)} "
+                f"ON {quote(schema, table)} ({key_columns})"
+            )
+            if index['included']:
+                statement += f" INCLUDE ({', '.join(quote(col) for col in index['included'])})"
+            if index['filter']:
+                statement += f" WHERE {index['filter']}"
+            statements.append(statement + ";")
+        for name, definition in extras['checks'].get(table_key, []):
+            lines.append(f"    CONSTRAINT {quote(name)} CHECK {definition}")
+
+        ddl = [f"-- DDL for {schema}.{table}", f"CREATE TABLE {quote(schema, table)} (\n" + ",\n".join(lines) + "\n);"]
+        ddl.extend(statements)
+
+        if extras['from_catalog']:
+            foreign_keys = extras['foreign_keys'].get(table_key, {})
+        else:
+            foreign_keys = self._cached_foreign_keys(schema, table)
+        deferred = []
+        for name, fk in foreign_keys.items():
+            statement = (
+                f"ALTER TABLE {quote(schema, table)} ADD CONSTRAINT {quote(name)} "
+                f"FOREIGN KEY ({', '.join(quote(col) for col in fk['from_columns'])}) "
+                f"REFERENCES {quote(fk['to_schema'], fk['to_table'])} "
+                f"({', '.join(quote(col) for col in fk['to_columns'])})"
+            )
+            if fk['on_delete'] and fk['on_delete'] != 'NO_ACTION':
+                statement += f" ON DELETE {fk['on_delete'].replace('_', ' ')}"
+            if fk['on_update'] and fk['on_update'] != 'NO_ACTION':
+                statement += f" ON UPDATE {fk['on_update'].replace('_', ' ')}"
+            deferred.append(statement + ";")
+        return "\n".join(ddl), deferred
+
+    def export(self, tables: Iterable[Tuple[str, str]], out: TextIO) -> int:
+        """Stream DDL for (schema, table) pairs to out, FKs last so the script runs in order."""
+        deferred: List[str] = []
+        count = 0
+        for schema, table in tables:
+            ddl, foreign_keys = self.table_ddl(schema, table)
+            out.write(ddl + "\n\n")
+            deferred.extend(foreign_keys)
+            count += 1
+        if deferred:
+            out.write("-- Foreign keys\n" + "\n".join(deferred) + "\n")
+        self.logger.debug(f"Exported DDL for {count} tables, {len(deferred)} foreign keys")
+        return count
@@ -0,0 +1,82 @@
+# schema/fingerprint.py: Content hash of the catalog and the artefacts derived from it
+# Derived state records the fingerprint it was built against so restarts can reuse it
+
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, Optional, Set
+
+FINGERPRINT_COLUMN_FIELDS = ('type', 'max_length', 'precision', 'scale', 'nullable', 'identity', 'is_primary_key')
+
+def catalog_fingerprint(schema_dict: Dict) -> str:
+    """Hash tables, columns, column types, keys and FKs, ignoring order and descriptions."""
+    catalog = {
+        'tables': {
+            f"{schema}.{table}".lower(): sorted(
+                [col.lower()] + [str(info.get(field)) for field in FINGERPRINT_COLUMN_FIELDS]
+                for col, info in schema_dict.get('columns', {}).get(schema, {}).get(table, {}).items()
+            )
+            for schema in schema_dict.get('tables', {})
+            for table in schema_dict['tables'][schema]
+        },
+        'relationships': sorted(
+            f"{rel['from']}->{rel['to']}".lower() for rel in schema_dict.get('relationships', [])
+        )
+    }
+    return hashlib.sha256(json.dumps(catalog, sort_keys=True).encode()).hexdigest()
+
+def schema_columns(schema_dict: Dict) -> Set[str]:
+    """Return the set of lowercase column names in the schema."""
+    return {
+        col.lower()
+        for tables in schema_dict.get('columns', {}).values()
+        for columns in tables.values()
+        for col in columns
+    }
+
+class ArtefactManifest:
+    """Records which catalog fingerprint each derived artefact was built against.
+
+    Stored in schema_cache/<db>/manifest.json as {artefact: fingerprint}.
+    Several components share the file, so writes merge with what is on disk.
+    """
+
+    def __init__(self, db_name: str):
+        """Initialize with database name."""
+        self.logger = logging.getLogger("schema")
+        self.path = os.path.join("schema_cache", db_name, "manifest.json")
+        self.entries = self._load()
+
+    def _load(self) -> Dict[str, str]:
+        """Load the manifest."""
+        try:
+            if os.path.exists(self.path):
+                with open(self.path) as f:
+                    return json.load(f)
+        except Exception as e:
+            self.logger.error(f"Error loading artefact manifest: {e}")
+        return {}
+
+    def get(self, artefact: str) -> Optional[str]:
+        """Return the fingerprint an artefact was built against, if recorded."""
+        return self.entries.get(artefact)
+
+    def is_current(self, artefact: str, fingerprint: str) -> bool:
+        """Check whether an artefact was built against the given fingerprint."""
+        return self.entries.get(artefact) == fingerprint
+
+    def record(self, artefact: str, fingerprint: str):
+        """Record the fingerprint an artefact now matches."""
+        if self.entries.get(artefact) == fingerprint:
+            return
+        self.entries = {**self._load(), artefact: fingerprint}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        try:
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.entries, f, indent=2)
+            os.replace(tmp_path, self.path)
+            self.logger.debug(f"Recorded {artefact} at schema {fingerprint[:12]}")
+        except Exception as e:
+            self.logger.error(f"Error saving artefact manifest: {e}")
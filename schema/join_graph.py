@@ -0,0 +1,140 @@
+# schema/join_graph.py: Foreign-key join graph with precomputed shortest join paths
+# Paths are found once per schema by bounded BFS, so queries only walk parent links
+
+import json
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+class JoinGraph:
+    """Undirected FK graph over tables with cached shortest paths up to max_hops."""
+
+    def __init__(self, tables: List[str], edges: List[Tuple[int, int]], max_hops: int = 3):
+        """Initialize with full table names and (table id, table id) FK edges."""
+        self.tables = tables
+        self.table_ids = {name.lower(): i for i, name in enumerate(tables)}
+        self.max_hops = max_hops
+        self.adjacency: List[List[int]] = [[] for _ in tables]
+        for a, b in edges:
+            if a != b and b not in self.adjacency[a]:
+                self.adjacency[a].append(b)
+                self.adjacency[b].append(a)
+        for neighbours in self.adjacency:
+            neighbours.sort()
+        # parents[src][dst] = (previous table on the path from src, hops)
+        self.parents: List[Dict[int, Tuple[int, int]]] = [self._bfs(src) for src in range(len(tables))]
+
+    @classmethod
+    def from_schema(cls, schema_dict: Dict, max_hops: int = 3) -> 'JoinGraph':
+        """Build the graph from schema_dict['relationships']."""
+        tables = [
+            f"{schema}.{table}"
+            for schema in schema_dict.get('tables', {})
+            for table in schema_dict['tables'][schema]
+        ]
+        table_ids = {name.lower(): i for i, name in enumerate(tables)}
+        edges = []
+        for rel in schema_dict.get('relationships', []):
+            src = table_ids.get(rel['from'].rsplit('.', 1)[0].lower())
+            dst = table_ids.get(rel['to'].rsplit('.', 1)[0].lower())
+            if src is not None and dst is not None:
+                edges.append((src, dst))
+        return cls(tables, edges, max_hops)
+
+    def _bfs(self, src: int) -> Dict[int, Tuple[int, int]]:
+        """Breadth-first search from src limited to max_hops."""
+        parents = {src: (src, 0)}
+        frontier = deque([src])
+        while frontier:
+            node = frontier.popleft()
+            hops = parents[node][1]
+            if hops >= self.max_hops:
+                continue
+            for neighbour in self.adjacency[node]:
+                if neighbour not in parents:
+                    parents[neighbour] = (node, hops + 1)
+                    frontier.append(neighbour)
+        return parents
+
+    def path(self, src: str, dst: str) -> Optional[List[str]]:
+        """Return the shortest join path between two tables, or None."""
+        a, b = self.table_ids.get(src.lower()), self.table_ids.get(dst.lower())
+        if a is None or b is None:
+            return None
+        ids = self._path_ids(a, b)
+        return [self.tables[i] for i in ids] if ids is not None else None
+
+    def _path_ids(self, a: int, b: int) -> Optional[List[int]]:
+        """Walk parent links from b back to a."""
+        parents = self.parents[a]
+        if b not in parents:
+            return None
+        ids = [b]
+        while ids[-1] != a:
+            ids.append(parents[ids[-1]][0])
+        ids.reverse()
+        return ids
+
+    def bridge_tables(self, tables: List[str]) -> List[str]:
+        """Return the extra tables needed to join the given tables together.
+
+        Tables are attached in order, each through the shortest path to any
+        table already connected. Tables that cannot be reached within
+        max_hops stay unconnected.
+        """
+        ids = [self.table_ids[t.lower()] for t in tables if t.lower() in self.table_ids]
+        if len(ids) < 2:
+            return []
+        connected = [ids[0]]
+        bridges: List[int] = []
+        for target in ids[1:]:
+            if target in connected:
+                continue
+            best = None
+            for node in connected:
+                hit = self.parents[target].get(node)
+                if hit is not None and (best is None or hit[1] < best[1]):
+                    best = (node, hit[1])
+            if best is not None:
+                for node in self._path_ids(best[0], target)[1:-1]:
+                    if node not in connected:
+                        connected.append(node)
+                        bridges.append(node)
+            connected.append(target)
+        return [self.tables[i] for i in bridges if i not in ids]
+
+    def to_dict(self) -> Dict:
+        """Serialize tables, adjacency and paths."""
+        return {
+            'max_hops': self.max_hops,
+            'tables': self.tables,
+            'adjacency': self.adjacency,
+            'parents': [
+                [[dst, parent, hops] for dst, (parent, hops) in parents.items()]
+                for parents in self.parents
+            ]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'JoinGraph':
+        """Restore a graph without recomputing paths."""
+        graph = cls.__new__(cls)
+        graph.tables = data['tables']
+        graph.table_ids = {name.lower(): i for i, name in enumerate(graph.tables)}
+        graph.max_hops = data['max_hops']
+        graph.adjacency = data['adjacency']
+        graph.parents = [
+            {dst: (parent, hops) for dst, parent, hops in parents}
+            for parents in data['parents']
+        ]
+        return graph
+
+    def save(self, path: str):
+        """Write the graph to a JSON file."""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path: str) -> 'JoinGraph':
+        """Read a graph written by save."""
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
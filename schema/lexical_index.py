@@ -0,0 +1,146 @@
+# schema/lexical_index.py: BM25 inverted index over table, column, synonym and description text
+# Model-free lexical evidence; postings hold precomputed BM25 weights so queries only sum them
+
+import re
+import json
+import hashlib
+from collections import Counter
+from typing import Dict, List, Set, Tuple
+import numpy as np
+from schema.fingerprint import catalog_fingerprint
+
+# Table name terms count this many times towards a table's term frequencies
+TABLE_NAME_BOOST = 3
+
+def stem(term: str) -> str:
+    """Strip common English plural endings."""
+    if len(term) > 4 and term.endswith('ies'):
+        return term[:-3] + 'y'
+    if len(term) > 4 and term.endswith('sses'):
+        return term[:-2]
+    if len(term) > 3 and term.endswith('s') and not term.endswith('ss'):
+        return term[:-1]
+    return term
+
+def tokenize(text: str) -> List[str]:
+    """Split identifiers and prose into stemmed lowercase terms (snake_case and camelCase aware)."""
+    text = re.sub(r'([a-z0-9])([A-Z])', r'\1 \2', str(text))
+    return [stem(term) for term in re.findall(r'[a-z0-9]+', text.lower())]
+
+class LexicalIndex:
+    """BM25 index with one document per table, in schema table order."""
+
+    def __init__(self, tables: List[str], vocabulary: Dict[str, Tuple[int, int]], doc_ids: np.ndarray, weights: np.ndarray, key: str = ""):
+        """Initialize with table names, term -> (offset, count) into the posting arrays, and postings."""
+        self.tables = tables
+        self.vocabulary = vocabulary
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.key = key
+
+    @staticmethod
+    def documents(schema_dict: Dict, synonyms: Dict[str, Set[str]]) -> Tuple[List[str], List[Counter]]:
+        """Return table names and their term counts."""
+        tables, docs = [], []
+        for schema in schema_dict.get('tables', {}):
+            for table, info in schema_dict['tables'][schema].items():
+                terms = Counter(tokenize(schema))
+                for term in tokenize(table):
+                    terms[term] += TABLE_NAME_BOOST
+                if isinstance(info, dict) and info.get('description'):
+                    terms.update(tokenize(info['description']))
+                for col, col_info in schema_dict.get('columns', {}).get(schema, {}).get(table, {}).items():
+                    terms.update(tokenize(col))
+                    for synonym in synonyms.get(col.lower(), ()):
+                        terms.update(tokenize(synonym))
+                    if col_info.get('description'):
+                        terms.update(tokenize(col_info['description']))
+                tables.append(f"{schema}.{table}")
+                docs.append(terms)
+        return tables, docs
+
+    @staticmethod
+    def source_key(schema_dict: Dict, synonyms: Dict[str, Set[str]], k1: float, b: float) -> str:
+        """Hash everything the index is built from."""
+        descriptions = sorted(
+            f"{schema}.{table}.{col}:{info.get('description')}"
+            for schema, tables in schema_dict.get('columns', {}).items()
+            for table, columns in tables.items()
+            for col, info in columns.items() if info.get('description')
+        ) + sorted(
+            f"{schema}.{table}:{info.get('description')}"
+            for schema, tables in schema_dict.get('tables', {}).items()
+            for table, info in tables.items() if isinstance(info, dict) and info.get('description')
+        )
+        source = {
+            'schema': schema_dict.get('fingerprint') or catalog_fingerprint(schema_dict),
+            'synonyms': {col: sorted(values) for col, values in sorted(synonyms.items())},
+            'descriptions': descriptions,
+            'bm25': [k1, b]
+        }
+        return hashlib.sha256(json.dumps(source, sort_keys=True).encode()).hexdigest()
+
+    @classmethod
+    def from_schema(cls, schema_dict: Dict, synonyms: Dict[str, Set[str]], k1: float = 1.2, b: float = 0.75) -> 'LexicalIndex':
+        """Build the index; synonyms map lowercase column names to synonym sets."""
+        tables, docs = cls.documents(schema_dict, synonyms)
+        lengths = np.array([sum(doc.values()) for doc in docs], dtype=np.float64)
+        avg_length = lengths.mean() if len(lengths) and lengths.mean() > 0 else 1.0
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc_id, doc in enumerate(docs):
+            for term, tf in doc.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+
+        vocabulary, doc_ids, weights = {}, [], []
+        for term in sorted(postings):
+            entries = postings[term]
+            df = len(entries)
+            idf = np.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+            vocabulary[term] = (len(doc_ids), df)
+            for doc_id, tf in entries:
+                norm = k1 * (1 - b + b * lengths[doc_id] / avg_length)
+                doc_ids.append(doc_id)
+                weights.append(idf * tf * (k1 + 1) / (tf + norm))
+        return cls(
+            tables, vocabulary,
+            np.array(doc_ids, dtype=np.int32), np.array(weights, dtype=np.float32),
+            cls.source_key(schema_dict, synonyms, k1, b)
+        )
+
+    def search(self, query: str, k: int = 50) -> List[Tuple[int, float]]:
+        """Return up to k (table id, BM25 score) pairs, best first."""
+        slices = [self.vocabulary[term] for term in set(tokenize(query)) if term in self.vocabulary]
+        if not slices:
+            return []
+        doc_ids = np.concatenate([self.doc_ids[start:start + count] for start, count in slices])
+        weights = np.concatenate([self.weights[start:start + count] for start, count in slices])
+        tables, inverse = np.unique(doc_ids, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights)
+        top = np.argsort(-scores)[:k]
+        return [(int(tables[i]), float(scores[i])) for i in top]
+
+    def save(self, path: str):
+        """Write the index as a .npz archive."""
+        terms = list(self.vocabulary)
+        np.savez(
+            path,
+            tables=np.array(self.tables, dtype=str),
+            terms=np.array(terms, dtype=str),
+            postings=np.array([self.vocabulary[term] for term in terms], dtype=np.int64).reshape(-1, 2),
+            doc_ids=self.doc_ids,
+            weights=self.weights,
+            key=np.array(self.key)
+        )
+
+    @classmethod
+    def load(cls, path: str) -> 'LexicalIndex':
+        """Read an index written by save()."""
+        with np.load(path, allow_pickle=False) as data:
+            vocabulary = {
+                str(term): (int(start), int(count))
+                for term, (start, count) in zip(data['terms'], data['postings'])
+            }
+            return cls(
+                [str(table) for table in data['tables']], vocabulary,
+                data['doc_ids'], data['weights'], str(data['key'])
+            )
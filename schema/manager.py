@@ -2,28 +2,42 @@
 
 import os
 import json
+import time
+import hashlib
 from collections import defaultdict
-from typing import Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set, Tuple
 import logging
-import logging.config
+from schema.catalog import Catalog
+from schema.join_graph import JoinGraph
+from schema.lexical_index import LexicalIndex, tokenize
+from schema.value_index import ValueIndex
+from schema.fingerprint import ArtefactManifest, catalog_fingerprint
+
+# Column types whose values can name things users type into queries
+TEXT_TYPES = {'char', 'varchar', 'nchar', 'nvarchar'}
+
+# Tables need this many times the sample size before TABLESAMPLE is used instead of TOP alone
+SAMPLE_MIN_RATIO = 10
+
+def quote_identifier(name: str) -> str:
+    """Quote a SQL Server identifier."""
+    return "[" + name.replace("]", "]]") + "]"
 
 class SchemaManager:
     """Manages database schema metadata."""
     
     def __init__(self, db_name: str):
         """Initialize with database name."""
-        logging_config_path = f"app-config/logging_config.ini"
-        if os.path.exists(logging_config_path):
-            try:
-                logging.config.fileConfig(logging_config_path, disable_existing_loggers=False)
-            except Exception as e:
-                print(f"Error loading logging config: {e}")
-        
         self.logger = logging.getLogger("schema")
         self.db_name = db_name
         self.cache_dir = os.path.join("schema_cache", db_name)
         self.cache_file = os.path.join(self.cache_dir, "schema.json")
+        self.join_graph_file = os.path.join(self.cache_dir, "join_graph.json")
+        self.lexical_index_file = os.path.join(self.cache_dir, "lexical_index.npz")
+        self.value_index_file = os.path.join(self.cache_dir, "value_index.npz")
         os.makedirs(self.cache_dir, exist_ok=True)
+        self.manifest = ArtefactManifest(db_name)
         self.logger.debug(f"Initialized SchemaManager for {db_name}")
     
     def needs_refresh(self, conn) -> bool:
@@ -32,6 +46,13 @@ class SchemaManager:
             self.logger.debug("Schema cache missing, needs refresh")
             return True
         
+        checksum = self._get_catalog_checksum(conn)
+        cached_checksum = self.manifest.get('catalog_checksum')
+        if checksum is not None and cached_checksum is not None:
+            needs_refresh = checksum != cached_checksum
+            self.logger.debug(f"Catalog checksum {checksum} (cached {cached_checksum}), refresh needed: {needs_refresh}")
+            return needs_refresh
+        
         cached_time = os.path.getmtime(self.cache_file)
         latest_change = self._get_latest_schema_change(conn)
         
@@ -60,8 +81,43 @@ class SchemaManager:
             self.logger.error(f"Error checking schema change: {e}")
             return 0
     
-    def build_data_dict(self, conn) -> Dict:
-        """Build schema dictionary."""
+    def _get_catalog_checksum(self, conn) -> Optional[str]:
+        """Get a server-side checksum over tables, columns, keys and FKs."""
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT
+                        (SELECT CHECKSUM_AGG(CHECKSUM(
+                                s.name, t.name, c.name, c.user_type_id, c.max_length,
+                                c.precision, c.scale, c.is_nullable, c.is_identity))
+                         FROM sys.columns c
+                         JOIN sys.tables t ON c.object_id = t.object_id
+                         JOIN sys.schemas s ON t.schema_id = s.schema_id
+                         WHERE t.is_ms_shipped = 0) AS column_checksum,
+                        (SELECT CHECKSUM_AGG(CHECKSUM(ic.object_id, ic.column_id))
+                         FROM sys.indexes i
+                         JOIN sys.index_columns ic ON
+                             ic.object_id = i.object_id AND
+                             ic.index_id = i.index_id
+                         WHERE i.is_primary_key = 1) AS key_checksum,
+                        (SELECT CHECKSUM_AGG(CHECKSUM(
+                                fkc.parent_object_id, fkc.parent_column_id,
+                                fkc.referenced_object_id, fkc.referenced_column_id))
+                         FROM sys.foreign_key_columns fkc) AS fk_checksum,
+                        (SELECT COUNT(*) FROM sys.columns c
+                         JOIN sys.tables t ON c.object_id = t.object_id
+                         WHERE t.is_ms_shipped = 0) AS column_count
+                """)
+                result = cursor.fetchone()
+                checksum = ':'.join(str(value) for value in result)
+                self.logger.debug(f"Catalog checksum: {checksum}")
+                return checksum
+        except Exception as e:
+            self.logger.error(f"Error computing catalog checksum: {e}")
+            return None
+    
+    def build_data_dict(self, conn) -> Catalog:
+        """Build schema dictionary, returned as a compact Catalog."""
         self.logger.debug("Building schema dictionary")
         schema_dict = self._initialize_schema_dict()
         
@@ -72,10 +128,14 @@ class SchemaManager:
                 self._fetch_columns(cursor, schema_dict)
                 self._fetch_primary_keys(cursor, schema_dict)
                 self._fetch_foreign_keys(cursor, schema_dict)
+                schema_dict["fingerprint"] = catalog_fingerprint(schema_dict)
                 
                 self._save_to_cache(schema_dict)
+                checksum = self._get_catalog_checksum(conn)
+                if checksum is not None:
+                    self.manifest.record('catalog_checksum', checksum)
                 self.logger.info("Schema dictionary built")
-                return schema_dict
+                return Catalog.from_dict(schema_dict)
         except Exception as e:
             self.logger.error(f"Error building schema dictionary: {e}")
             raise
@@ -107,15 +167,22 @@ class SchemaManager:
     def _fetch_tables(self, cursor, schema_dict: Dict):
         """Fetch table names."""
         cursor.execute("""
-            SELECT t.name AS table_name, s.name AS schema_name, t.object_id
+            SELECT t.name AS table_name, s.name AS schema_name, t.object_id,
+                ep.value AS description
             FROM sys.tables t
             JOIN sys.schemas s ON t.schema_id = s.schema_id
+            LEFT JOIN sys.extended_properties ep ON 
+                ep.major_id = t.object_id AND 
+                ep.minor_id = 0 AND
+                ep.class = 1 AND
+                ep.name = 'MS_Description'
             WHERE t.is_ms_shipped = 0
         """)
         for row in cursor.fetchall():
             schema_dict["tables"][row.schema_name][row.table_name] = {
                 "id": row.object_id,
-                "columns": []
+                "columns": [],
+                "description": row.description
             }
             schema_dict["schemas"][row.schema_name]["tables"].append(row.table_name)
         self.logger.debug(f"Fetched tables for schemas: {list(schema_dict['tables'].keys())}")
@@ -218,12 +285,248 @@ class SchemaManager:
         """Save schema to cache."""
         with open(self.cache_file, 'w') as f:
             json.dump(schema_dict, f, indent=2)
-        self.logger.debug(f"Saved schema to {self.cache_file}")
+        self.manifest.record('schema', schema_dict['fingerprint'])
+        self.logger.debug(f"Saved schema {schema_dict['fingerprint'][:12]} to {self.cache_file}")
     
-    def load_from_cache(self) -> Dict:
-        """Load schema from cache."""
+    def load_from_cache(self) -> Catalog:
+        """Load schema from cache as a compact Catalog."""
         with open(self.cache_file) as f:
             schema_dict = json.load(f)
             schema_dict['database'] = self.db_name
+            if 'fingerprint' not in schema_dict:
+                schema_dict['fingerprint'] = catalog_fingerprint(schema_dict)
             self.logger.debug(f"Loaded schema from {self.cache_file}")
-            return schema_dict
\ No newline at end of file
+            return Catalog.from_dict(schema_dict)
+
+    def load_join_graph(self, schema_dict: Dict, max_hops: int = 3) -> JoinGraph:
+        """Load the cached FK join graph, rebuilding it when the schema changed."""
+        fingerprint = schema_dict.get('fingerprint') or catalog_fingerprint(schema_dict)
+        try:
+            if os.path.exists(self.join_graph_file) and self.manifest.is_current('join_graph', fingerprint):
+                graph = JoinGraph.load(self.join_graph_file)
+                if graph.max_hops == max_hops:
+                    self.logger.debug(f"Loaded join graph from {self.join_graph_file}")
+                    return graph
+        except Exception as e:
+            self.logger.error(f"Error loading join graph: {e}")
+        
+        graph = JoinGraph.from_schema(schema_dict, max_hops)
+        try:
+            graph.save(self.join_graph_file)
+            self.manifest.record('join_graph', fingerprint)
+            self.logger.debug(f"Saved join graph for {len(graph.tables)} tables to {self.join_graph_file}")
+        except Exception as e:
+            self.logger.error(f"Error saving join graph: {e}")
+        return graph
+
+    def load_lexical_index(self, schema_dict: Dict, synonyms: Dict[str, Set[str]], k1: float = 1.2, b: float = 0.75) -> LexicalIndex:
+        """Load the cached BM25 index, rebuilding it when schema, descriptions or synonyms changed."""
+        key = LexicalIndex.source_key(schema_dict, synonyms, k1, b)
+        try:
+            if os.path.exists(self.lexical_index_file) and self.manifest.is_current('lexical_index', key):
+                index = LexicalIndex.load(self.lexical_index_file)
+                self.logger.debug(f"Loaded lexical index from {self.lexical_index_file}")
+                return index
+        except Exception as e:
+            self.logger.error(f"Error loading lexical index: {e}")
+        
+        index = LexicalIndex.from_schema(schema_dict, synonyms, k1, b)
+        try:
+            index.save(self.lexical_index_file)
+            self.manifest.record('lexical_index', key)
+            self.logger.debug(f"Saved lexical index of {len(index.vocabulary)} terms to {self.lexical_index_file}")
+        except Exception as e:
+            self.logger.error(f"Error saving lexical index: {e}")
+        return index
+
+    def load_value_index(
+        self,
+        schema_dict: Dict,
+        connect: Optional[Callable] = None,
+        config: Optional[Dict] = None,
+        refresh: bool = False
+    ) -> Optional[ValueIndex]:
+        """Load the cached column-value index, profiling the database again when it is stale (or refresh) and connect is given."""
+        config = self._value_index_config(config or {})
+        key = self._value_index_key(schema_dict, config)
+        max_age = config.get('max_age_hours', 168) * 3600
+        try:
+            if not refresh and os.path.exists(self.value_index_file) and self.manifest.is_current('value_index', key):
+                if connect is None or time.time() - os.path.getmtime(self.value_index_file) < max_age:
+                    index = ValueIndex.load(self.value_index_file)
+                    self.logger.debug(f"Loaded value index of {len(index)} columns from {self.value_index_file}")
+                    return index
+        except Exception as e:
+            self.logger.error(f"Error loading value index: {e}")
+        if connect is None:
+            return None
+        
+        index, sampled = self.profile_values(connect, schema_dict, config, key)
+        if not sampled:
+            # Do not let an outage pin an empty index in the cache for max_age_hours
+            self.logger.warning("No table could be sampled; value index not cached, will retry on next load")
+            try:
+                if os.path.exists(self.value_index_file) and self.manifest.is_current('value_index', key):
+                    return ValueIndex.load(self.value_index_file)
+            except Exception as e:
+                self.logger.error(f"Error loading value index: {e}")
+            return index
+        try:
+            index.save(self.value_index_file)
+            self.manifest.record('value_index', key)
+            self.logger.debug(f"Saved value index to {self.value_index_file}")
+        except Exception as e:
+            self.logger.error(f"Error saving value index: {e}")
+        return index
+
+    def _value_index_config(self, config: Dict) -> Dict:
+        """Return config with max_distinct below sample_rows, without which no column counts as low-cardinality."""
+        sample_rows = config.get('sample_rows', 1000)
+        max_distinct = config.get('max_distinct', 100)
+        if max_distinct >= sample_rows:
+            self.logger.warning(
+                f"value_index.max_distinct ({max_distinct}) must be below sample_rows ({sample_rows}); "
+                f"using {max(1, sample_rows // 10)}"
+            )
+            config = {**config, 'max_distinct': max(1, sample_rows // 10)}
+        return config
+
+    def _value_index_key(self, schema_dict: Dict, config: Dict) -> str:
+        """Hash the schema and the sampling settings a value index depends on."""
+        source = {
+            'schema': schema_dict.get('fingerprint') or catalog_fingerprint(schema_dict),
+            'sampling': [
+                config.get(name) for name in ('sample_rows', 'max_distinct', 'max_column_length', 'max_value_length', 'fp_rate')
+            ]
+        }
+        return hashlib.sha256(json.dumps(source, sort_keys=True).encode()).hexdigest()
+
+    def value_columns(self, schema_dict: Dict, max_column_length: int = 255) -> Dict[Tuple[str, str], List[str]]:
+        """Return (schema, table) -> bounded-length text columns worth sampling, skipping keys."""
+        columns = defaultdict(list)
+        for schema, tables in schema_dict.get('columns', {}).items():
+            for table, table_columns in tables.items():
+                for col, info in table_columns.items():
+                    type_name = str(info.get('type', '')).lower()
+                    if type_name not in TEXT_TYPES or info.get('is_primary_key') or info.get('identity'):
+                        continue
+                    length = info.get('max_length') or 0
+                    if type_name.startswith('n'):
+                        length //= 2  # max_length is in bytes
+                    if 0 < length <= max_column_length:
+                        columns[(schema, table)].append(col)
+        return columns
+
+    def profile_values(
+        self,
+        connect: Callable,
+        schema_dict: Dict,
+        config: Optional[Dict] = None,
+        key: str = ""
+    ) -> Tuple[ValueIndex, bool]:
+        """Sample distinct values of low-cardinality text columns in parallel and build per-column Bloom filters.
+
+        connect() must return a new DB-API connection; pyodbc's driver-level
+        pooling reuses physical connections across calls. Also returns whether
+        any table was sampled (True when there was nothing to sample).
+        """
+        config = self._value_index_config(config or {})
+        sample_rows = config.get('sample_rows', 1000)
+        max_distinct = config.get('max_distinct', 100)
+        max_value_length = config.get('max_value_length', 64)
+        columns = self.value_columns(schema_dict, config.get('max_column_length', 255))
+        start = time.perf_counter()
+        row_counts = self._fetch_row_counts(connect)
+        
+        def sample(table_key: Tuple[str, str]) -> Optional[Dict[Tuple[str, str], Set[str]]]:
+            try:
+                conn = connect()
+            except Exception as e:
+                self.logger.error(f"Error connecting to sample {table_key[0]}.{table_key[1]}: {e}")
+                return None
+            try:
+                return self._sample_table(
+                    conn, table_key, columns[table_key], row_counts.get(table_key, 0),
+                    sample_rows, max_distinct, max_value_length
+                )
+            finally:
+                conn.close()
+        
+        values: Dict[Tuple[str, str], Set[str]] = {}
+        sampled = 0
+        with ThreadPoolExecutor(max(1, config.get('workers', 4))) as pool:
+            for table_values in pool.map(sample, list(columns)):
+                if table_values is not None:
+                    values.update(table_values)
+                    sampled += 1
+        exclude = {
+            term
+            for schema, tables in schema_dict.get('columns', {}).items()
+            for table, table_columns in tables.items()
+            for name in [schema, table, *table_columns]
+            for term in tokenize(name)
+        }
+        index = ValueIndex.from_values(values, config.get('fp_rate', 1e-5), exclude, key)
+        self.logger.info(
+            f"Profiled {len(index)} value columns in {sampled}/{len(columns)} tables "
+            f"({index.nbytes / 1024:.0f} KB) in {time.perf_counter() - start:.1f}s"
+        )
+        return index, bool(sampled) or not columns
+
+    def _fetch_row_counts(self, connect: Callable) -> Dict[Tuple[str, str], int]:
+        """Get approximate row counts from partition metadata."""
+        try:
+            conn = connect()
+        except Exception as e:
+            self.logger.error(f"Error connecting to fetch row counts: {e}")
+            return {}
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT s.name AS schema_name, t.name AS table_name, SUM(p.rows) AS row_count
+                    FROM sys.tables t
+                    JOIN sys.schemas s ON t.schema_id = s.schema_id
+                    JOIN sys.partitions p ON p.object_id = t.object_id AND p.index_id IN (0, 1)
+                    WHERE t.is_ms_shipped = 0
+                    GROUP BY s.name, t.name
+                """)
+                return {(row.schema_name, row.table_name): int(row.row_count or 0) for row in cursor.fetchall()}
+        except Exception as e:
+            self.logger.error(f"Error fetching row counts: {e}")
+            return {}
+        finally:
+            conn.close()
+
+    def _sample_table(
+        self,
+        conn,
+        table_key: Tuple[str, str],
+        columns: List[str],
+        row_count: int,
+        sample_rows: int,
+        max_distinct: int,
+        max_value_length: int
+    ) -> Optional[Dict[Tuple[str, str], Set[str]]]:
+        """Read a bounded sample of one table and keep the short values of columns with few distinct values (None on error)."""
+        schema, table = table_key
+        select = ", ".join(quote_identifier(col) for col in columns)
+        sql = f"SELECT TOP ({int(sample_rows)}) {select} FROM {quote_identifier(schema)}.{quote_identifier(table)}"
+        # TABLESAMPLE reads whole pages and can return nothing from small tables; its row count is approximate
+        if row_count > sample_rows * SAMPLE_MIN_RATIO:
+            sql += f" TABLESAMPLE ({2 * int(sample_rows)} ROWS)"
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(sql)
+                rows = cursor.fetchall()
+        except Exception as e:
+            self.logger.error(f"Error sampling {schema}.{table}: {e}")
+            return None
+        values = {}
+        for position, col in enumerate(columns):
+            distinct = {str(row[position]).strip() for row in rows if row[position] is not None}
+            distinct.discard('')
+            if distinct and len(distinct) <= max_distinct:
+                values[(f"{schema}.{table}", col)] = {value for value in distinct if len(value) <= max_value_length}
+        self.logger.debug(f"Sampled {len(rows)} rows of {schema}.{table}, kept {len(values)}/{len(columns)} columns")
+        return values
+
@@ -0,0 +1,186 @@
+# schema/value_index.py: Per-column Bloom filters over sampled text values
+# Lets query literals such as store or city names point at the tables holding them without querying the database
+
+import math
+import hashlib
+from typing import Dict, Iterable, List, Set, Tuple
+import numpy as np
+from schema.lexical_index import tokenize
+
+# Value words too common to say anything about the owning table
+STOPWORDS = {
+    'the', 'and', 'for', 'with', 'from', 'all', 'any', 'are', 'was', 'not', 'but', 'per',
+    'show', 'list', 'get', 'find', 'which', 'what', 'who', 'how', 'many', 'much', 'their',
+    'have', 'has', 'that', 'this', 'each', 'where', 'when', 'into', 'than', 'more', 'most'
+}
+
+# Longest query phrase tested as a whole value
+MAX_PHRASE_WORDS = 3
+
+def value_terms(value: str, exclude: Set[str] = frozenset()) -> Set[str]:
+    """Return the whole normalised value plus its informative words."""
+    words = tokenize(value)
+    if not words:
+        return set()
+    terms = {' '.join(words)} if len(words) <= MAX_PHRASE_WORDS else set()
+    terms.update(
+        word for word in words
+        if len(word) >= 3 and not word.isdigit() and word not in STOPWORDS and word not in exclude
+    )
+    return terms
+
+def query_terms(query: str) -> List[str]:
+    """Return query words and phrases of up to MAX_PHRASE_WORDS words to test against the filters."""
+    words = tokenize(query)
+    terms = []
+    for size in range(1, MAX_PHRASE_WORDS + 1):
+        for start in range(len(words) - size + 1):
+            phrase = words[start:start + size]
+            if size == 1 and (len(phrase[0]) < 3 or phrase[0].isdigit() or phrase[0] in STOPWORDS):
+                continue
+            terms.append(' '.join(phrase))
+    return list(dict.fromkeys(terms))
+
+def _hash_terms(terms: List[str], num_hashes: int) -> np.ndarray:
+    """Return (terms, num_hashes) independent 64-bit bit positions, to be masked to a filter's size."""
+    digests = b''.join(hashlib.blake2b(term.encode('utf-8'), digest_size=8).digest() for term in terms)
+    seeds = np.frombuffer(digests, dtype='<u8')
+    # SplitMix64 over seed + i * golden ratio; plain double hashing clusters in small power-of-two filters
+    with np.errstate(over='ignore'):
+        z = seeds[:, None] + np.arange(1, num_hashes + 1, dtype=np.uint64)[None, :] * np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+class ValueIndex:
+    """Per-column Bloom filters stored bit-sliced.
+
+    Filter i covers column columns[i] of table tables[i]. Filters are
+    grouped by size (a power of two bits); each group is a (bits, words)
+    uint64 matrix whose row b holds bit b of every filter in the group,
+    one bit per filter. Testing a term against a whole group is then
+    num_hashes row reads and an AND, however many columns there are.
+    """
+
+    def __init__(
+        self,
+        tables: List[str],
+        columns: List[str],
+        groups: List[Tuple[np.ndarray, np.ndarray]],
+        num_hashes: int,
+        key: str = ""
+    ):
+        """Initialize with filter owners and (filter ids, bit-sliced matrix) per size group."""
+        self.tables = tables
+        self.columns = columns
+        self.groups = groups
+        self.num_hashes = num_hashes
+        self.key = key
+
+    def __len__(self) -> int:
+        return len(self.tables)
+
+    @property
+    def nbytes(self) -> int:
+        return int(sum(slices.nbytes for _, slices in self.groups))
+
+    @staticmethod
+    def filter_bits(count: int, fp_rate: float) -> int:
+        """Power-of-two filter size reaching fp_rate for count items (classic m = -n ln p / ln^2 2)."""
+        bits = max(count, 1) * -math.log(fp_rate) / math.log(2) ** 2
+        return max(64, 1 << math.ceil(math.log2(bits)))
+
+    @classmethod
+    def from_values(
+        cls,
+        values: Dict[Tuple[str, str], Iterable[str]],
+        fp_rate: float = 1e-5,
+        exclude: Set[str] = frozenset(),
+        key: str = ""
+    ) -> 'ValueIndex':
+        """Build filters from sampled values keyed by (table, column); exclude holds identifier words."""
+        num_hashes = max(1, round(-math.log2(fp_rate)))
+        owners, term_sets = [], []
+        for (table, column), column_values in values.items():
+            terms = set()
+            for value in column_values:
+                terms.update(value_terms(str(value), exclude))
+            if terms:
+                owners.append((table, column))
+                term_sets.append(sorted(terms))
+        by_size: Dict[int, List[int]] = {}
+        for filter_id, terms in enumerate(term_sets):
+            by_size.setdefault(cls.filter_bits(len(terms), fp_rate), []).append(filter_id)
+        groups = []
+        for bits, filter_ids in sorted(by_size.items()):
+            slices = np.zeros((bits, (len(filter_ids) + 63) // 64), dtype=np.uint64)
+            for slot, filter_id in enumerate(filter_ids):
+                rows = (_hash_terms(term_sets[filter_id], num_hashes) & np.uint64(bits - 1)).ravel().astype(np.int64)
+                slices[rows, slot // 64] |= np.uint64(1) << np.uint64(slot % 64)
+            groups.append((np.array(filter_ids, dtype=np.int64), slices))
+        return cls(
+            [table for table, _ in owners], [column for _, column in owners],
+            groups, num_hashes, key
+        )
+
+    def contains(self, terms: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (term index, filter id) pairs of possible membership for normalised terms."""
+        if not self.groups or not terms:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        positions = _hash_terms(terms, self.num_hashes)
+        term_ids, filter_ids = [], []
+        for group_filters, slices in self.groups:
+            rows = (positions & np.uint64(len(slices) - 1)).astype(np.int64)
+            present = np.bitwise_and.reduce(slices[rows], axis=1)
+            bits = np.unpackbits(present.view(np.uint8), axis=1, bitorder='little')[:, :len(group_filters)]
+            hit_terms, slots = np.nonzero(bits)
+            term_ids.append(hit_terms)
+            filter_ids.append(group_filters[slots])
+        return np.concatenate(term_ids), np.concatenate(filter_ids)
+
+    def matches(self, query: str, max_tables: int = 3) -> Dict[str, List[Tuple[str, str]]]:
+        """Return table -> [(column, term)] for query terms found in at most max_tables tables."""
+        terms = query_terms(query)
+        hits: Dict[int, List[int]] = {}
+        for term_id, filter_id in zip(*self.contains(terms)):
+            hits.setdefault(int(term_id), []).append(int(filter_id))
+        found: Dict[str, List[Tuple[str, str]]] = {}
+        for term_id, filter_ids in hits.items():
+            # A word present in many tables is a generic value (or a false positive) rather than a lead
+            if len({self.tables[i] for i in filter_ids}) > max_tables:
+                continue
+            for i in filter_ids:
+                found.setdefault(self.tables[i], []).append((self.columns[i], terms[term_id]))
+        return found
+
+    def save(self, path: str):
+        """Write the index as a .npz archive."""
+        np.savez(
+            path,
+            tables=np.array(self.tables, dtype=str),
+            columns=np.array(self.columns, dtype=str),
+            group_bits=np.array([len(slices) for _, slices in self.groups], dtype=np.int64),
+            group_sizes=np.array([len(filter_ids) for filter_ids, _ in self.groups], dtype=np.int64),
+            filter_ids=np.concatenate([filter_ids for filter_ids, _ in self.groups]) if self.groups else np.empty(0, dtype=np.int64),
+            slices=np.concatenate([slices.ravel() for _, slices in self.groups]) if self.groups else np.empty(0, dtype=np.uint64),
+            num_hashes=np.array(self.num_hashes),
+            key=np.array(self.key)
+        )
+
+    @classmethod
+    def load(cls, path: str) -> 'ValueIndex':
+        """Read an index written by save()."""
+        with np.load(path, allow_pickle=False) as data:
+            groups, filter_start, slice_start = [], 0, 0
+            for bits, size in zip(data['group_bits'], data['group_sizes']):
+                words = (int(size) + 63) // 64
+                groups.append((
+                    data['filter_ids'][filter_start:filter_start + size],
+                    data['slices'][slice_start:slice_start + bits * words].reshape(int(bits), words)
+                ))
+                filter_start += size
+                slice_start += bits * words
+            return cls(
+                [str(table) for table in data['tables']], [str(column) for column in data['columns']],
+                groups, int(data['num_hashes']), str(data['key'])
+            )